@@ -0,0 +1,183 @@
+# async_booking.py
+# asyncio variant of the two-phase booking flow. A checkout waiting on payment
+# is a suspended coroutine instead of a blocked OS thread, so one event loop
+# can keep tens of thousands of holds in flight.
+import asyncio
+import random
+
+from booking_metrics import METRICS
+from concurrency_handle_show import City
+
+
+class AsyncShow:
+    """Awaitable facade over a Show
+    
+    Show's reservation critical sections are short and never sleep, so they
+    run inline on the event loop. The loop only yields while a booking thread
+    happens to hold reservation_lock, instead of blocking on it, and while
+    an attached journal fsyncs the change.
+    
+    A cancellation during that fsync wait cannot unapply the change: a
+    cancelled reserve releases its hold before re-raising, and a confirm
+    that booked the seats absorbs it and reports the booking once durable.
+    Each operation is timed under the same name as its Show method.
+    """
+    # Polling interval while a booking thread holds reservation_lock: doubles from the
+    # first value up to the second, so a long hold costs a few wakeups instead of a busy loop
+    LOCK_BACKOFF_SECONDS = (0.00005, 0.005)
+    
+    def __init__(self, show, releases=None):
+        self.show = show
+        # Hold releases still running; the loop only keeps weak references to tasks
+        self.releases = set() if releases is None else releases
+    
+    async def _acquire_reservation_lock(self):
+        lock = self.show.reservation_lock
+        delay, max_delay = self.LOCK_BACKOFF_SECONDS
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+    
+    async def _wait_durable(self, journal_lsn):
+        """Suspend until the show's journal has fsynced the change, if a journal is attached"""
+        journal = self.show.journal
+        if journal is not None and journal_lsn:
+            await journal.wait_durable_async(journal_lsn)
+    
+    async def _wait_durable_through_cancellation(self, journal_lsn):
+        """_wait_durable that outlasts any number of cancellations"""
+        wait = asyncio.ensure_future(self._wait_durable(journal_lsn))
+        while not wait.done():
+            try:
+                await asyncio.shield(wait)
+            except asyncio.CancelledError:
+                pass
+        wait.result()
+    
+    async def release(self, seat_ids, user_id):
+        """cancel_reservations as its own task behind a shield: cancelling the caller stops the wait, not the release"""
+        release = asyncio.ensure_future(self.cancel_reservations(seat_ids, user_id))
+        self.releases.add(release)
+        release.add_done_callback(self.releases.discard)
+        return await asyncio.shield(release)
+    
+    async def reserve_seat(self, seat_id, user_id, hold_time_minutes=10):
+        success, _ = await self.reserve_seats([seat_id], user_id, hold_time_minutes)
+        return success
+    
+    async def reserve_seats(self, seat_ids, user_id, hold_time_minutes=10):
+        with METRICS.timing("reserve"):
+            await self._acquire_reservation_lock()
+            try:
+                result = self.show._reserve_seats(seat_ids, user_id, hold_time_minutes)
+                journal_lsn = self.show.journal_lsn
+            finally:
+                self.show.reservation_lock.release()
+            try:
+                await self._wait_durable(journal_lsn)
+            except asyncio.CancelledError:
+                # The caller never learns of the hold, so it must not outlive the wait
+                if result[0]:
+                    await self.release(seat_ids, user_id)
+                raise
+            return result
+    
+    async def confirm_booking(self, seat_id, user_id):
+        success, _ = await self.confirm_bookings([seat_id], user_id)
+        return success
+    
+    async def confirm_bookings(self, seat_ids, user_id):
+        with METRICS.timing("confirm"):
+            await self._acquire_reservation_lock()
+            try:
+                result = self.show._confirm_bookings(seat_ids, user_id)
+                journal_lsn = self.show.journal_lsn
+            finally:
+                self.show.reservation_lock.release()
+            if result[0]:
+                # The seats are booked; reporting a cancellation now would lose the booking
+                await self._wait_durable_through_cancellation(journal_lsn)
+            else:
+                await self._wait_durable(journal_lsn)
+            return result
+    
+    async def cancel_reservation(self, seat_id, user_id):
+        return await self.cancel_reservations([seat_id], user_id) == 1
+    
+    async def cancel_reservations(self, seat_ids, user_id):
+        with METRICS.timing("cancel"):
+            await self._acquire_reservation_lock()
+            try:
+                result = self.show._cancel_reservations(seat_ids, user_id)
+                journal_lsn = self.show.journal_lsn
+            finally:
+                self.show.reservation_lock.release()
+            await self._wait_durable(journal_lsn)
+            return result
+
+
+# Two-phase booking on the event loop
+class AsyncTwoPhaseBookingService:
+    def __init__(self, payment_time_range=(0.5, 2.0), payment_success_rate=0.9):
+        self.payment_time_range = payment_time_range
+        self.payment_success_rate = payment_success_rate
+        self.releases = set()  # hold releases still running; the loop only keeps weak references to tasks
+    
+    async def book_seat_two_phase(self, show, seat_id, user_id):
+        """Book seat using two-phase approach (reserve + confirm)"""
+        success, message, _ = await self.book_seats_two_phase(show, [seat_id], user_id)
+        return success, message
+    
+    async def book_seats_two_phase(self, show, seat_ids, user_id):
+        """Reserve, await payment, confirm; the hold is released if the task is cancelled"""
+        async_show = AsyncShow(show, self.releases)
+        
+        # Phase 1: Reserve the seats; cancelled while it waits for the journal, it drops the hold itself
+        success, conflicts = await async_show.reserve_seats(seat_ids, user_id)
+        if not success:
+            return False, "Seat not available", conflicts
+        
+        confirmed = False
+        try:
+            # Simulate payment processing without blocking the loop
+            await asyncio.sleep(random.uniform(*self.payment_time_range))
+            
+            if random.random() >= self.payment_success_rate:
+                return False, "Payment failed", []
+            
+            # Phase 2: Confirm the booking
+            confirmed, conflicts = await async_show.confirm_bookings(seat_ids, user_id)
+            if confirmed:
+                return True, "Booking confirmed", []
+            return False, "Booking confirmation failed", conflicts
+        finally:
+            # Runs on payment failure, errors and CancelledError alike. A confirm
+            # that booked the seats returns even when cancelled, so confirmed is
+            # never False for booked seats. The release is its own task behind a
+            # shield, so a second cancellation stops the wait but never the release.
+            if not confirmed:
+                await async_show.release(seat_ids, user_id)
+
+
+def test_async_booking(book_my_show, users=1000):
+    """Many users racing for the same handful of seats on one event loop"""
+    service = AsyncTwoPhaseBookingService(payment_time_range=(0.05, 0.2))
+    show = book_my_show._get_show(City.BANGALORE, "BAAHUBALI")
+    
+    async def run():
+        return await asyncio.gather(*[
+            service.book_seat_two_phase(show, user % 10, f"User{user}") for user in range(users)
+        ])
+    
+    results = asyncio.run(run())
+    print(f"Confirmed: {sum(1 for success, _ in results if success)} of {users} attempts")
+    print(f"Final booked seats: {show.booked_seat_ids}")
+
+
+# Main execution
+if __name__ == "__main__":
+    from concurrency_handle_show import BookMyShow
+    
+    book_my_show = BookMyShow()
+    book_my_show.initialize()
+    test_async_booking(book_my_show)
@@ -0,0 +1,1004 @@
+# benchmarks.py
+# Micro-benchmarks for the concurrent BookMyShow implementation.
+# Run all of them with `python benchmarks.py` or pick some by name,
+# e.g. `python benchmarks.py hold_expiry`.
+import asyncio
+import contextlib
+import csv
+import gc
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from async_booking import AsyncTwoPhaseBookingService
+from booking_events import (
+    BookableShowsProjection,
+    BookingEventStream,
+    ShowAvailabilityProjection,
+    TheatreOccupancyProjection,
+)
+from booking_journal import BookingJournal
+from booking_metrics import METRICS
+from catalog_loader import load_catalog
+from distributed_lock import InProcessLockProvider, UnixSocketLockProvider, serve_lock_server
+from concurrency_handle_show import (
+    BookMyShow,
+    City,
+    Movie,
+    MovieController,
+    PessimisticLockingBookingService,
+    Screen,
+    Seat,
+    SeatCategory,
+    SeatLockingBookingService,
+    SeatState,
+    Show,
+    SingleWriterBookingService,
+    Theatre,
+    TheatreController,
+    TwoPhaseBookingService,
+)
+from idempotency import IdempotencyCache
+from load_test import percentile
+from sharded_book_my_show import ShardedBookMyShow
+from sqlite_store import SQLiteMovieController, SQLiteStore, SQLiteTheatreController
+from waiting_room import ShowWaitingRoom
+
+
+def build_show(num_seats, show_id=1):
+    """Show on a single screen with num_seats seats split evenly across categories"""
+    categories = list(SeatCategory)
+    seats = []
+    for seat_id in range(num_seats):
+        seat = Seat()
+        seat.set_seat_id(seat_id)
+        seat.set_seat_category(categories[seat_id * len(categories) // num_seats])
+        seats.append(seat)
+    
+    screen = Screen()
+    screen.set_screen_id(1)
+    screen.set_seats(seats)
+    
+    show = Show()
+    show.set_show_id(show_id)
+    show.set_screen(screen)
+    return show
+
+
+def benchmark_hold_expiry(hold_counts=(100, 1_000, 10_000, 50_000), checks=20_000):
+    """Availability check latency and expiry cost as the number of active holds grows"""
+    print("\n=== Hold expiry ===")
+    print(f"{'holds':>8} {'check (us)':>12} {'expire/hold (us)':>18}")
+    
+    for hold_count in hold_counts:
+        show = build_show(hold_count + 1)
+        for seat_id in range(hold_count):
+            show.reserve_seat(seat_id, f"User{seat_id}")
+        
+        free_seat = hold_count
+        start = time.perf_counter()
+        for _ in range(checks):
+            show.is_seat_available(free_seat)
+        check_us = (time.perf_counter() - start) / checks * 1e6
+        
+        # Force every hold to be due and measure releasing them all
+        with show.reservation_lock:
+            past = datetime.now() - timedelta(seconds=1)
+            show.expiry_heap = [(past, sequence, reservation) for (_, sequence, reservation) in show.expiry_heap]
+        start = time.perf_counter()
+        show.cleanup_expired_reservations()
+        expire_us = (time.perf_counter() - start) / hold_count * 1e6
+        assert not show.seat_reservations
+        
+        print(f"{hold_count:>8} {check_us:>12.2f} {expire_us:>18.2f}")
+
+
+def run_threads(thread_count, target):
+    """Run target(thread_index) on thread_count threads released together; returns wall time"""
+    barrier = threading.Barrier(thread_count + 1)
+    
+    def worker(thread_index):
+        barrier.wait()
+        target(thread_index)
+    
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def benchmark_seat_locking(thread_counts=(1, 8, 32, 128), bookings_per_thread=4, processing_time=0.005):
+    """Show-wide lock vs per-seat lock stripes, every thread booking its own seats"""
+    print("\n=== Show lock vs seat locks (bookings/s) ===")
+    print(f"{'threads':>8} {'show lock':>12} {'seat locks':>12}")
+    
+    services = {
+        "show lock": lambda show, seat_id, user_id: PessimisticLockingBookingService(
+            (processing_time, processing_time)).book_seat_pessimistic(show, seat_id, user_id),
+        "seat locks": lambda show, seat_id, user_id: SeatLockingBookingService(
+            (processing_time, processing_time)).book_seat_fine_grained(show, seat_id, user_id),
+    }
+    
+    for thread_count in thread_counts:
+        row = []
+        for book in services.values():
+            show = build_show(thread_count * bookings_per_thread)
+            
+            def book_own_seats(thread_index):
+                for offset in range(bookings_per_thread):
+                    seat_id = thread_index * bookings_per_thread + offset
+                    success, _ = book(show, seat_id, f"User{thread_index}")
+                    assert success
+            
+            elapsed = run_threads(thread_count, book_own_seats)
+            assert len(show.booked_seat_ids) == thread_count * bookings_per_thread
+            row.append(thread_count * bookings_per_thread / elapsed)
+        print(f"{thread_count:>8} {row[0]:>12.0f} {row[1]:>12.0f}")
+
+
+def benchmark_async_holds(checkouts=10_000, payment_time=0.5, thread_workers=(32, 256)):
+    """Two-phase checkouts per second: one event loop vs a thread pool, every checkout on its own seat"""
+    print(f"\n=== Two-phase checkouts ({checkouts} users, {payment_time}s payment) ===")
+    print(f"{'mode':>22} {'checkouts/s':>12} {'peak holds':>12}")
+    
+    def report(mode, count, elapsed, show):
+        assert len(show.booked_seat_ids) == count
+        print(f"{mode:>22} {count / elapsed:>12.0f} {peak_holds[0]:>12}")
+    
+    def track_peak(show):
+        peak_holds[0] = max(peak_holds[0], len(show.seat_reservations))
+    
+    # asyncio: every checkout is a coroutine awaiting its payment
+    peak_holds = [0]
+    show = build_show(checkouts)
+    async_service = AsyncTwoPhaseBookingService(payment_time_range=(payment_time, payment_time), payment_success_rate=1.0)
+    
+    async def run_async():
+        tasks = [asyncio.create_task(async_service.book_seat_two_phase(show, seat_id, f"User{seat_id}"))
+                 for seat_id in range(checkouts)]
+        await asyncio.sleep(payment_time / 2)
+        track_peak(show)
+        await asyncio.gather(*tasks)
+    
+    start = time.perf_counter()
+    asyncio.run(run_async())
+    report("asyncio", checkouts, time.perf_counter() - start, show)
+    
+    # threads: in-flight payments are capped by the pool size, so a few rounds per worker
+    # are enough to measure the rate
+    threaded_service = TwoPhaseBookingService(payment_time_range=(payment_time, payment_time),
+                                              payment_success_rate=1.0, verbose=False)
+    for workers in thread_workers:
+        peak_holds = [0]
+        count = min(checkouts, workers * 5)
+        show = build_show(count)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(threaded_service.book_seat_two_phase, show, seat_id, f"User{seat_id}")
+                       for seat_id in range(count)]
+            time.sleep(payment_time / 2)
+            track_peak(show)
+            for future in futures:
+                future.result()
+        report(f"{workers} threads", count, time.perf_counter() - start, show)
+
+
+def benchmark_movie_catalog(title_count=100_000, lookups=200_000):
+    """Exact, per-city and prefix lookups against a large movie catalog"""
+    print(f"\n=== Movie catalog ({title_count} titles) ===")
+    movie_controller = MovieController()
+    cities = list(City)
+    
+    start = time.perf_counter()
+    for movie_id in range(title_count):
+        movie = Movie()
+        movie.set_movie_id(movie_id)
+        movie.set_movie_name(f"Movie Title {movie_id:06d}")
+        movie.set_movie_duration(120)
+        for city in cities:
+            movie_controller.add_movie(movie, city)
+    print(f"{'load (s)':>24} {time.perf_counter() - start:>10.2f}")
+    assert len(movie_controller.all_movies) == title_count
+    
+    names = [f"Movie Title {movie_id * 7919 % title_count:06d}" for movie_id in range(lookups)]
+    get_movie_by_name = movie_controller.get_movie_by_name
+    cases = {
+        "by name (us)": get_movie_by_name,
+        "by typed name (us)": lambda name: get_movie_by_name(f" {name.lower()}"),
+        "in city (us)": lambda name: movie_controller.get_movie_in_city(name, City.DELHI),
+        "prefix top-10 (us)": lambda name: movie_controller.search_movies_by_prefix(name[:15], City.DELHI),
+    }
+    for label, lookup in cases.items():
+        start = time.perf_counter()
+        for name in names:
+            lookup(name)
+        print(f"{label:>24} {(time.perf_counter() - start) / lookups * 1e6:>10.3f}")
+
+
+def measure_allocated(build):
+    """Bytes still allocated after build() returns, plus its result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return allocated, result
+
+
+def benchmark_seat_memory(seats_per_screen=500, shows=1_000):
+    """Bytes per seat for the screen's Seat objects and per seat per show for show state"""
+    print(f"\n=== Memory ({seats_per_screen} seats, {shows} shows on one screen) ===")
+    
+    seat_bytes, show = measure_allocated(lambda: build_show(seats_per_screen))
+    screen = show.get_screen()
+    print(f"{'seat objects (B/seat)':>32} {seat_bytes / seats_per_screen:>10.1f}")
+    
+    def build_shows():
+        built = []
+        for show_id in range(shows):
+            show = Show()
+            show.set_show_id(show_id)
+            show.set_screen(screen)
+            built.append(show)
+        return built
+    
+    show_bytes, built = measure_allocated(build_shows)
+    print(f"{'idle show state (B/seat/show)':>32} {show_bytes / (seats_per_screen * shows):>10.1f}")
+    
+    def touch_shows():
+        for show_id, show in enumerate(built):
+            show.reserve_seats([show_id % seats_per_screen], "User")
+            show.get_seat_map()
+    
+    touched_bytes, _ = measure_allocated(touch_shows)
+    print(f"{'after first hold (B/seat/show)':>32} {(show_bytes + touched_bytes) / (seats_per_screen * shows):>10.1f}")
+
+
+def build_city_catalog(cities, seats_per_show=20_000):
+    """One AVENGERS show per city on a large screen, with instant booking processing"""
+    book_my_show = BookMyShow()
+    book_my_show.pessimistic_service.processing_time_range = (0, 0)
+    movie = Movie()
+    movie.set_movie_id(1)
+    movie.set_movie_name("AVENGERS")
+    movie.set_movie_duration(128)
+    
+    for theatre_id, city in enumerate(cities, start=1):
+        show = build_show(seats_per_show, show_id=theatre_id)
+        show.set_movie(movie)
+        show.set_show_start_time(datetime.now() + timedelta(hours=1))
+        theatre = Theatre()
+        theatre.set_theatre_id(theatre_id)
+        theatre.set_city(city)
+        theatre.set_screens([show.get_screen()])
+        theatre.set_shows([show])
+        book_my_show.movie_controller.add_movie(movie, city)
+        book_my_show.theatre_controller.add_theatre(theatre, city)
+    return book_my_show
+
+
+def benchmark_sharding(shard_counts=(1, 2, 4, 8), bookings_per_city=2_000, seats_per_booking=4, batch_size=200):
+    """Group bookings per second across all cities: one process vs city-sharded worker processes"""
+    cities = list(City)
+    print(f"\n=== City sharding ({len(cities)} cities, {bookings_per_city} bookings each, "
+          f"{os.cpu_count()} CPUs) ===")
+    print(f"{'mode':>14} {'bookings/s':>12}")
+    
+    def city_calls(city):
+        return [
+            ("create_group_booking_pessimistic",
+             (city, "AVENGERS", f"User{index}", list(range(index * seats_per_booking, (index + 1) * seats_per_booking))))
+            for index in range(bookings_per_city)
+        ]
+    
+    # Baseline: one BookMyShow, one client thread per city, all on one GIL
+    book_my_show = build_city_catalog(cities)
+    
+    def book_city_in_process(city_index):
+        for method, args in city_calls(cities[city_index]):
+            booking, _ = getattr(book_my_show, method)(*args)
+            assert booking is not None
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed = run_threads(len(cities), book_city_in_process)
+    print(f"{'in-process':>14} {len(cities) * bookings_per_city / elapsed:>12.0f}")
+    
+    for shard_count in shard_counts:
+        with ShardedBookMyShow(shard_count, initializer=build_city_catalog) as sharded:
+            sharded.search_movies(cities[0], "a")  # wait until shards are up
+            for shard in sharded.shards:
+                shard.submit([]).result()
+            
+            def book_city_sharded(city_index):
+                city = cities[city_index]
+                calls = city_calls(city)
+                futures = [sharded.call_batch(city, calls[start:start + batch_size])
+                           for start in range(0, len(calls), batch_size)]
+                for future in futures:
+                    assert all(ok and result[0] is not None for ok, result in future.result())
+            
+            elapsed = run_threads(len(cities), book_city_sharded)
+        print(f"{f'{shard_count} shards':>14} {len(cities) * bookings_per_city / elapsed:>12.0f}")
+
+
+def benchmark_journal(thread_counts=(1, 8, 64), bookings_per_thread=200, recovery_records=50_000):
+    """Durable bookings per second with group commit, and recovery time with and without a checkpoint"""
+    print("\n=== Booking journal ===")
+    print(f"{'threads':>8} {'in-memory/s':>12} {'journaled/s':>12} {'records/fsync':>14}")
+    
+    for thread_count in thread_counts:
+        row = []
+        for journaled in (False, True):
+            show = build_show(thread_count * bookings_per_thread)
+            directory = tempfile.mkdtemp()
+            journal = BookingJournal(directory)
+            if journaled:
+                journal.recover([show])
+            
+            def book_own_seats(thread_index):
+                for offset in range(bookings_per_thread):
+                    assert show.try_book_seat(thread_index * bookings_per_thread + offset)
+            
+            row.append(thread_count * bookings_per_thread / run_threads(thread_count, book_own_seats))
+            records_per_fsync = journal.get_stats()["records_per_fsync"]
+            journal.close()
+            shutil.rmtree(directory)
+        print(f"{thread_count:>8} {row[0]:>12.0f} {row[1]:>12.0f} {records_per_fsync:>14.1f}")
+    
+    print(f"{'recovery of':>14} {'records':>8} {'replayed':>9} {'seconds':>8}")
+    for checkpointed in (False, True):
+        directory = tempfile.mkdtemp()
+        show = build_show(recovery_records)
+        journal = BookingJournal(directory)
+        journal.recover([show])
+        for seat_id in range(recovery_records):
+            show.reserve_seats([seat_id], "User")
+            show.confirm_bookings([seat_id], "User")
+        if checkpointed:
+            journal.checkpoint([show])
+        journal.close()
+        
+        recovered = build_show(recovery_records)
+        journal = BookingJournal(directory)
+        start = time.perf_counter()
+        replayed = journal.recover([recovered])
+        elapsed = time.perf_counter() - start
+        assert recovered.booked_seat_ids == show.booked_seat_ids
+        journal.close()
+        shutil.rmtree(directory)
+        label = "checkpoint" if checkpointed else "journal only"
+        print(f"{label:>14} {2 * recovery_records:>8} {replayed:>9} {elapsed:>8.3f}")
+
+
+def build_stores(num_seats, pool_size):
+    """The same one-show catalog in the in-memory controllers and in a fresh SQLite file"""
+    directory = tempfile.mkdtemp()
+    store = SQLiteStore(os.path.join(directory, "book_my_show.db"), pool_size)
+    stores = {
+        "in-memory": (MovieController(), TheatreController()),
+        "sqlite": (SQLiteMovieController(store), SQLiteTheatreController(store)),
+    }
+    for movie_controller, theatre_controller in stores.values():
+        movie = Movie()
+        movie.set_movie_id(1)
+        movie.set_movie_name("AVENGERS")
+        movie_controller.add_movie(movie, City.BANGALORE)
+        show = build_show(num_seats)
+        show.set_movie(movie)
+        theatre = Theatre()
+        theatre.set_theatre_id(1)
+        theatre.set_screens([show.get_screen()])
+        theatre.set_shows([show])
+        theatre_controller.add_theatre(theatre, City.BANGALORE)
+    return stores, store, directory
+
+
+def benchmark_sqlite_store(thread_counts=(1, 8, 32), bookings_per_thread=100, seats_per_booking=4,
+                           lookups=5_000, pool_size=8):
+    """Group bookings and show lookups per second: in-memory controllers vs the SQLite store"""
+    print(f"\n=== In-memory vs SQLite store (pool of {pool_size}, {seats_per_booking}-seat bookings) ===")
+    print(f"{'store':>10} {'threads':>8} {'bookings/s':>12} {'lookups/s':>12}")
+    
+    service = SeatLockingBookingService((0, 0))
+    for thread_count in thread_counts:
+        stores, store, directory = build_stores(thread_count * bookings_per_thread * seats_per_booking, pool_size)
+        for name, (movie_controller, theatre_controller) in stores.items():
+            def find_show():
+                movie = movie_controller.get_movie_in_city("AVENGERS", City.BANGALORE)
+                return next(iter(theatre_controller.get_all_show(movie, City.BANGALORE).values()))[0]
+            
+            show = find_show()
+            
+            def book_own_seats(thread_index):
+                for booking in range(bookings_per_thread):
+                    first = (thread_index * bookings_per_thread + booking) * seats_per_booking
+                    success, _, _ = service.book_seats_fine_grained(
+                        show, range(first, first + seats_per_booking), f"User{thread_index}")
+                    assert success
+            
+            bookings_per_second = thread_count * bookings_per_thread / run_threads(thread_count, book_own_seats)
+            assert len(show.booked_seat_ids) == thread_count * bookings_per_thread * seats_per_booking
+            
+            start = time.perf_counter()
+            for _ in range(lookups):
+                find_show()
+            lookups_per_second = lookups / (time.perf_counter() - start)
+            print(f"{name:>10} {thread_count:>8} {bookings_per_second:>12.0f} {lookups_per_second:>12.0f}")
+        store.close()
+        shutil.rmtree(directory)
+
+
+def benchmark_instrumentation(operations=50_000, thread_count=32, bookings_per_thread=200):
+    """Hot-path cost of the metrics hooks: bare C RLocks, instrumented locks with metrics off, metrics on"""
+    print("\n=== Instrumentation overhead ===")
+    print(f"{'mode':>18} {'reserve+cancel/s':>17} {f'{thread_count}-thread bookings/s':>22}")
+    
+    service = PessimisticLockingBookingService((0, 0))
+    for mode in ("plain RLock", "metrics off", "metrics on"):
+        METRICS.reset()
+        show = build_show(thread_count * bookings_per_thread)
+        if mode == "plain RLock":
+            show.lock, show.reservation_lock = threading.RLock(), threading.RLock()
+        elif mode == "metrics on":
+            METRICS.enable()  # after the show is built: its locks start timing at runtime
+        
+        start = time.perf_counter()
+        for operation in range(operations):
+            show.reserve_seats([operation % 64], "User")
+            show.cancel_reservations([operation % 64], "User")
+        single_thread = operations / (time.perf_counter() - start)
+        
+        def book_own_seats(thread_index):
+            for offset in range(bookings_per_thread):
+                service.book_seat_pessimistic(show, thread_index * bookings_per_thread + offset, "User")
+        
+        contended = thread_count * bookings_per_thread / run_threads(thread_count, book_own_seats)
+        METRICS.disable()
+        print(f"{mode:>18} {single_thread:>17.0f} {contended:>22.0f}")
+    
+    for histogram in METRICS.snapshot()["histograms"]:
+        if histogram["name"] == "lock_wait_seconds" or histogram["labels"].get("operation") == "book":
+            print(f"  {histogram['name']} {histogram['labels']}: count={histogram['count']}"
+                  f" p50={histogram['p50'] * 1e6:.0f}us p99={histogram['p99'] * 1e6:.0f}us")
+    METRICS.reset()
+
+
+def benchmark_waiting_room(users=400, processing_time=0.002, max_active_checkouts=(None, 16, 4)):
+    """Overload on one show: every user at once vs admitted through a waiting room"""
+    print(f"\n=== Waiting room ({users} users at once, pessimistic booking) ===")
+    print(f"{'max active':>10} {'bookings/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'lock wait p99 ms':>17} {'waiters':>8}")
+    
+    service = PessimisticLockingBookingService((processing_time, processing_time))
+    for max_active in max_active_checkouts:
+        METRICS.reset()
+        METRICS.enable()
+        show = build_show(users)
+        room = ShowWaitingRoom(release_rate=1e6, burst=users, max_active_checkouts=max_active) if max_active else None
+        latencies = []
+        
+        def book(user_index):
+            start = time.perf_counter()
+            if room is None:
+                success, _ = service.book_seat_pessimistic(show, user_index, f"User{user_index}")
+            else:
+                with room.admission(f"User{user_index}"):
+                    success, _ = service.book_seat_pessimistic(show, user_index, f"User{user_index}")
+            assert success
+            latencies.append(time.perf_counter() - start)
+        
+        elapsed = run_threads(users, book)
+        METRICS.disable()
+        lock_wait = METRICS.histogram("lock_wait_seconds", (("show", 1), ("lock", "show"))).snapshot()
+        latencies.sort()
+        print(f"{max_active or 'none':>10} {users / elapsed:>11.0f} {latencies[len(latencies) // 2] * 1000:>8.1f}"
+              f" {latencies[int(len(latencies) * 0.99)] * 1000:>8.1f} {lock_wait['p99'] * 1000:>17.2f}"
+              f" {max_active or users:>8}")
+    METRICS.reset()
+
+
+def benchmark_single_writer(thread_counts=(1, 8, 32, 128), bookings_per_thread=200, journaled=(False, True)):
+    """One hot show: callers taking the show locks vs handing commands to the show's single writer"""
+    print("\n=== Show locks vs single writer (bookings/s, one hot show) ===")
+    print(f"{'threads':>8} {'journal':>8} {'show lock':>10} {'seat locks':>11} {'single writer':>14} {'avg batch':>10}")
+    
+    for journal_on in journaled:
+        for thread_count in thread_counts:
+            row = []
+            for name in ("show lock", "seat locks", "single writer"):
+                show = build_show(thread_count * bookings_per_thread)
+                directory = journal = None
+                if journal_on:
+                    directory = tempfile.mkdtemp()
+                    journal = BookingJournal(directory)
+                    journal.recover([show])
+                if name == "show lock":
+                    book = PessimisticLockingBookingService((0, 0)).book_seat_pessimistic
+                elif name == "seat locks":
+                    book = SeatLockingBookingService((0, 0)).book_seat_fine_grained
+                else:
+                    service = SingleWriterBookingService((0, 0))
+                    book = service.book_seat_single_writer
+                
+                def book_own_seats(thread_index):
+                    for offset in range(bookings_per_thread):
+                        success, _ = book(show, thread_index * bookings_per_thread + offset, f"User{thread_index}")
+                        assert success
+                
+                row.append(thread_count * bookings_per_thread / run_threads(thread_count, book_own_seats))
+                if journal is not None:
+                    journal.close()
+                    shutil.rmtree(directory)
+            stats = service.get_stats()
+            service.close()
+            print(f"{thread_count:>8} {'on' if journal_on else 'off':>8} {row[0]:>10.0f} {row[1]:>11.0f}"
+                  f" {row[2]:>14.0f} {stats['average_batch_size']:>10.1f}")
+
+
+def benchmark_projections(theatre_counts=(10, 100, 500), shows_per_theatre=4, num_seats=300, operations=20_000):
+    """Listing-page reads from the event-fed projections vs scanning every show's seats"""
+    print(f"\n=== Listing reads: seat scan vs projections ({num_seats} seats per show) ===")
+    print(f"{'shows':>8} {'scan (ms)':>10} {'projections (ms)':>17} {'speedup':>8}")
+    
+    movie = Movie()
+    movie.set_movie_id(1)
+    movie.set_movie_name("AVENGERS")
+    for theatre_count in theatre_counts:
+        theatre_controller = TheatreController()
+        stream = BookingEventStream()
+        availability = ShowAvailabilityProjection()
+        bookable = BookableShowsProjection()
+        for projection in (availability, bookable, TheatreOccupancyProjection()):
+            stream.subscribe(projection)
+        theatre_controller.set_event_stream(stream)
+        
+        rng = random.Random(1)
+        screen = build_show(num_seats).get_screen()
+        for theatre_id in range(theatre_count):
+            theatre = Theatre()
+            theatre.set_theatre_id(theatre_id)
+            theatre.set_screens([screen])
+            theatre.set_shows([])
+            theatre_controller.add_theatre(theatre, City.BANGALORE)
+            for index in range(shows_per_theatre):
+                show = Show()
+                show.set_show_id(theatre_id * shows_per_theatre + index)
+                show.set_screen(screen)
+                show.set_movie(movie)
+                show.set_show_start_time(datetime.now() + timedelta(hours=index))
+                theatre_controller.add_show(theatre, show)
+                show.try_book_seats(rng.sample(range(num_seats), rng.randrange(num_seats)))
+        
+        def scan():
+            listing = []
+            for shows in theatre_controller.get_all_show(movie, City.BANGALORE).values():
+                for show in shows:
+                    counts = {}
+                    for seat in show.get_screen().get_seats():
+                        if show.is_seat_available(seat.get_seat_id()):
+                            category = seat.get_seat_category()
+                            counts[category] = counts.get(category, 0) + 1
+                    if counts:
+                        listing.append((show, counts))
+            return listing
+        
+        def project():
+            return [(show, availability.get_availability(show.get_show_id()))
+                    for show in bookable.get_bookable_shows(movie, City.BANGALORE)]
+        
+        timings = []
+        for listing in (scan, project):
+            start = time.perf_counter()
+            result = listing()
+            timings.append((time.perf_counter() - start) * 1000)
+        assert len(result) == len(scan())
+        print(f"{theatre_count * shows_per_theatre:>8} {timings[0]:>10.2f} {timings[1]:>17.3f}"
+              f" {timings[0] / timings[1]:>7.0f}x")
+    
+    print(f"{'stream':>8} {'reserve+cancel/s':>17}")
+    for attached in (False, True):
+        show = build_show(num_seats)
+        if attached:
+            stream = BookingEventStream()
+            for projection in (ShowAvailabilityProjection(), BookableShowsProjection(), TheatreOccupancyProjection()):
+                stream.subscribe(projection)
+            theatre = Theatre()
+            theatre.set_theatre_id(1)
+            show.set_movie(movie)
+            stream.attach(show, theatre, City.BANGALORE)
+        start = time.perf_counter()
+        for operation in range(operations):
+            show.reserve_seats([operation % 64], "User")
+            show.cancel_reservations([operation % 64], "User")
+        print(f"{'on' if attached else 'off':>8} {operations / (time.perf_counter() - start):>17.0f}")
+
+
+def benchmark_category_counters(theatre_counts=(10, 100, 500), shows_per_theatre=4, num_seats=300, operations=20_000):
+    """City availability summary from the per-category counters vs scanning every seat of every show"""
+    print(f"\n=== City availability: seat scan vs category counters ({num_seats} seats per show) ===")
+    print(f"{'shows':>8} {'scan (ms)':>10} {'counters (ms)':>14} {'speedup':>8}")
+    
+    movie = Movie()
+    movie.set_movie_id(1)
+    movie.set_movie_name("AVENGERS")
+    prices = {SeatCategory.SILVER: 150, SeatCategory.GOLD: 250, SeatCategory.PLATINUM: 400}
+    for theatre_count in theatre_counts:
+        book_my_show = BookMyShow()
+        book_my_show.movie_controller.add_movie(movie, City.BANGALORE)
+        rng = random.Random(1)
+        screen = build_show(num_seats).get_screen()
+        for theatre_id in range(theatre_count):
+            theatre = Theatre()
+            theatre.set_theatre_id(theatre_id)
+            theatre.set_screens([screen])
+            theatre.set_shows([])
+            book_my_show.theatre_controller.add_theatre(theatre, City.BANGALORE)
+            for index in range(shows_per_theatre):
+                show = Show()
+                show.set_show_id(theatre_id * shows_per_theatre + index)
+                show.set_screen(screen)
+                show.set_movie(movie)
+                show.set_show_start_time(datetime.now() + timedelta(hours=index + 1))
+                show.set_category_prices(prices)
+                book_my_show.theatre_controller.add_show(theatre, show)
+                seat_ids = rng.sample(range(num_seats), rng.randrange(num_seats))
+                show.try_book_seats(seat_ids[::2])
+                show.reserve_seats(seat_ids[1::2], "User")
+        
+        def scan():
+            summary = {}
+            shows, _ = book_my_show.search_shows(City.BANGALORE, "AVENGERS", limit=None)
+            for show in shows:
+                snapshot = show.get_seat_map()
+                for seat in show.get_screen().get_seats():
+                    counts = summary.setdefault(seat.get_seat_category(), [0, 0, 0])
+                    counts[snapshot.states[seat.get_seat_id()]] += 1
+            return summary
+        
+        def count():
+            return book_my_show.get_city_availability(City.BANGALORE, "AVENGERS")
+        
+        timings = []
+        for summarize in (scan, count):
+            start = time.perf_counter()
+            result = summarize()
+            timings.append((time.perf_counter() - start) * 1000)
+        assert {category: totals["available"] for category, totals in result.items()} == {
+            category: counts[SeatState.AVAILABLE.value] for category, counts in scan().items()}
+        print(f"{theatre_count * shows_per_theatre:>8} {timings[0]:>10.2f} {timings[1]:>14.3f}"
+              f" {timings[0] / timings[1]:>7.0f}x")
+    
+    show = build_show(num_seats)
+    start = time.perf_counter()
+    for operation in range(operations):
+        show.reserve_seats([operation % 64], "User")
+        show.cancel_reservations([operation % 64], "User")
+    print(f"reserve+cancel/s with counters: {operations / (time.perf_counter() - start):.0f}")
+
+
+def benchmark_show_search(show_counts=(1_000, 10_000, 100_000), queries=200, page_size=20):
+    """"Shows of a movie between 18:00 and 22:00 tomorrow": filtering get_all_show vs the start-time index"""
+    print("\n=== Show search by time window (one movie, one city) ===")
+    print(f"{'shows':>8} {'filter (us)':>12} {'index (us)':>11} {'next page (us)':>15} {'matches':>8}")
+    
+    movie = Movie()
+    movie.set_movie_id(1)
+    movie.set_movie_name("AVENGERS")
+    screen = build_show(10).get_screen()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for show_count in show_counts:
+        theatre_controller = TheatreController()
+        rng = random.Random(1)
+        theatres = []
+        for theatre_id in range(max(1, show_count // 20)):
+            theatre = Theatre()
+            theatre.set_theatre_id(theatre_id)
+            theatre.set_screens([screen])
+            theatre.set_shows([])
+            theatre_controller.add_theatre(theatre, City.BANGALORE)
+            theatres.append(theatre)
+        for show_id in range(show_count):
+            show = Show()
+            show.set_show_id(show_id)
+            show.set_screen(screen)
+            show.set_movie(movie)
+            # Two weeks of shows, every 15 minutes between 09:00 and 23:45
+            show.set_show_start_time(today + timedelta(days=rng.randrange(14), minutes=540 + 15 * rng.randrange(60)))
+            theatre_controller.add_show(rng.choice(theatres), show)
+        
+        start, end = today + timedelta(days=1, hours=18), today + timedelta(days=1, hours=22)
+        
+        def filter_all():
+            return sorted(
+                (show for shows in theatre_controller.get_all_show(movie, City.BANGALORE).values() for show in shows
+                 if start <= show.get_show_start_time() < end),
+                key=lambda show: (show.get_show_start_time(), show.get_show_id()),
+            )[:page_size]
+        
+        timings = []
+        for search in (filter_all, lambda: theatre_controller.find_shows(movie, City.BANGALORE, start, end, page_size)[0]):
+            began = time.perf_counter()
+            for _ in range(queries):
+                page = search()
+            timings.append((time.perf_counter() - began) / queries * 1e6)
+        assert page == filter_all()
+        
+        _, cursor = theatre_controller.find_shows(movie, City.BANGALORE, start, end, page_size)
+        began = time.perf_counter()
+        for _ in range(queries):
+            theatre_controller.find_shows(movie, City.BANGALORE, start, end, page_size, after=cursor)
+        next_page = (time.perf_counter() - began) / queries * 1e6
+        matches = len(theatre_controller.find_shows(movie, City.BANGALORE, start, end)[0])
+        print(f"{show_count:>8} {timings[0]:>12.0f} {timings[1]:>11.1f} {next_page:>15.1f} {matches:>8}")
+
+
+def benchmark_idempotency(bookings=5_000, requests=200_000, retry_fraction=0.3, capacities=(1_000, 10_000, 100_000),
+                          thread_count=32):
+    """Cost of a booking vs a retried one, and the hit rate a bounded idempotency cache keeps"""
+    print(f"\n=== Idempotency keys ({bookings} pessimistic bookings) ===")
+    print(f"{'call':>18} {'us/call':>9}")
+    book_my_show = build_city_catalog([City.BANGALORE], seats_per_show=3 * bookings)
+    book = book_my_show.create_booking_pessimistic
+    rows = (
+        ("booking, no key", lambda index: book(City.BANGALORE, "AVENGERS", f"User{index}", index)),
+        ("booking, new key", lambda index: book(City.BANGALORE, "AVENGERS", f"User{index}", bookings + index,
+                                                idempotency_key=f"first-{index}")),
+        ("retry", lambda index: book(City.BANGALORE, "AVENGERS", f"User{index}", bookings + index,
+                                     idempotency_key=f"first-{index}")),
+    )
+    for name, call in rows:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for index in range(bookings):
+                assert call(index) is not None
+            elapsed = time.perf_counter() - start
+        print(f"{name:>18} {elapsed / bookings * 1e6:>9.1f}")
+    
+    # Same key from every thread at once: one booking, everyone else waits for its result
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_threads(thread_count, lambda _: results.append(
+            book(City.BANGALORE, "AVENGERS", "UserX", 2 * bookings, idempotency_key="burst")))
+    stats = book_my_show.idempotency_cache.get_stats()
+    print(f"{thread_count} concurrent retries: {len({id(result) for result in results})} booking,"
+          f" {stats['waits']} waited for it")
+    
+    print(f"\n{requests} requests, {retry_fraction:.0%} retrying one of the last 50k keys")
+    print(f"{'capacity':>9} {'hit rate':>9} {'evictions':>10} {'size':>8}")
+    rng = random.Random(7)
+    workload = []
+    issued = 0
+    for _ in range(requests):
+        if issued and rng.random() < retry_fraction:
+            workload.append(rng.randrange(max(0, issued - 50_000), issued))
+        else:
+            workload.append(issued)
+            issued += 1
+    for capacity in capacities:
+        cache = IdempotencyCache(capacity=capacity)
+        for key in workload:
+            cache.get_or_run(key, None, tuple)
+        stats = cache.get_stats()
+        print(f"{capacity:>9} {stats['hit_rate']:>9.1%} {stats['evictions']:>10} {stats['size']:>8}")
+
+
+def write_synthetic_catalog(directory, theatres, shows_per_theatre, screens_per_theatre=2, movies=1_000,
+                            file_format="jsonl"):
+    """Catalog files for load_catalog: theatres spread over every city, ~300-seat screens, shows over a week"""
+    layouts = ("SILVER:10x15,GOLD:6x15,PLATINUM:4x15", "SILVER:8x20,GOLD:4x20,PLATINUM:3x20",
+               "SILVER:12x12,GOLD:8x12,PLATINUM:4x12")
+    cities = [city.value for city in City]
+    first_show = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    
+    def write(name, columns, rows):
+        with open(os.path.join(directory, f"{name}.{file_format}"), "w", newline="") as catalog_file:
+            if file_format == "csv":
+                writer = csv.writer(catalog_file)
+                writer.writerow(columns)
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    catalog_file.write(json.dumps(dict(zip(columns, row))) + "\n")
+    
+    def join(values):
+        return values if file_format == "jsonl" else "|".join(values)
+    
+    prices = {"SILVER": 150, "GOLD": 250, "PLATINUM": 400}
+    write("movies", ("movie_id", "name", "duration_minutes", "cities"),
+          ((movie_id, f"MOVIE {movie_id}", 120, join(cities)) for movie_id in range(1, movies + 1)))
+    write("theatres", ("theatre_id", "city", "address"),
+          ((theatre_id, cities[theatre_id % len(cities)], f"{theatre_id} Main Road")
+           for theatre_id in range(1, theatres + 1)))
+    write("screens", ("theatre_id", "screen_id", "layout"),
+          ((theatre_id, screen_id, layouts[(theatre_id + screen_id) % len(layouts)])
+           for theatre_id in range(1, theatres + 1) for screen_id in range(1, screens_per_theatre + 1)))
+    write("shows", ("show_id", "theatre_id", "screen_id", "movie_id", "start_time", "prices"),
+          (((theatre_id - 1) * shows_per_theatre + index + 1, theatre_id, index % screens_per_theatre + 1,
+            (theatre_id * 7 + index) % movies + 1, (first_show + timedelta(hours=3 * index)).isoformat(),
+            prices if file_format == "jsonl" else "|".join(f"{category}:{price}" for category, price in prices.items()))
+           for theatre_id in range(1, theatres + 1) for index in range(shows_per_theatre)))
+
+
+def resident_megabytes():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+
+def load_catalog_in_child(directory, lazy, results):
+    """Runs in a fresh interpreter so the RSS growth is the catalog's alone"""
+    rss_before = resident_megabytes()
+    book_my_show = BookMyShow()
+    loaded = load_catalog(book_my_show, directory, lazy=lazy)
+    loaded["rss_mb"] = resident_megabytes() - rss_before
+    
+    # First booking on a show materializes its screen and state; the second pays only for the booking
+    show = book_my_show.get_all_shows()[0]
+    timings = []
+    for seat_id in (0, 1):
+        start = time.perf_counter()
+        assert show.try_book_seat(seat_id)
+        timings.append((time.perf_counter() - start) * 1e6)
+    loaded["first_booking_us"], loaded["next_booking_us"] = timings
+    results.put(loaded)
+
+
+def benchmark_catalog_load(scales=((2_000, 10), (20_000, 10)), formats=("jsonl", "csv"), eager_max_theatres=2_000):
+    """Startup time and RSS of streaming a synthetic catalog in, deferred vs fully built screens and shows"""
+    print("\n=== Catalog load (2 screens of ~300 seats per theatre, 1000 movies) ===")
+    print(f"{'theatres':>9} {'shows':>8} {'format':>7} {'mode':>9} {'seconds':>8} {'RSS MB':>8}"
+          f" {'1st booking us':>15} {'2nd booking us':>15}")
+    context = multiprocessing.get_context("spawn")
+    for theatres, shows_per_theatre in scales:
+        for file_format in formats:
+            directory = tempfile.mkdtemp()
+            try:
+                write_synthetic_catalog(directory, theatres, shows_per_theatre, file_format=file_format)
+                for lazy in (True, False):
+                    if not lazy and theatres > eager_max_theatres:
+                        continue  # every Seat of every screen up front: minutes and gigabytes
+                    results = context.Queue()
+                    child = context.Process(target=load_catalog_in_child, args=(directory, lazy, results))
+                    child.start()
+                    loaded = results.get()
+                    child.join()
+                    print(f"{theatres:>9} {loaded['shows']:>8} {file_format:>7} {'deferred' if lazy else 'eager':>9}"
+                          f" {loaded['seconds']:>8.2f} {loaded['rss_mb']:>8.0f} {loaded['first_booking_us']:>15.0f}"
+                          f" {loaded['next_booking_us']:>15.0f}")
+            finally:
+                shutil.rmtree(directory)
+
+
+def hold_and_release(provider, name, owner, count):
+    for _ in range(count):
+        provider.release(provider.acquire(name, owner))
+
+
+def lock_client_in_child(path, name, count, start, results):
+    """One booking node hammering the lock server: count acquire/release pairs once start is set"""
+    provider = UnixSocketLockProvider(path)
+    provider.release(provider.acquire(name, "warmup"))
+    start.wait()
+    started = time.perf_counter()
+    hold_and_release(provider, name, str(os.getpid()), count)
+    results.put((started, time.perf_counter()))
+    provider.close()
+
+
+def benchmark_distributed_lock(acquisitions=5_000, thread_counts=(1, 8, 32), process_counts=(1, 2, 4),
+                               bookings=2_000, booking_threads=16):
+    """Lease acquisition latency and throughput, in-process vs a lock server on a Unix socket"""
+    context = multiprocessing.get_context("spawn")
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "locks.sock")
+    ready = context.Event()
+    server = context.Process(target=serve_lock_server, args=(path,), kwargs={"ready": ready}, daemon=True)
+    server.start()
+    ready.wait()
+    providers = (("in-process", InProcessLockProvider()), ("unix socket", UnixSocketLockProvider(path)))
+    try:
+        print("\n=== Distributed lock: uncontended acquire latency (lock server in its own process) ===")
+        print(f"{'provider':>12} {'p50 us':>8} {'p99 us':>8} {'release us':>11}")
+        for provider_name, provider in providers:
+            acquire_times, release_times = [], []
+            for index in range(acquisitions):
+                start = time.perf_counter()
+                lease = provider.acquire(f"show:{index}", "bench")
+                acquired = time.perf_counter()
+                provider.release(lease)
+                acquire_times.append(acquired - start)
+                release_times.append(time.perf_counter() - acquired)
+            acquire_times.sort()
+            release_times.sort()
+            print(f"{provider_name:>12} {percentile(acquire_times, 0.5) * 1e6:>8.1f}"
+                  f" {percentile(acquire_times, 0.99) * 1e6:>8.1f} {percentile(release_times, 0.5) * 1e6:>11.1f}")
+        
+        print(f"\nThroughput, acquire+release pairs/s ({acquisitions} per run)")
+        print(f"{'provider':>12} {'threads':>8} {'one show':>10} {'own show':>10}")
+        for provider_name, provider in providers:
+            for thread_count in thread_counts:
+                per_thread = acquisitions // thread_count
+                rates = []
+                for shared in (True, False):
+                    elapsed = run_threads(thread_count, lambda index: hold_and_release(
+                        provider, "show:1" if shared else f"show:{index}", f"thread-{index}", per_thread))
+                    rates.append(per_thread * thread_count / elapsed)
+                print(f"{provider_name:>12} {thread_count:>8} {rates[0]:>10,.0f} {rates[1]:>10,.0f}")
+        
+        print("\nUnix socket, one client process per booking node, all on one show")
+        print(f"{'processes':>10} {'pairs/s':>10}")
+        for process_count in process_counts:
+            start, results = context.Event(), context.Queue()
+            per_process = acquisitions // process_count
+            clients = [context.Process(target=lock_client_in_child, args=(path, "show:1", per_process, start, results))
+                       for _ in range(process_count)]
+            for client in clients:
+                client.start()
+            time.sleep(0.5 * process_count)  # let the children import and connect
+            start.set()
+            spans = [results.get() for _ in clients]
+            for client in clients:
+                client.join()
+            elapsed = max(end for _, end in spans) - min(started for started, _ in spans)
+            print(f"{process_count:>10} {per_process * process_count / elapsed:>10,.0f}")
+        
+        print(f"\nPessimistic bookings, {booking_threads} threads, no processing time")
+        print(f"{'lock':>12} {'bookings/s':>11}")
+        for lock_name, provider in (("show.lock", None),) + providers:
+            show = build_show(bookings)
+            service = PessimisticLockingBookingService(processing_time_range=(0, 0), lock_provider=provider)
+            per_thread = bookings // booking_threads
+            elapsed = run_threads(booking_threads, lambda index: [
+                service.book_seat_pessimistic(show, index * per_thread + offset, f"User{index}")
+                for offset in range(per_thread)
+            ])
+            assert len(show.get_booked_seat_ids()) == per_thread * booking_threads
+            print(f"{lock_name:>12} {per_thread * booking_threads / elapsed:>11,.0f}")
+    finally:
+        providers[1][1].close()
+        server.terminate()
+        server.join()
+        shutil.rmtree(directory)
+
+
+BENCHMARKS = {
+    "hold_expiry": benchmark_hold_expiry,
+    "seat_locking": benchmark_seat_locking,
+    "async_holds": benchmark_async_holds,
+    "movie_catalog": benchmark_movie_catalog,
+    "seat_memory": benchmark_seat_memory,
+    "sharding": benchmark_sharding,
+    "journal": benchmark_journal,
+    "sqlite_store": benchmark_sqlite_store,
+    "instrumentation": benchmark_instrumentation,
+    "waiting_room": benchmark_waiting_room,
+    "single_writer": benchmark_single_writer,
+    "projections": benchmark_projections,
+    "show_search": benchmark_show_search,
+    "category_counters": benchmark_category_counters,
+    "catalog_load": benchmark_catalog_load,
+    "idempotency": benchmark_idempotency,
+    "distributed_lock": benchmark_distributed_lock,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
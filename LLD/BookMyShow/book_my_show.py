@@ -1,4 +1,4 @@
-from constant import City, SeatCategory
+from constant import City, SeatCategory, SeatState
 
 
 # movie.py
@@ -58,6 +58,7 @@ class Screen:
     def __init__(self):
         self.screen_id = None
         self.seats = []
+        self.seat_id_vs_seat = {}
     
     def get_screen_id(self):
         return self.screen_id
@@ -70,6 +71,38 @@ class Screen:
     
     def set_seats(self, seats):
         self.seats = seats
+        self.seat_id_vs_seat = {seat.get_seat_id(): seat for seat in seats}
+    
+    def get_seat(self, seat_id):
+        return self.seat_id_vs_seat.get(seat_id)
+
+
+# seat_state_map.py
+class SeatStateMap:
+    """Compact per-show seat state, one byte per seat indexed by seat_id"""
+    def __init__(self, seats):
+        size = max((seat.get_seat_id() for seat in seats), default=-1) + 1
+        self.states = bytearray(size)  # every seat starts AVAILABLE (0)
+        self.category_seat_ids = {}  # SeatCategory -> sorted seat ids
+        for seat in seats:
+            self.category_seat_ids.setdefault(seat.get_seat_category(), []).append(seat.get_seat_id())
+        for seat_ids in self.category_seat_ids.values():
+            seat_ids.sort()
+    
+    def set_state(self, seat_id, state):
+        self.states[seat_id] = state.value
+    
+    def is_booked(self, seat_id):
+        return 0 <= seat_id < len(self.states) and self.states[seat_id] == SeatState.BOOKED.value
+    
+    def seat_ids_in_state(self, state, category=None):
+        states = self.states
+        if category is not None:
+            return [seat_id for seat_id in self.category_seat_ids.get(category, []) if states[seat_id] == state.value]
+        return [seat_id for seat_id, value in enumerate(states) if value == state.value]
+    
+    def free_seats(self, category=None):
+        return self.seat_ids_in_state(SeatState.AVAILABLE, category)
 
 
 # show.py
@@ -79,7 +112,7 @@ class Show:
         self.movie = None
         self.screen = None
         self.show_start_time = None
-        self.booked_seat_ids = []
+        self.seat_states = SeatStateMap([])
     
     def get_show_id(self):
         return self.show_id
@@ -98,6 +131,7 @@ class Show:
     
     def set_screen(self, screen):
         self.screen = screen
+        self.seat_states = SeatStateMap(screen.get_seats())
     
     def get_show_start_time(self):
         return self.show_start_time
@@ -106,10 +140,16 @@ class Show:
         self.show_start_time = show_start_time
     
     def get_booked_seat_ids(self):
-        return self.booked_seat_ids
+        return self.seat_states.seat_ids_in_state(SeatState.BOOKED)
     
     def set_booked_seat_ids(self, booked_seat_ids):
-        self.booked_seat_ids = booked_seat_ids
+        for seat_id in self.get_booked_seat_ids():
+            self.seat_states.set_state(seat_id, SeatState.AVAILABLE)
+        for seat_id in booked_seat_ids:
+            self.seat_states.set_state(seat_id, SeatState.BOOKED)
+    
+    def get_seat_states(self):
+        return self.seat_states
 
 
 # payment.py
@@ -188,25 +228,45 @@ class Theatre:
 # movie_controller.py
 class MovieController:
     def __init__(self):
-        self.city_vs_movies = {}
-        self.all_movies = []
+        self.city_vs_movies = {}  # city -> {movie_id: Movie}
+        self.all_movies = []  # every movie exactly once
+        self.movie_id_vs_movie = {}
+        self.name_vs_movies = {}  # normalized name -> [Movie] in the order added; titles can repeat
+    
+    @staticmethod
+    def normalize_name(movie_name):
+        return " ".join(movie_name.split()).casefold()
     
     def add_movie(self, movie, city):
-        self.all_movies.append(movie)
+        movie_id = movie.get_movie_id()
+        if movie_id not in self.movie_id_vs_movie:
+            self.movie_id_vs_movie[movie_id] = movie
+            self.all_movies.append(movie)
+            self.name_vs_movies.setdefault(self.normalize_name(movie.get_movie_name()), []).append(movie)
         
         if city not in self.city_vs_movies:
-            self.city_vs_movies[city] = []
+            self.city_vs_movies[city] = {}
         
-        self.city_vs_movies[city].append(movie)
+        self.city_vs_movies[city][movie_id] = movie
     
     def get_movie_by_name(self, movie_name):
-        for movie in self.all_movies:
-            if movie.get_movie_name() == movie_name:
-                return movie
-        return None
+        """The first movie added under this name; get_movies_by_name lists every one"""
+        movies = self.name_vs_movies.get(self.normalize_name(movie_name))
+        return movies[0] if movies else None
+    
+    def get_movies_by_name(self, movie_name):
+        return list(self.name_vs_movies.get(self.normalize_name(movie_name), ()))
     
     def get_movies_by_city(self, city):
-        return self.city_vs_movies.get(city, [])
+        return list(self.city_vs_movies.get(city, {}).values())
+    
+    def get_movie_in_city(self, movie_name, city):
+        """The movie with this name running in the city (the first added, if several are), else None"""
+        city_movies = self.city_vs_movies.get(city, {})
+        for movie in self.name_vs_movies.get(self.normalize_name(movie_name), ()):
+            if movie.get_movie_id() in city_movies:
+                return movie
+        return None
 
 
 # theatre_controller.py
@@ -248,15 +308,8 @@ class BookMyShow:
         self.theatre_controller = TheatreController()
     
     def create_booking(self, user_city, movie_name):
-        # 1. search movie by my location
-        movies = self.movie_controller.get_movies_by_city(user_city)
-        
-        # 2. select the movie which you want to see
-        interested_movie = None
-        for movie in movies:
-            if movie.get_movie_name() == movie_name:
-                interested_movie = movie
-                break
+        # 1. search movie by my location and 2. select the movie which you want to see
+        interested_movie = self.movie_controller.get_movie_in_city(movie_name, user_city)
         
         if not interested_movie:
             print(f"Movie {movie_name} not found in {user_city.value}")
@@ -275,18 +328,14 @@ class BookMyShow:
         
         # 5. select the seat
         seat_number = 30
-        booked_seats = interested_show.get_booked_seat_ids()
+        seat_states = interested_show.get_seat_states()
         
-        if seat_number not in booked_seats:
-            booked_seats.append(seat_number)
+        if not seat_states.is_booked(seat_number):
+            seat_states.set_state(seat_number, SeatState.BOOKED)
             
             # start payment
             booking = Booking()
-            my_booked_seats = []
-            
-            for screen_seat in interested_show.get_screen().get_seats():
-                if screen_seat.get_seat_id() == seat_number:
-                    my_booked_seats.append(screen_seat)
+            my_booked_seats = [interested_show.get_screen().get_seat(seat_number)]
             
             booking.set_booked_seats(my_booked_seats)
             booking.set_show(interested_show)
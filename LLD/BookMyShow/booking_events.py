@@ -0,0 +1,336 @@
+# booking_events.py
+# In-process event stream of seat changes plus the read models built from it.
+# Every change a Show applies (reserve, confirm, book, cancel, expire) is
+# published as a SeatChange while the show's reservation_lock is still held,
+# so a show's events reach subscribers in the order they were applied.
+# Projections fold the events into the answers listing pages need
+# (availability per category, bookable shows per city and movie, theatre
+# occupancy) and serve them without touching any Show.
+#
+#   stream = BookingEventStream()
+#   availability = ShowAvailabilityProjection()
+#   stream.subscribe(availability)
+#   book_my_show.attach_event_stream(stream)
+#   availability.get_availability(show_id)
+import itertools
+import threading
+
+from concurrency_handle_show import SeatEvent, SeatState
+
+AVAILABLE, HELD, BOOKED = SeatState.AVAILABLE.value, SeatState.HELD.value, SeatState.BOOKED.value
+# (state before, state after) of every seat in an event; SET_BOOKED is the only event without one
+EVENT_TRANSITIONS = {
+    SeatEvent.RESERVE: (AVAILABLE, HELD),
+    SeatEvent.CONFIRM: (HELD, BOOKED),
+    SeatEvent.BOOK: (AVAILABLE, BOOKED),
+    SeatEvent.CANCEL: (HELD, AVAILABLE),
+    SeatEvent.EXPIRE: (HELD, AVAILABLE),
+}
+
+
+# Events
+class ShowAttached:
+    """First event of a show on a stream (again after a checkpoint restore): where it runs and its counts"""
+    __slots__ = ("sequence", "show", "theatre", "city", "counts")
+    
+    def __init__(self, sequence, show, theatre, city, counts):
+        self.sequence = sequence
+        self.show = show
+        self.theatre = theatre
+        self.city = city
+        self.counts = counts  # SeatCategory -> (available, held, booked)
+
+
+class ShowDetached:
+    __slots__ = ("sequence", "show")
+    
+    def __init__(self, sequence, show):
+        self.sequence = sequence
+        self.show = show
+
+
+class SeatChange:
+    """One applied SeatEvent and how it moved the [available, held, booked] counts
+    
+    seat_ids are the seats whose state changed (for SET_BOOKED that includes
+    the previously booked seats it released).
+    """
+    __slots__ = ("sequence", "show_id", "event", "seat_ids", "user_id", "deltas", "totals")
+    
+    def __init__(self, sequence, show_id, event, seat_ids, user_id, deltas, totals):
+        self.sequence = sequence
+        self.show_id = show_id
+        self.event = event
+        self.seat_ids = seat_ids
+        self.user_id = user_id
+        self.deltas = deltas  # SeatCategory -> [available, held, booked] change
+        self.totals = totals  # the same summed over every category
+
+
+# booking_event_stream.py
+class BookingEventStream:
+    """Fans seat changes out to subscribers synchronously, on the thread that made the change
+    
+    Subscribers must be quick and must not take show locks; an exception in
+    one is printed and does not fail the booking that published the event.
+    """
+    def __init__(self):
+        self.subscribers = []
+        self.sequences = itertools.count(1)
+        self.show_id_vs_location = {}  # show_id -> (theatre, city) of every attached show
+    
+    def subscribe(self, subscriber):
+        """subscriber.apply(event) receives every event published from now on"""
+        self.subscribers.append(subscriber)
+    
+    def attach(self, show, theatre=None, city=None):
+        """Start publishing show's changes; without theatre and city the show's last location is reused"""
+        with show.reservation_lock:
+            if theatre is None:
+                theatre, city = self.show_id_vs_location[show.get_show_id()]
+            self.show_id_vs_location[show.get_show_id()] = (theatre, city)
+            counts = show.get_category_counts()
+            show.event_stream = self
+            self._dispatch(ShowAttached(next(self.sequences), show, theatre, city, counts))
+    
+    def detach(self, show):
+        with show.reservation_lock:
+            if show.event_stream is not self:
+                return
+            show.event_stream = None
+            self.show_id_vs_location.pop(show.get_show_id(), None)
+            self._dispatch(ShowDetached(next(self.sequences), show))
+    
+    def publish(self, show, event, seat_ids, user_id, previous_states=None):
+        """Called by Show._apply_seat_event after applying event, with reservation_lock held
+        
+        previous_states (one SeatState value per seat) is only needed for
+        events missing from EVENT_TRANSITIONS.
+        """
+        seat_states = show.seat_states
+        seat_categories = seat_states.layout.seat_categories
+        deltas = {}
+        totals = [0, 0, 0]
+        if previous_states is None:
+            before, after = EVENT_TRANSITIONS[event]
+            for seat_id in seat_ids:
+                delta = deltas.get(seat_categories[seat_id])
+                if delta is None:
+                    delta = deltas[seat_categories[seat_id]] = [0, 0, 0]
+                delta[before] -= 1
+                delta[after] += 1
+            totals[before] -= len(seat_ids)
+            totals[after] += len(seat_ids)
+        else:
+            states = seat_states.states
+            changed_seat_ids = []
+            for seat_id, before in zip(seat_ids, previous_states):
+                after = states[seat_id]
+                if before != after:
+                    changed_seat_ids.append(seat_id)
+                    delta = deltas.get(seat_categories[seat_id])
+                    if delta is None:
+                        delta = deltas[seat_categories[seat_id]] = [0, 0, 0]
+                    delta[before] -= 1
+                    delta[after] += 1
+                    totals[before] -= 1
+                    totals[after] += 1
+            seat_ids = changed_seat_ids
+        self._dispatch(SeatChange(next(self.sequences), show.get_show_id(), event, seat_ids, user_id, deltas, totals))
+    
+    def _dispatch(self, event):
+        for subscriber in self.subscribers:
+            try:
+                subscriber.apply(event)
+            except Exception as e:
+                print(f"Event {event.sequence}: {type(subscriber).__name__} failed: {e}")
+
+
+# projections.py
+class Projection:
+    """Read model fed by a BookingEventStream; apply() dispatches on the event type under self.lock"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events_applied = 0
+    
+    def apply(self, event):
+        with self.lock:
+            if type(event) is SeatChange:
+                if event.deltas:
+                    self.on_seat_change(event)
+            elif type(event) is ShowAttached:
+                self.on_show_detached(event.show.get_show_id())
+                self.on_show_attached(event)
+            else:
+                self.on_show_detached(event.show.get_show_id())
+            self.events_applied += 1
+    
+    def on_show_attached(self, event):
+        pass
+    
+    def on_seat_change(self, event):
+        pass
+    
+    def on_show_detached(self, show_id):
+        pass
+
+
+class ShowAvailabilityProjection(Projection):
+    """Per show and SeatCategory: how many seats are available, held and booked"""
+    def __init__(self):
+        super().__init__()
+        self.show_id_vs_counts = {}  # show_id -> SeatCategory -> [available, held, booked]
+    
+    def on_show_attached(self, event):
+        self.show_id_vs_counts[event.show.get_show_id()] = {
+            category: list(category_counts) for category, category_counts in event.counts.items()
+        }
+    
+    def on_seat_change(self, event):
+        counts = self.show_id_vs_counts.get(event.show_id)
+        if counts is None:
+            return  # attached before this projection subscribed
+        for category, (available, held, booked) in event.deltas.items():
+            category_counts = counts[category]
+            category_counts[AVAILABLE] += available
+            category_counts[HELD] += held
+            category_counts[BOOKED] += booked
+    
+    def on_show_detached(self, show_id):
+        self.show_id_vs_counts.pop(show_id, None)
+    
+    def get_availability(self, show_id):
+        """SeatCategory -> {"available", "held", "booked"}; empty for an unknown show"""
+        with self.lock:
+            counts = self.show_id_vs_counts.get(show_id, {})
+            return {
+                category: {"available": available, "held": held, "booked": booked}
+                for category, (available, held, booked) in counts.items()
+            }
+    
+    def get_available_count(self, show_id, seat_category=None):
+        with self.lock:
+            counts = self.show_id_vs_counts.get(show_id, {})
+            if seat_category is not None:
+                return counts[seat_category][AVAILABLE] if seat_category in counts else 0
+            return sum(category_counts[AVAILABLE] for category_counts in counts.values())
+
+
+class BookableShowsProjection(Projection):
+    """Per (city, movie): the shows that still have an available seat"""
+    def __init__(self):
+        super().__init__()
+        self.show_id_vs_entry = {}  # show_id -> [available seats, (city, movie_id), show]
+        self.city_movie_vs_shows = {}  # (city, movie_id) -> {show_id: show} with seats left
+    
+    def on_show_attached(self, event):
+        show = event.show
+        key = (event.city, show.get_movie().get_movie_id())
+        available = sum(counts[AVAILABLE] for counts in event.counts.values())
+        self.show_id_vs_entry[show.get_show_id()] = [available, key, show]
+        if available:
+            self.city_movie_vs_shows.setdefault(key, {})[show.get_show_id()] = show
+    
+    def on_seat_change(self, event):
+        entry = self.show_id_vs_entry.get(event.show_id)
+        if entry is None:
+            return
+        was_bookable = entry[0] > 0
+        entry[0] += event.totals[AVAILABLE]
+        if entry[0] > 0 and not was_bookable:
+            self.city_movie_vs_shows.setdefault(entry[1], {})[event.show_id] = entry[2]
+        elif entry[0] <= 0 and was_bookable:
+            self._remove(entry[1], event.show_id)
+    
+    def on_show_detached(self, show_id):
+        entry = self.show_id_vs_entry.pop(show_id, None)
+        if entry is not None:
+            self._remove(entry[1], show_id)
+    
+    def _remove(self, key, show_id):
+        shows = self.city_movie_vs_shows.get(key)
+        if shows is not None:
+            shows.pop(show_id, None)
+            if not shows:
+                del self.city_movie_vs_shows[key]
+    
+    def get_bookable_shows(self, movie, city):
+        """Shows of movie in city with at least one available seat"""
+        with self.lock:
+            return list(self.city_movie_vs_shows.get((city, movie.get_movie_id()), {}).values())
+    
+    def get_bookable_count(self, movie, city):
+        with self.lock:
+            return len(self.city_movie_vs_shows.get((city, movie.get_movie_id()), ()))
+
+
+class TheatreOccupancyProjection(Projection):
+    """Per theatre, over all its attached shows: seats, held and booked"""
+    def __init__(self):
+        super().__init__()
+        self.show_id_vs_theatre_id = {}
+        self.show_id_vs_totals = {}  # show_id -> [seats, held, booked]
+        self.theatre_id_vs_totals = {}  # theatre_id -> [seats, held, booked]
+    
+    def on_show_attached(self, event):
+        theatre_id = event.theatre.get_theatre_id()
+        totals = [0, 0, 0]
+        for available, held, booked in event.counts.values():
+            totals[0] += available + held + booked
+            totals[1] += held
+            totals[2] += booked
+        self.show_id_vs_theatre_id[event.show.get_show_id()] = theatre_id
+        self.show_id_vs_totals[event.show.get_show_id()] = totals
+        theatre_totals = self.theatre_id_vs_totals.setdefault(theatre_id, [0, 0, 0])
+        for index in range(3):
+            theatre_totals[index] += totals[index]
+    
+    def on_seat_change(self, event):
+        held, booked = event.totals[HELD], event.totals[BOOKED]
+        show_totals = self.show_id_vs_totals.get(event.show_id)
+        if show_totals is None:
+            return
+        theatre_totals = self.theatre_id_vs_totals[self.show_id_vs_theatre_id[event.show_id]]
+        for totals in (show_totals, theatre_totals):
+            totals[1] += held
+            totals[2] += booked
+    
+    def on_show_detached(self, show_id):
+        totals = self.show_id_vs_totals.pop(show_id, None)
+        if totals is None:
+            return
+        theatre_id = self.show_id_vs_theatre_id.pop(show_id)
+        theatre_totals = self.theatre_id_vs_totals[theatre_id]
+        for index in range(3):
+            theatre_totals[index] -= totals[index]
+        if not theatre_totals[0]:
+            del self.theatre_id_vs_totals[theatre_id]
+    
+    def get_occupancy(self, theatre_id):
+        """{"seats", "held", "booked", "occupancy"} across the theatre's shows; occupancy counts booked seats"""
+        with self.lock:
+            seats, held, booked = self.theatre_id_vs_totals.get(theatre_id, (0, 0, 0))
+        return {"seats": seats, "held": held, "booked": booked, "occupancy": booked / seats if seats else 0.0}
+
+
+# Main execution
+if __name__ == "__main__":
+    from concurrency_handle_show import BookMyShow, City, SeatCategory
+    
+    book_my_show = BookMyShow()
+    book_my_show.initialize()
+    stream = BookingEventStream()
+    availability = ShowAvailabilityProjection()
+    bookable = BookableShowsProjection()
+    occupancy = TheatreOccupancyProjection()
+    for projection in (availability, bookable, occupancy):
+        stream.subscribe(projection)
+    book_my_show.attach_event_stream(stream)
+    
+    book_my_show.create_group_booking_pessimistic(City.BANGALORE, "BAAHUBALI", "User1", [1, 2, 3])
+    show = book_my_show._get_show(City.BANGALORE, "BAAHUBALI")
+    show.reserve_seats([40, 41], "User2")
+    print(availability.get_availability(show.get_show_id()))
+    print(availability.get_available_count(show.get_show_id(), SeatCategory.GOLD))
+    print([bookable_show.get_show_id() for bookable_show in bookable.get_bookable_shows(show.get_movie(), City.BANGALORE)])
+    print(occupancy.get_occupancy(1))
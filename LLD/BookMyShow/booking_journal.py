@@ -0,0 +1,304 @@
+# booking_journal.py
+# Write-ahead journal of seat changes. Every reserve/confirm/book/cancel/expire
+# is appended (under the show's reservation_lock) before it is applied, and a
+# booking is only reported back once its record is fsynced. One flusher
+# thread fsyncs whatever has accumulated, so concurrent bookings share a
+# single fsync (group commit). Checkpoints snapshot every show and drop the
+# journal segments they cover, which keeps recovery time bounded.
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from concurrency_handle_show import SeatEvent
+
+
+class BookingJournal:
+    """Segmented append-only journal plus checkpoint file in one directory
+    
+    Call recover(shows) once on startup: it restores the last checkpoint,
+    replays the newer records and then attaches the journal to the shows.
+    """
+    SEGMENT_PREFIX = "segment-"
+    CHECKPOINT_FILE = "checkpoint.json"
+    
+    def __init__(self, directory, group_commit_delay=0.0):
+        self.directory = directory
+        self.group_commit_delay = group_commit_delay  # extra wait before an fsync to let a batch build up
+        os.makedirs(directory, exist_ok=True)
+        
+        self.lock = threading.Lock()
+        self.pending = threading.Condition(self.lock)  # flusher waits for unsynced records
+        self.durable = threading.Condition(self.lock)  # writers wait for their lsn to be synced
+        self.sync_lock = threading.Lock()  # one fsync or segment rotation at a time
+        self.segment = None
+        self.segment_number = 0
+        self.last_lsn = 0  # last lsn handed out
+        self.durable_lsn = 0  # every record up to here is on disk
+        self.async_waiters = []  # (lsn, loop, future) for wait_durable_async
+        self.closed = False
+        
+        self.appends = 0
+        self.fsyncs = 0
+        self.records_since_checkpoint = 0
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.checkpointer = None
+    
+    def _segment_path(self, segment_number):
+        return os.path.join(self.directory, f"{self.SEGMENT_PREFIX}{segment_number:08d}.log")
+    
+    def _segment_numbers(self):
+        return sorted(
+            int(name[len(self.SEGMENT_PREFIX):-len(".log")])
+            for name in os.listdir(self.directory)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(".log")
+        )
+    
+    def _sync_directory(self):
+        """Make file creations, renames and deletions in the journal directory durable"""
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+    
+    # Recovery
+    
+    def recover(self, shows):
+        """Rebuild shows from the checkpoint and journal, then start journaling their changes
+        
+        Returns how many journal records were replayed.
+        """
+        show_id_vs_show = {show.get_show_id(): show for show in shows}
+        first_segment = 0
+        checkpoint_path = os.path.join(self.directory, self.CHECKPOINT_FILE)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            first_segment = checkpoint["segment"]
+            self.last_lsn = checkpoint["lsn"]
+            for entry in checkpoint["shows"]:
+                show = show_id_vs_show.get(entry["show_id"])
+                if show is not None:
+                    holds = [
+                        (seat_id, user_id, datetime.fromtimestamp(expiry))
+                        for seat_id, user_id, expiry in entry["holds"]
+                    ]
+                    show.restore_checkpoint(entry["lsn"], bytes.fromhex(entry["states"]), holds)
+        
+        replayed = 0
+        segment_numbers = [number for number in self._segment_numbers() if number >= first_segment]
+        for segment_number in segment_numbers:
+            for record in self._read_segment(segment_number):
+                self.last_lsn = max(self.last_lsn, record["lsn"])
+                show = show_id_vs_show.get(record["show"])
+                if show is None:
+                    continue
+                expiry = record.get("expiry")
+                show.replay_journal_record(
+                    record["lsn"], SeatEvent(record["event"]), record["seats"], record.get("user"),
+                    datetime.fromtimestamp(expiry) if expiry is not None else None,
+                )
+                replayed += 1
+        
+        # Never append to a segment that may end in a torn write
+        self.durable_lsn = self.last_lsn
+        self.records_since_checkpoint = replayed
+        self._open_segment(max(segment_numbers + [first_segment - 1, 0]) + 1)
+        self.flusher.start()
+        for show in shows:
+            self.attach(show)
+        return replayed
+    
+    def _read_segment(self, segment_number):
+        with open(self._segment_path(segment_number), "rb") as segment:
+            for line in segment:
+                if not line.endswith(b"\n"):
+                    break  # torn final write; it was never acknowledged
+                yield json.loads(line)
+    
+    def attach(self, show):
+        """Journal every further change of show (e.g. shows created after recovery)"""
+        show.set_journal(self)
+    
+    # Appending and group commit
+    
+    def append(self, show_id, event, seat_ids, user_id=None, expiry_time=None):
+        """Write one record ahead of the change it describes; returns its lsn
+        
+        Called with the show's reservation_lock held, so a show's records are
+        in the same order as its changes. The record is not durable until
+        wait_durable(lsn) returns.
+        """
+        record = {"show": show_id, "event": event.value, "seats": list(seat_ids)}
+        if user_id is not None:
+            record["user"] = user_id
+        if expiry_time is not None:
+            record["expiry"] = expiry_time.timestamp()
+        with self.lock:
+            if self.segment is None:
+                raise RuntimeError("Journal is not open; call recover() first")
+            self.last_lsn += 1
+            record["lsn"] = self.last_lsn
+            self.segment.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            self.appends += 1
+            self.records_since_checkpoint += 1
+            self.pending.notify()
+            return self.last_lsn
+    
+    def wait_durable(self, lsn):
+        """Block until the record with this lsn (and every earlier one) has been fsynced"""
+        with self.lock:
+            while self.durable_lsn < lsn:
+                if self.segment is None:
+                    raise RuntimeError("Journal closed before the record was made durable")
+                self.durable.wait()
+    
+    async def wait_durable_async(self, lsn):
+        """wait_durable for coroutines: suspends instead of blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.durable_lsn >= lsn:
+                return
+            future = loop.create_future()
+            self.async_waiters.append((lsn, loop, future))
+        await future
+    
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                while self.durable_lsn == self.last_lsn and not self.closed:
+                    self.pending.wait()
+                if self.durable_lsn == self.last_lsn:
+                    return
+            if self.group_commit_delay:
+                time.sleep(self.group_commit_delay)
+            self._sync()
+    
+    def _sync(self):
+        """fsync everything appended so far and wake the writers it covers"""
+        with self.sync_lock:
+            with self.lock:
+                target_lsn = self.last_lsn
+                segment = self.segment
+                segment.flush()
+            # Appends continue into the OS buffer while we wait on the disk
+            os.fsync(segment.fileno())
+            with self.lock:
+                self._mark_durable(target_lsn)
+    
+    def _mark_durable(self, lsn):
+        """Caller holds self.lock"""
+        if lsn <= self.durable_lsn:
+            return
+        self.durable_lsn = lsn
+        self.fsyncs += 1
+        self.durable.notify_all()
+        if self.async_waiters:
+            waiting = []
+            for waiter in self.async_waiters:
+                if waiter[0] <= lsn:
+                    waiter[1].call_soon_threadsafe(_resolve_future, waiter[2])
+                else:
+                    waiting.append(waiter)
+            self.async_waiters = waiting
+    
+    def _open_segment(self, segment_number):
+        """Caller holds self.lock (or is recovering, before any append)"""
+        self.segment_number = segment_number
+        self.segment = open(self._segment_path(segment_number), "ab")
+        self._sync_directory()
+    
+    # Checkpoints
+    
+    def checkpoint(self, shows):
+        """Snapshot every show and delete the journal segments the snapshot covers
+        
+        The journal moves to a fresh segment first. Any record in an older
+        segment was applied under its show's reservation_lock before that lock
+        was released, so the per-show snapshots taken afterwards include it.
+        Records in the new segment carry lsns above a show's snapshot lsn only
+        if the snapshot does not include them, and replay skips the rest.
+        """
+        with self.sync_lock, self.lock:
+            old_segment = self.segment
+            old_segment.flush()
+            os.fsync(old_segment.fileno())
+            self._mark_durable(self.last_lsn)
+            old_segment.close()
+            self._open_segment(self.segment_number + 1)
+            segment_number = self.segment_number
+            checkpoint_lsn = self.last_lsn
+            self.records_since_checkpoint = 0
+        
+        entries = []
+        for show in shows:
+            if not show.is_materialized():
+                continue  # never changed, and restores as it is: all seats available
+            show_lsn, states, holds = show.get_checkpoint()
+            entries.append({
+                "show_id": show.get_show_id(),
+                "lsn": show_lsn,
+                "states": states.hex(),
+                "holds": [[seat_id, user_id, expiry.timestamp()] for seat_id, user_id, expiry in holds],
+            })
+        
+        checkpoint_path = os.path.join(self.directory, self.CHECKPOINT_FILE)
+        temporary_path = checkpoint_path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump({"segment": segment_number, "lsn": checkpoint_lsn, "shows": entries}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, checkpoint_path)
+        self._sync_directory()
+        
+        for number in self._segment_numbers():
+            if number < segment_number:
+                os.remove(self._segment_path(number))
+        return checkpoint_lsn
+    
+    def start_checkpointing(self, get_shows, interval_seconds=60.0, min_records=1):
+        """Checkpoint get_shows() every interval_seconds once min_records have been journaled"""
+        stop = threading.Event()
+        
+        def run():
+            while not stop.wait(interval_seconds):
+                if self.records_since_checkpoint >= min_records:
+                    self.checkpoint(get_shows())
+        
+        self.checkpointer = (threading.Thread(target=run, daemon=True), stop)
+        self.checkpointer[0].start()
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                "appends": self.appends,
+                "fsyncs": self.fsyncs,
+                "records_per_fsync": self.appends / self.fsyncs if self.fsyncs else 0.0,
+                "last_lsn": self.last_lsn,
+                "durable_lsn": self.durable_lsn,
+                "segment": self.segment_number,
+            }
+    
+    def close(self):
+        """Stop checkpointing, fsync what is pending and close the current segment"""
+        if self.checkpointer is not None:
+            self.checkpointer[1].set()
+            self.checkpointer[0].join()
+        with self.lock:
+            self.closed = True
+            self.pending.notify()
+        if self.flusher.is_alive():
+            self.flusher.join()
+        with self.sync_lock, self.lock:
+            if self.segment is not None:
+                self.segment.close()
+                self.segment = None
+            self.durable.notify_all()
+
+
+def _resolve_future(future):
+    if not future.done():
+        future.set_result(None)
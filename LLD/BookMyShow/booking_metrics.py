@@ -0,0 +1,291 @@
+# booking_metrics.py
+# Low-overhead instrumentation for the booking hot path: lock wait and hold
+# time per show, per-operation latency and optimistic conflict counts. Off by
+# default and switched at runtime with METRICS.enable() / METRICS.disable();
+# while off, every hook is a single attribute check, and the shows' locks
+# fall straight through to a C threading.RLock.
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# Upper bounds in seconds, doubling from 1us to ~33s
+HISTOGRAM_BOUNDS = tuple(2 ** exponent / 1_000_000 for exponent in range(26))
+
+
+class LatencyHistogram:
+    """Fixed log-scale buckets; observing is a bisect plus a few increments under a lock"""
+    __slots__ = ("counts", "count", "total", "max", "lock")
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)  # last bucket is +Inf
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+    
+    def observe(self, seconds):
+        index = bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+    
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the fraction-th observation (the max for the last bucket)"""
+        with self.lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        rank = max(1, fraction * count)
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(HISTOGRAM_BOUNDS[index], largest) if index < len(HISTOGRAM_BOUNDS) else largest
+        return largest
+    
+    def snapshot(self):
+        with self.lock:
+            counts, count, total, largest = list(self.counts), self.count, self.total, self.max
+        return {
+            "count": count,
+            "sum": total,
+            "max": largest,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": counts,
+        }
+
+
+class Counter:
+    """One counter series with its own lock, so unrelated counters never contend"""
+    __slots__ = ("value", "lock")
+    
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+    
+    def add(self, amount):
+        with self.lock:
+            self.value += amount
+
+
+class BookingMetrics:
+    """Registry of labelled histograms and counters with a runtime on/off switch"""
+    PREFIX = "bookmyshow_"
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}  # (name, ((label, value), ...)) -> LatencyHistogram
+        self.counters = {}  # (name, labels) -> Counter
+        self.registry_lock = threading.Lock()  # only taken to add, drop or list series
+    
+    def enable(self):
+        self.enabled = True
+    
+    def disable(self):
+        self.enabled = False
+    
+    def reset(self):
+        """Zero every series in place; histograms cached by locks stay valid"""
+        with self.registry_lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+            for counter in self.counters.values():
+                with counter.lock:
+                    counter.value = 0
+    
+    def forget_show(self, show):
+        """Drop every series labelled with the show's id, e.g. once the show is removed"""
+        label = ("show", show.get_show_id())
+        with self.registry_lock:
+            for series in (self.histograms, self.counters):
+                for key in [key for key in series if label in key[1]]:
+                    del series[key]
+    
+    def histogram(self, name, labels=()):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.registry_lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+    
+    def observe(self, name, seconds, labels=()):
+        if self.enabled:
+            self.histogram(name, labels).observe(seconds)
+    
+    def counter(self, name, labels=()):
+        key = (name, labels)
+        counter = self.counters.get(key)
+        if counter is None:
+            with self.registry_lock:
+                counter = self.counters.setdefault(key, Counter())
+        return counter
+    
+    def increment(self, name, amount=1, labels=()):
+        if self.enabled:
+            self.counter(name, labels).add(amount)
+    
+    def timed(self, operation):
+        """Decorator recording the call's latency as operation_seconds{operation=...}"""
+        labels = (("operation", operation),)
+        
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.histogram("operation_seconds", labels).observe(perf_counter() - start)
+            return wrapper
+        return decorate
+    
+    @contextmanager
+    def timing(self, operation):
+        """timed for a block rather than a call, e.g. one that spans awaits"""
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram("operation_seconds", (("operation", operation),)).observe(perf_counter() - start)
+    
+    def snapshot(self):
+        """Plain-dict view of every series, plus the optimistic conflict rate"""
+        with self.registry_lock:
+            histograms = list(self.histograms.items())
+            counters = {key: counter.value for key, counter in self.counters.items()}
+        attempts = sum(value for (name, _), value in counters.items() if name == "optimistic_attempts_total")
+        conflicts = sum(value for (name, _), value in counters.items() if name == "optimistic_conflicts_total")
+        return {
+            "enabled": self.enabled,
+            "histograms": [
+                dict(name=name, labels=dict(labels), **histogram.snapshot()) for (name, labels), histogram in histograms
+            ],
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters.items()],
+            "optimistic_conflict_rate": conflicts / attempts if attempts else 0.0,
+        }
+    
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self.registry_lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            counters = sorted(((key, counter.value) for key, counter in self.counters.items()),
+                              key=lambda item: (item[0][0], str(item[0][1])))
+        lines = []
+        typed = set()
+        for (name, labels), histogram in histograms:
+            metric = self.PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            snapshot = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BOUNDS + ("+Inf",), snapshot["buckets"]):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {snapshot['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {snapshot['count']}")
+        for (name, labels), value in counters:
+            metric = self.PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in labels) + "}"
+
+
+METRICS = BookingMetrics()
+
+
+class InstrumentedLock:
+    """Re-entrant lock that records wait and outermost hold time per show while METRICS is enabled
+    
+    Drop-in for the show's threading.RLock (acquire/release/context manager)
+    and a thin wrapper around one: while metrics are off, acquire and release
+    are an attribute check plus the C lock call, so every show can carry one
+    and be timed from the moment metrics are switched on. owner and depth
+    only track an acquisition that is being timed. Histograms are looked up
+    once, on the first recorded acquisition, using the show id at that time.
+    """
+    __slots__ = ("lock", "owner", "depth", "acquired_at", "show", "lock_name", "metrics",
+                 "wait_histogram", "hold_histogram")
+    
+    def __init__(self, show, lock_name, metrics=METRICS):
+        self.lock = threading.RLock()
+        self.owner = None  # thread whose outermost acquisition is being timed
+        self.depth = 0
+        self.acquired_at = None
+        self.show = show
+        self.lock_name = lock_name
+        self.metrics = metrics
+        self.wait_histogram = None
+        self.hold_histogram = None
+    
+    def _histograms(self):
+        if self.wait_histogram is None:
+            labels = (("show", self.show.get_show_id()), ("lock", self.lock_name))
+            self.hold_histogram = self.metrics.histogram("lock_hold_seconds", labels)
+            self.wait_histogram = self.metrics.histogram("lock_wait_seconds", labels)
+        return self.wait_histogram
+    
+    def acquire(self, blocking=True, timeout=-1):
+        if not self.metrics.enabled and self.owner is None:
+            return self.lock.acquire(blocking, timeout)
+        me = threading.get_ident()
+        if self.owner == me:
+            self.depth += 1
+            return self.lock.acquire()
+        if not self.metrics.enabled:
+            return self.lock.acquire(blocking, timeout)
+        
+        start = perf_counter()
+        if not self.lock.acquire(blocking, timeout):
+            return False
+        acquired_at = perf_counter()
+        # Metrics switched on while this thread already held the lock untimed:
+        # the hold is timed from here, once, and the wait is nil
+        self.owner, self.depth, self.acquired_at = me, 1, acquired_at
+        if blocking:
+            self._histograms().observe(acquired_at - start)
+        return True
+    
+    def release(self):
+        if self.owner is None or self.owner != threading.get_ident():
+            self.lock.release()
+            return
+        self.depth -= 1
+        if self.depth:
+            self.lock.release()
+            return
+        acquired_at = self.acquired_at
+        self.owner = None
+        self.lock.release()
+        self._histograms()
+        self.hold_histogram.observe(perf_counter() - acquired_at)
+    
+    __enter__ = acquire
+    
+    def __exit__(self, *exc_info):
+        self.release()
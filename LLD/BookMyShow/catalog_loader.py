@@ -0,0 +1,224 @@
+# catalog_loader.py
+# Bulk loader for the in-memory catalog. Movies, theatres, screens and shows
+# are streamed from JSONL or CSV files (one record per line, never the whole
+# file at once) and handed to the controllers in batches, one lock
+# acquisition per batch. Screens and shows are created deferred: a screen
+# builds its Seat objects, and a show its seat state and locks, the first
+# time something touches them, so startup cost does not grow with seats.
+#
+#   movies.jsonl    {"movie_id": 1, "name": "AVENGERS", "duration_minutes": 128, "cities": ["Bangalore"]}
+#   theatres.jsonl  {"theatre_id": 1, "city": "Bangalore", "address": "MG Road"}
+#   screens.jsonl   {"theatre_id": 1, "screen_id": 1, "layout": "SILVER:4x10,GOLD:3x10,PLATINUM:3x10"}
+#   shows.jsonl     {"show_id": 1, "theatre_id": 1, "screen_id": 1, "movie_id": 1,
+#                    "start_time": "2024-05-01T18:30:00", "prices": {"SILVER": 150, "GOLD": 250}}
+#
+# CSV files use the same columns; lists are written "Bangalore|Delhi" and
+# prices "SILVER:150|GOLD:250". A layout lists each category's rows and
+# seats per row; rows are lettered A, B, ... in that order.
+import csv
+import functools
+import gc
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from concurrency_handle_show import BookMyShow, City, Movie, Screen, Seat, SeatCategory, Show, Theatre
+
+CATALOG_FILES = ("movies", "theatres", "screens", "shows")
+
+
+def read_records(path):
+    """Yield one dict per record of a .jsonl or .csv file"""
+    with open(path, newline="") as catalog_file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(catalog_file)
+        else:
+            for line in catalog_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(records, batch_size):
+    records = iter(records)
+    while batch := list(itertools.islice(records, batch_size)):
+        yield batch
+
+
+def parse_list(value):
+    return value if isinstance(value, list) else [item for item in value.split("|") if item]
+
+
+def parse_prices(value):
+    """SeatCategory -> price from {"GOLD": 250} or "GOLD:250|SILVER:150"; empty if missing"""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = {category: float(price) for category, price in (item.split(":") for item in value.split("|"))}
+    return {SeatCategory(category): price for category, price in value.items()}
+
+
+def parse_layout(layout):
+    """"SILVER:4x10,GOLD:3x10" -> ((SeatCategory.SILVER, 4, 10), (SeatCategory.GOLD, 3, 10))"""
+    blocks = []
+    for block in layout.split(","):
+        category, size = block.split(":")
+        rows, seats_per_row = size.split("x")
+        blocks.append((SeatCategory(category.strip()), int(rows), int(seats_per_row)))
+    return tuple(blocks)
+
+
+def build_seats(blocks):
+    """Seats for a parsed layout, numbered row by row from seat id 0"""
+    seats = []
+    row_index = 0
+    for category, rows, seats_per_row in blocks:
+        for _ in range(rows):
+            row = chr(ord("A") + row_index) if row_index < 26 else f"R{row_index + 1}"
+            for seat_number in range(1, seats_per_row + 1):
+                seat = Seat()
+                seat.set_seat_id(len(seats))
+                seat.set_row(row)
+                seat.set_seat_number(seat_number)
+                seat.set_seat_category(category)
+                seats.append(seat)
+            row_index += 1
+    return seats
+
+
+class CatalogLoader:
+    """Streams catalog files into a BookMyShow's controllers, in memory or SQLite
+    
+    Load order matters: movies and theatres before the screens and shows
+    that refer to them. With lazy=False every screen and show is built in
+    full while loading, which is what the deferred path avoids. Attaching
+    an event stream or recovering a journal touches the shows it covers.
+    """
+    def __init__(self, book_my_show, batch_size=1_000, lazy=True):
+        self.movie_controller = book_my_show.movie_controller
+        self.theatre_controller = book_my_show.theatre_controller
+        self.batch_size = batch_size
+        self.lazy = lazy
+        self.theatre_id_vs_theatre = {}
+        self.screen_key_vs_screen = {}  # (theatre_id, screen_id) -> Screen
+        self.layout_vs_seat_loader = {}  # layout text -> seat builder shared by the screens with that layout
+        self.prices_vs_category_prices = {}  # prices as written -> one parsed dict shared by those shows
+        self.loaded = dict.fromkeys(CATALOG_FILES, 0)
+    
+    def load(self, movies, theatres, screens, shows):
+        """Load all four files; returns {"movies", "theatres", "screens", "shows", "seconds"}"""
+        started = time.perf_counter()
+        # The catalog lives as long as the process; collecting while it grows would
+        # only rescan it over and over
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.load_movies(movies)
+            self.load_theatres(theatres)
+            self.load_screens(screens)
+            self.load_shows(shows)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return dict(self.loaded, seconds=time.perf_counter() - started)
+    
+    def load_movies(self, path):
+        for batch in batched(read_records(path), self.batch_size):
+            movie_cities = []
+            for record in batch:
+                movie = Movie()
+                movie.set_movie_id(int(record["movie_id"]))
+                movie.set_movie_name(record["name"])
+                movie.set_movie_duration(int(record["duration_minutes"]))
+                movie_cities.extend((movie, City(city)) for city in parse_list(record["cities"]))
+            self.movie_controller.add_movies(movie_cities)
+            self.loaded["movies"] += len(batch)
+    
+    def load_theatres(self, path):
+        for batch in batched(read_records(path), self.batch_size):
+            theatre_cities = []
+            for record in batch:
+                theatre = Theatre()
+                theatre.set_theatre_id(int(record["theatre_id"]))
+                theatre.set_city(City(record["city"]))
+                theatre.set_address(record.get("address"))
+                theatre.set_screens([])
+                theatre.set_shows([])
+                self.theatre_id_vs_theatre[theatre.get_theatre_id()] = theatre
+                theatre_cities.append((theatre, theatre.get_city()))
+            self.theatre_controller.add_theatres(theatre_cities)
+            self.loaded["theatres"] += len(batch)
+    
+    def load_screens(self, path):
+        # Screens are not indexed by the controllers, only attached to their theatre
+        for record in read_records(path):
+            theatre_id, screen_id = int(record["theatre_id"]), int(record["screen_id"])
+            seat_loader = self._seat_loader(record["layout"])
+            if self.lazy:
+                screen = Screen.deferred(screen_id, seat_loader)
+            else:
+                screen = Screen()
+                screen.set_screen_id(screen_id)
+                screen.set_seats(seat_loader())
+            self.theatre_id_vs_theatre[theatre_id].get_screens().append(screen)
+            self.screen_key_vs_screen[(theatre_id, screen_id)] = screen
+            self.loaded["screens"] += 1
+    
+    def _seat_loader(self, layout):
+        seat_loader = self.layout_vs_seat_loader.get(layout)
+        if seat_loader is None:
+            seat_loader = self.layout_vs_seat_loader[layout] = functools.partial(build_seats, parse_layout(layout))
+        return seat_loader
+    
+    def _category_prices(self, prices):
+        key = json.dumps(prices, sort_keys=True) if isinstance(prices, dict) else prices
+        category_prices = self.prices_vs_category_prices.get(key)
+        if category_prices is None:
+            category_prices = self.prices_vs_category_prices[key] = parse_prices(prices)
+        return category_prices
+    
+    def load_shows(self, path):
+        for batch in batched(read_records(path), self.batch_size):
+            theatre_shows = []
+            for record in batch:
+                theatre_id = int(record["theatre_id"])
+                show_id = int(record["show_id"])
+                movie = self.movie_controller.get_movie_by_id(int(record["movie_id"]))
+                screen = self.screen_key_vs_screen[(theatre_id, int(record["screen_id"]))]
+                start_time = datetime.fromisoformat(record["start_time"])
+                prices = self._category_prices(record.get("prices"))
+                if self.lazy:
+                    show = Show.deferred(show_id, movie, screen, start_time, prices)
+                else:
+                    show = Show()
+                    show.set_show_id(show_id)
+                    show.set_movie(movie)
+                    show.set_screen(screen)
+                    show.set_show_start_time(start_time)
+                    show.set_category_prices(prices)
+                theatre_shows.append((self.theatre_id_vs_theatre[theatre_id], show))
+            self.theatre_controller.add_shows(theatre_shows)
+            self.loaded["shows"] += len(batch)
+
+
+def load_catalog(book_my_show, directory, batch_size=1_000, lazy=True):
+    """Load movies, theatres, screens and shows (.jsonl or .csv each) from directory"""
+    paths = []
+    for name in CATALOG_FILES:
+        for extension in (".jsonl", ".csv"):
+            path = os.path.join(directory, name + extension)
+            if os.path.exists(path):
+                paths.append(path)
+                break
+        else:
+            raise FileNotFoundError(f"No {name}.jsonl or {name}.csv in {directory}")
+    return CatalogLoader(book_my_show, batch_size, lazy).load(*paths)
+
+
+# Main execution
+if __name__ == "__main__":
+    # python catalog_loader.py <directory with movies, theatres, screens and shows files>
+    book_my_show = BookMyShow()
+    print(load_catalog(book_my_show, sys.argv[1]))
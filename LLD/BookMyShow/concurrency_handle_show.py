@@ -3,19 +3,48 @@ from enum import Enum
 import threading
 import time
 import uuid
+import heapq
+import itertools
+import bisect
+import queue
+from array import array
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 import random
 
+from booking_metrics import METRICS, InstrumentedLock
+from distributed_lock import StaleFencingToken
+from idempotency import IdempotencyCache, Retryable, idempotent
+
 class City(Enum):
     BANGALORE = "Bangalore"
     DELHI = "Delhi"
+    MUMBAI = "Mumbai"
+    CHENNAI = "Chennai"
+    HYDERABAD = "Hyderabad"
+    KOLKATA = "Kolkata"
+    PUNE = "Pune"
+    AHMEDABAD = "Ahmedabad"
 
 class SeatCategory(Enum):
     SILVER = "SILVER"
     GOLD = "GOLD"
     PLATINUM = "PLATINUM"
 
+class SeatState(Enum):
+    AVAILABLE = 0
+    HELD = 1
+    BOOKED = 2
+
+class SeatEvent(Enum):
+    RESERVE = "reserve"
+    CONFIRM = "confirm"
+    BOOK = "book"
+    CANCEL = "cancel"
+    EXPIRE = "expire"
+    SET_BOOKED = "set_booked"
+
 class BookingStatus(Enum):
     PENDING = "PENDING"
     CONFIRMED = "CONFIRMED"
@@ -25,6 +54,8 @@ class BookingStatus(Enum):
 
 # movie.py
 class Movie:
+    __slots__ = ("movie_id", "movie_name", "movie_duration_in_minutes")
+    
     def __init__(self):
         self.movie_id = None
         self.movie_name = None
@@ -51,13 +82,14 @@ class Movie:
 
 # seat.py
 class Seat:
+    """Static seat description; per-show booking state lives in the show's SeatStateMap"""
+    __slots__ = ("seat_id", "row", "seat_number", "seat_category")
+    
     def __init__(self):
         self.seat_id = None
         self.row = None
+        self.seat_number = None  # position within the row
         self.seat_category = None
-        self.is_booked = False
-        self.version = 0  # For optimistic locking
-        self.lock = threading.RLock()  # For pessimistic locking
     
     def get_seat_id(self):
         return self.seat_id
@@ -71,6 +103,12 @@ class Seat:
     def set_row(self, row):
         self.row = row
     
+    def get_seat_number(self):
+        return self.seat_number
+    
+    def set_seat_number(self, seat_number):
+        self.seat_number = seat_number
+    
     def get_seat_category(self):
         return self.seat_category
     
@@ -78,11 +116,102 @@ class Seat:
         self.seat_category = seat_category
 
 
+# screen_layout.py
+class ScreenLayout:
+    """Immutable seat layout of a screen, shared by every show that runs on it"""
+    __slots__ = ("size", "available_states", "category_seat_ids", "available_counts", "seat_count_offsets",
+                 "seat_categories", "row_vs_seat_ids", "category_vs_rows", "seat_id_vs_row", "row_vs_position")
+    
+    def __init__(self, seats):
+        self.size = max((seat.get_seat_id() for seat in seats), default=-1) + 1
+        self.available_states = bytes(self.size)  # initial state of every show, shared until its first write
+        
+        category_seat_ids = {}
+        seat_categories = [None] * self.size  # seat_id -> SeatCategory, None for unused ids
+        for seat in seats:
+            category_seat_ids.setdefault(seat.get_seat_category(), []).append(seat.get_seat_id())
+            seat_categories[seat.get_seat_id()] = seat.get_seat_category()
+        self.seat_categories = tuple(seat_categories)
+        self.category_seat_ids = {category: tuple(sorted(seat_ids)) for category, seat_ids in category_seat_ids.items()}
+        
+        # Seat counts are kept flat: [available, held, booked] per category in category_seat_ids order,
+        # then one spare triple that absorbs unused seat ids
+        self.available_counts = tuple(
+            count for seat_ids in self.category_seat_ids.values() for count in (len(seat_ids), 0, 0)
+        ) + (0, 0, 0)
+        category_offsets = {category: 3 * index for index, category in enumerate(self.category_seat_ids)}
+        spare_offset = 3 * len(category_offsets)
+        self.seat_count_offsets = tuple(category_offsets.get(category, spare_offset) for category in seat_categories)
+        
+        # Row layout for seats that have a position; rows ordered by their first seat id
+        row_vs_seats = {}
+        for seat in seats:
+            if seat.get_row() is not None:
+                row_vs_seats.setdefault(seat.get_row(), []).append(seat)
+        self.row_vs_seat_ids = {}
+        self.seat_id_vs_row = {}
+        category_vs_rows = {}
+        for row, row_seats in sorted(row_vs_seats.items(), key=lambda item: min(seat.get_seat_id() for seat in item[1])):
+            row_seats.sort(key=lambda seat: seat.get_seat_number())
+            self.row_vs_seat_ids[row] = tuple(seat.get_seat_id() for seat in row_seats)
+            for seat in row_seats:
+                self.seat_id_vs_row[seat.get_seat_id()] = row
+            category_vs_rows.setdefault(row_seats[0].get_seat_category(), []).append(row)
+        self.category_vs_rows = {category: tuple(rows) for category, rows in category_vs_rows.items()}
+        
+        # row -> (category, index among that category's rows)
+        self.row_vs_position = {
+            row: (category, index)
+            for category, rows in self.category_vs_rows.items()
+            for index, row in enumerate(rows)
+        }
+
+
+EMPTY_SCREEN_LAYOUT = ScreenLayout([])
+# Held while a deferred screen or show fills in its state; each is materialized once
+DEFERRED_STATE_LOCK = threading.RLock()
+
+
+def is_materialized(instance, slot):
+    """Whether slot is filled in, without triggering materialization through __getattr__"""
+    try:
+        object.__getattribute__(instance, slot)
+    except AttributeError:
+        return False
+    return True
+
+
 # screen.py
 class Screen:
+    __slots__ = ("screen_id", "seats", "seat_id_vs_seat", "row_number_vs_seat", "category_vs_ranges", "layout",
+                 "seat_loader")
+    
     def __init__(self):
         self.screen_id = None
         self.seats = []
+        self.seat_id_vs_seat = {}
+        self.row_number_vs_seat = {}  # (row, seat_number) -> Seat
+        self.category_vs_ranges = {}  # SeatCategory -> [(first_seat_id, last_seat_id), ...]
+        self.layout = EMPTY_SCREEN_LAYOUT
+        self.seat_loader = None  # builds the seats of a deferred screen
+    
+    @classmethod
+    def deferred(cls, screen_id, seat_loader):
+        """Screen whose seats are built by seat_loader() the first time anything reads them"""
+        screen = cls.__new__(cls)
+        screen.screen_id = screen_id
+        screen.seat_loader = seat_loader
+        return screen
+    
+    def __getattr__(self, name):
+        # Only reached for the seat slots of a deferred screen that nobody has read yet
+        if name not in Screen.__slots__:
+            raise AttributeError(name)
+        with DEFERRED_STATE_LOCK:
+            if self.seat_loader is not None:
+                self.set_seats(self.seat_loader())
+                self.seat_loader = None
+        return object.__getattribute__(self, name)
     
     def get_screen_id(self):
         return self.screen_id
@@ -95,10 +224,286 @@ class Screen:
     
     def set_seats(self, seats):
         self.seats = seats
+        self.seat_id_vs_seat = {seat.get_seat_id(): seat for seat in seats}
+        self.row_number_vs_seat = {
+            (seat.get_row(), seat.get_seat_number()): seat
+            for seat in seats if seat.get_row() is not None
+        }
+        
+        # Collapse each category's seat ids into contiguous ranges
+        self.category_vs_ranges = {}
+        for seat_id in sorted(self.seat_id_vs_seat):
+            ranges = self.category_vs_ranges.setdefault(self.seat_id_vs_seat[seat_id].get_seat_category(), [])
+            if ranges and ranges[-1][1] == seat_id - 1:
+                ranges[-1] = (ranges[-1][0], seat_id)
+            else:
+                ranges.append((seat_id, seat_id))
+        
+        self.layout = ScreenLayout(seats)
+    
+    def get_layout(self):
+        return self.layout
+    
+    def get_seat(self, seat_id):
+        return self.seat_id_vs_seat.get(seat_id)
+    
+    def get_seat_at(self, row, seat_number):
+        return self.row_number_vs_seat.get((row, seat_number))
+    
+    def get_category_ranges(self, seat_category):
+        return self.category_vs_ranges.get(seat_category, [])
+    
+    def get_row_seat_ids(self, row):
+        return self.layout.row_vs_seat_ids.get(row, ())
+    
+    def get_category_rows(self, seat_category):
+        return self.layout.category_vs_rows.get(seat_category, ())
+
+
+# seat_state_map.py
+class SeatStateMap:
+    """Compact per-show seat state, one byte per seat indexed by seat_id
+    
+    Until the first write the map reads the layout's shared all-available
+    bytes, so a show nobody has touched costs no per-seat memory. Per
+    category counts of available, held and booked seats are kept up to date
+    by set_state, so availability summaries never scan the seats.
+    """
+    __slots__ = ("layout", "states", "versions", "category_counts")
+    
+    def __init__(self, layout):
+        self.layout = layout
+        self.states = layout.available_states
+        self.versions = None  # array('I') bumped on every state change of a seat, created on first write
+        self.category_counts = None  # list laid out as layout.available_counts, created on first write
+    
+    @property
+    def category_seat_ids(self):
+        return self.layout.category_seat_ids
+    
+    def get_state(self, seat_id):
+        return SeatState(self.states[seat_id])
+    
+    def set_state(self, seat_id, state):
+        if self.versions is None:
+            self.states = bytearray(self.states)
+            self.versions = array('I', bytes(4 * len(self.states)))
+            self.category_counts = list(self.layout.available_counts)
+        states, counts, value = self.states, self.category_counts, state.value
+        offset = self.layout.seat_count_offsets[seat_id]
+        counts[offset + states[seat_id]] -= 1
+        counts[offset + value] += 1
+        states[seat_id] = value
+        self.versions[seat_id] += 1
+    
+    def get_version(self, seat_id):
+        return self.versions[seat_id] if self.versions is not None else 0
+    
+    def counts_snapshot(self):
+        """Immutable copy of the category counts, laid out as layout.available_counts"""
+        return self.layout.available_counts if self.category_counts is None else tuple(self.category_counts)
+    
+    def get_category_counts(self):
+        """SeatCategory -> (available, held, booked), O(categories)"""
+        return unpack_category_counts(self.category_seat_ids, self.counts_snapshot())
+    
+    def get_versions(self, seat_ids):
+        if self.versions is None:
+            return [0] * len(seat_ids)
+        return [self.versions[seat_id] for seat_id in seat_ids]
+    
+    def is_available(self, seat_id):
+        return 0 <= seat_id < len(self.states) and self.states[seat_id] == SeatState.AVAILABLE.value
+    
+    def is_booked(self, seat_id):
+        return 0 <= seat_id < len(self.states) and self.states[seat_id] == SeatState.BOOKED.value
+    
+    def snapshot(self):
+        """Immutable copy of the whole map (a single memcpy)"""
+        return bytes(self.states)
+    
+    def seat_ids_in_state(self, state, category=None):
+        """All seat ids currently in the given state, optionally within one category"""
+        states = self.states
+        value = state.value
+        if category is not None:
+            return [seat_id for seat_id in self.category_seat_ids.get(category, []) if states[seat_id] == value]
+        
+        seat_ids = []
+        seat_id = states.find(value)
+        while seat_id != -1:
+            seat_ids.append(seat_id)
+            seat_id = states.find(value, seat_id + 1)
+        return seat_ids
+    
+    def free_seats(self, category=None):
+        return self.seat_ids_in_state(SeatState.AVAILABLE, category)
+
+
+def unpack_category_counts(category_seat_ids, counts):
+    """SeatCategory -> (available, held, booked) from a flat count tuple"""
+    return {category: counts[3 * index:3 * index + 3] for index, category in enumerate(category_seat_ids)}
+
+
+# seat_map_snapshot.py
+class SeatMapSnapshot:
+    """Immutable, versioned copy of a show's seat map that readers use without locking"""
+    __slots__ = ("version", "states", "category_seat_ids", "next_expiry", "category_counts")
+    
+    def __init__(self, version, states, category_seat_ids, next_expiry, category_counts):
+        self.version = version
+        self.states = states  # bytes, one SeatState value per seat_id
+        self.category_seat_ids = category_seat_ids
+        self.next_expiry = next_expiry  # earliest pending hold expiry when published, or None
+        self.category_counts = category_counts  # flat tuple laid out as ScreenLayout.available_counts
+    
+    def get_version(self):
+        return self.version
+    
+    def get_state(self, seat_id):
+        return SeatState(self.states[seat_id])
+    
+    def is_available(self, seat_id):
+        return 0 <= seat_id < len(self.states) and self.states[seat_id] == SeatState.AVAILABLE.value
+    
+    def get_category_counts(self):
+        """SeatCategory -> (available, held, booked) as of this snapshot"""
+        return unpack_category_counts(self.category_seat_ids, self.category_counts)
+    
+    def free_seats(self, category=None):
+        available = SeatState.AVAILABLE.value
+        seat_ids = self.category_seat_ids.get(category, ()) if category is not None else range(len(self.states))
+        return [seat_id for seat_id in seat_ids if self.states[seat_id] == available]
+    
+    def is_stale(self, now):
+        """True once a hold captured in this snapshot may have expired"""
+        return self.next_expiry is not None and self.next_expiry < now
+
+
+# seat_allocator.py
+class MaxSegmentTree:
+    """Max over a fixed array with point updates and nearest-index searches in O(log n)"""
+    def __init__(self, size):
+        self.size = 1
+        while self.size < max(size, 1):
+            self.size *= 2
+        self.tree = [0] * (2 * self.size)
+    
+    def update(self, index, value):
+        node = index + self.size
+        self.tree[node] = value
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+    
+    def find_first(self, low, at_least):
+        """Smallest index >= low whose value is >= at_least, or -1"""
+        return self._find_first(1, 0, self.size - 1, low, at_least)
+    
+    def find_last(self, high, at_least):
+        """Largest index <= high whose value is >= at_least, or -1"""
+        return self._find_last(1, 0, self.size - 1, high, at_least)
+    
+    def _find_first(self, node, left, right, low, at_least):
+        if right < low or self.tree[node] < at_least:
+            return -1
+        if left == right:
+            return left
+        middle = (left + right) // 2
+        found = self._find_first(2 * node, left, middle, low, at_least)
+        if found == -1:
+            found = self._find_first(2 * node + 1, middle + 1, right, low, at_least)
+        return found
+    
+    def _find_last(self, node, left, right, high, at_least):
+        if left > high or self.tree[node] < at_least:
+            return -1
+        if left == right:
+            return left
+        middle = (left + right) // 2
+        found = self._find_last(2 * node + 1, middle + 1, right, high, at_least)
+        if found == -1:
+            found = self._find_last(2 * node, left, middle, high, at_least)
+        return found
+
+
+class SeatBlockAllocator:
+    """Per-show index of free runs in each row, for best-available contiguous seat queries
+    
+    Each row keeps its sorted free runs; per category a segment tree over the
+    rows holds the longest free run, so the row nearest the centre that can
+    fit N seats is found in O(log rows). Seat state changes only mark their
+    row dirty and rows are re-scanned lazily before the next query. Callers
+    must hold the show's reservation_lock.
+    """
+    def __init__(self, layout, seat_states):
+        self.layout = layout
+        self.seat_states = seat_states
+        self.row_vs_free_runs = {}  # row -> [(first_position, last_position), ...]
+        self.category_vs_tree = {
+            category: MaxSegmentTree(len(rows)) for category, rows in layout.category_vs_rows.items()
+        }
+        self.dirty_rows = set(layout.row_vs_seat_ids)
+    
+    def mark_dirty(self, seat_id):
+        row = self.layout.seat_id_vs_row.get(seat_id)
+        if row is not None:
+            self.dirty_rows.add(row)
+    
+    def _refresh(self):
+        for row in self.dirty_rows:
+            runs = []
+            run_start = None
+            seat_ids = self.layout.row_vs_seat_ids[row]
+            for position, seat_id in enumerate(seat_ids):
+                if self.seat_states.is_available(seat_id):
+                    if run_start is None:
+                        run_start = position
+                elif run_start is not None:
+                    runs.append((run_start, position - 1))
+                    run_start = None
+            if run_start is not None:
+                runs.append((run_start, len(seat_ids) - 1))
+            
+            self.row_vs_free_runs[row] = runs
+            category, index = self.layout.row_vs_position[row]
+            self.category_vs_tree[category].update(index, max((last - first + 1 for first, last in runs), default=0))
+        self.dirty_rows.clear()
+    
+    def find_block(self, category, count):
+        """Seat ids of the most central run of count adjacent free seats in category, or None"""
+        if category not in self.category_vs_tree or count <= 0:
+            return None
+        self._refresh()
+        
+        rows = self.layout.category_vs_rows[category]
+        tree = self.category_vs_tree[category]
+        centre_row = (len(rows) - 1) // 2
+        behind = tree.find_first(centre_row, count)
+        in_front = tree.find_last(centre_row, count)
+        candidates = [index for index in (behind, in_front) if index != -1]
+        if not candidates:
+            return None
+        row = rows[min(candidates, key=lambda index: abs(index - centre_row))]
+        
+        # Within the row, centre the block as closely as the free runs allow
+        seat_ids = self.layout.row_vs_seat_ids[row]
+        row_centre = (len(seat_ids) - count) / 2
+        best_start = None
+        for first, last in self.row_vs_free_runs[row]:
+            if last - first + 1 < count:
+                continue
+            start = min(max(round(row_centre), first), last - count + 1)
+            if best_start is None or abs(start - row_centre) < abs(best_start - row_centre):
+                best_start = start
+        return list(seat_ids[best_start:best_start + count])
 
 
 # Seat reservation for temporary holds
 class SeatReservation:
+    __slots__ = ("seat_id", "user_id", "expiry_time", "is_active")
+    
     def __init__(self, seat_id, user_id, expiry_time):
         self.seat_id = seat_id
         self.user_id = user_id
@@ -114,16 +519,88 @@ class SeatReservation:
 
 # show.py with concurrency control
 class Show:
+    """Lock order: lock -> seat lock stripes (ascending) -> reservation_lock"""
+    __slots__ = ("show_id", "movie", "screen", "show_start_time", "seat_states", "version", "lock",
+                 "seat_reservations", "reservation_lock", "seat_lock_stripes", "expiry_heap",
+                 "expiry_sequence", "pending_seat_changes", "seat_map_deltas", "seat_map_snapshot",
+                 "seat_allocator", "journal", "journal_lsn", "event_stream", "category_prices", "fencing_token")
+    SEAT_LOCK_STRIPES = 128
+    SEAT_MAP_DELTA_HISTORY = 256  # published versions kept for get_seat_map_changes
+    
     def __init__(self):
         self.show_id = None
         self.movie = None
         self.screen = None
         self.show_start_time = None
-        self.booked_seat_ids = []
-        self.version = 0  # For optimistic locking
-        self.lock = threading.RLock()  # For pessimistic locking
+        self.seat_states = SeatStateMap(EMPTY_SCREEN_LAYOUT)
+        self.version = 0  # Bumped on every published seat map change; per-seat versions live in seat_states
+        self.lock = InstrumentedLock(self, "show")  # For pessimistic locking
         self.seat_reservations = {}  # seat_id -> SeatReservation
-        self.reservation_lock = threading.RLock()
+        self.reservation_lock = InstrumentedLock(self, "reservation")
+        self.seat_lock_stripes = None  # seat_id % len -> lock, created on first use
+        self.expiry_heap = []  # (expiry_time, sequence, SeatReservation), min-heap on expiry_time
+        self.expiry_sequence = itertools.count()
+        self.pending_seat_changes = {}  # seat_id -> SeatState written but not yet published
+        self.seat_map_deltas = None  # version % size -> (version, changes), created on first change
+        self.seat_map_snapshot = SeatMapSnapshot(0, b"", {}, None, ())
+        self.seat_allocator = None  # best-available index, built on first use
+        self.journal = None  # BookingJournal written ahead of every seat change, if attached
+        self.journal_lsn = 0  # lsn of the last journaled change applied to this show
+        self.event_stream = None  # BookingEventStream every applied seat change is published to, if attached
+        self.category_prices = {}  # SeatCategory -> ticket price
+        self.fencing_token = 0  # highest lock-provider fencing token a commit has carried
+    
+    # Catalog fields a deferred show is created with; the rest is filled in on first use
+    DEFERRED_FIELDS = ("show_id", "movie", "screen", "show_start_time", "category_prices", "journal")
+    
+    @classmethod
+    def deferred(cls, show_id, movie, screen, show_start_time, category_prices=None):
+        """Show that only holds its catalog fields until something touches its seats or locks
+        
+        Indexing it by movie, city and start time does not count as a touch.
+        category_prices is kept as given, so bulk loads can share one dict
+        between shows; set_category_prices replaces it rather than mutating.
+        """
+        show = cls.__new__(cls)
+        show.show_id = show_id
+        show.movie = movie
+        show.screen = screen
+        show.show_start_time = show_start_time
+        show.category_prices = category_prices if category_prices is not None else {}
+        show.journal = None
+        return show
+    
+    def __getattr__(self, name):
+        # Only reached for the state slots of a deferred show that nobody has touched yet
+        if name not in Show.__slots__:
+            raise AttributeError(name)
+        with DEFERRED_STATE_LOCK:
+            if not self.is_materialized():
+                self._materialize()
+        return object.__getattribute__(self, name)
+    
+    def _materialize(self):
+        """Fill in every slot but the catalog fields from a fully built show on the same screen"""
+        built = Show()
+        built.show_id = self.show_id
+        built.set_screen(self.screen)
+        built.lock.show = built.reservation_lock.show = self
+        for slot in Show.__slots__:
+            if slot not in self.DEFERRED_FIELDS and slot != "reservation_lock":
+                setattr(self, slot, getattr(built, slot))
+        self.reservation_lock = built.reservation_lock  # last: it marks the show as materialized
+    
+    def is_materialized(self):
+        return is_materialized(self, "reservation_lock")
+    
+    def set_journal(self, journal):
+        """Journal every further change; a deferred show keeps it for when it is materialized"""
+        with DEFERRED_STATE_LOCK:
+            if not self.is_materialized():
+                self.journal = journal
+                return
+        with self.reservation_lock:
+            self.journal = journal
     
     def get_show_id(self):
         return self.show_id
@@ -142,186 +619,903 @@ class Show:
     
     def set_screen(self, screen):
         self.screen = screen
+        layout = screen.get_layout()
+        with self.reservation_lock:
+            self.seat_states = SeatStateMap(layout)
+            self.seat_allocator = None
+            self.seat_lock_stripes = None
+            self.pending_seat_changes = {}
+            self.seat_map_snapshot = SeatMapSnapshot(self.version, layout.available_states, layout.category_seat_ids, None,
+                                                     layout.available_counts)
     
     def get_show_start_time(self):
         return self.show_start_time
     
     def set_show_start_time(self, show_start_time):
+        """show_start_time is a datetime; set it before the show is added to a TheatreController"""
         self.show_start_time = show_start_time
     
+    def get_category_prices(self):
+        return self.category_prices
+    
+    def set_category_prices(self, category_prices):
+        """SeatCategory -> ticket price for this show"""
+        self.category_prices = dict(category_prices)
+    
+    def get_category_availability(self):
+        """SeatCategory -> {"available", "held", "booked", "price"}, read from the seat map's counters"""
+        prices = self.category_prices
+        return {
+            category: {"available": available, "held": held, "booked": booked, "price": prices.get(category)}
+            for category, (available, held, booked) in self.get_seat_map().get_category_counts().items()
+        }
+    
+    @property
+    def booked_seat_ids(self):
+        return self.seat_states.seat_ids_in_state(SeatState.BOOKED)
+    
     def get_booked_seat_ids(self):
         return self.booked_seat_ids
     
     def set_booked_seat_ids(self, booked_seat_ids):
-        self.booked_seat_ids = booked_seat_ids
+        with self.reservation_lock:
+            self._apply_seat_event(SeatEvent.SET_BOOKED, sorted(set(booked_seat_ids)))
+            self._publish_seat_map()
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+    
+    def get_seat_states(self):
+        return self.seat_states
+    
+    def get_category_counts(self):
+        """SeatCategory -> (available, held, booked) as applied so far; hold reservation_lock for a stable answer"""
+        return self.seat_states.get_category_counts()
+    
+    def get_seat_versions(self, seat_ids):
+        """Current per-seat versions, read without locking (for compare-and-swap bookings)"""
+        return self.seat_states.get_versions(seat_ids)
+    
+    @contextmanager
+    def lock_seats(self, seat_ids):
+        """Hold the lock stripes covering seat_ids, always taken in ascending stripe order"""
+        seat_lock_stripes = self.seat_lock_stripes or self._create_seat_lock_stripes()
+        stripe_count = len(seat_lock_stripes)
+        stripes = [seat_lock_stripes[index] for index in sorted({seat_id % stripe_count for seat_id in seat_ids})]
+        for stripe in stripes:
+            stripe.acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                stripe.release()
     
-    def cleanup_expired_reservations(self):
-        """Remove expired reservations"""
+    def _create_seat_lock_stripes(self):
         with self.reservation_lock:
-            expired_seats = []
-            for seat_id, reservation in self.seat_reservations.items():
-                if reservation.is_expired():
-                    expired_seats.append(seat_id)
-            
-            for seat_id in expired_seats:
-                del self.seat_reservations[seat_id]
+            if self.seat_lock_stripes is None:
+                stripe_count = max(1, min(len(self.seat_states.states), self.SEAT_LOCK_STRIPES))
+                self.seat_lock_stripes = [threading.Lock() for _ in range(stripe_count)]
+            return self.seat_lock_stripes
+    
+    def _set_seat_state(self, seat_id, state):
+        """Single write path for seat state changes; call _publish_seat_map before releasing the lock"""
+        self.seat_states.set_state(seat_id, state)
+        self.pending_seat_changes[seat_id] = state
+        if self.seat_allocator is not None:
+            self.seat_allocator.mark_dirty(seat_id)
+    
+    def _publish_seat_map(self):
+        """Swap in a new immutable snapshot covering every change since the last publish"""
+        changes = self.pending_seat_changes
+        next_expiry = self.expiry_heap[0][0] if self.expiry_heap else None
+        if not changes and next_expiry == self.seat_map_snapshot.next_expiry:
+            return
+        
+        if changes:
+            self.pending_seat_changes = {}
+            self.version += 1
+            if self.seat_map_deltas is None:
+                self.seat_map_deltas = [None] * self.SEAT_MAP_DELTA_HISTORY
+            self.seat_map_deltas[self.version % self.SEAT_MAP_DELTA_HISTORY] = (self.version, changes)
+        self.seat_map_snapshot = SeatMapSnapshot(
+            self.version, self.seat_states.snapshot(), self.seat_states.category_seat_ids, next_expiry,
+            self.seat_states.counts_snapshot(),
+        )
     
-    def is_seat_available(self, seat_id):
-        """Check if seat is available (not booked and not reserved)"""
-        self.cleanup_expired_reservations()
+    def get_seat_map(self):
+        """Current seat map snapshot, read without locking
         
+        Only when a hold in the snapshot may have expired does the reader take
+        reservation_lock to release it and publish a fresh snapshot.
+        """
+        snapshot = self.seat_map_snapshot
+        if snapshot.is_stale(datetime.now()):
+            self.cleanup_expired_reservations()
+            snapshot = self.seat_map_snapshot
+        return snapshot
+    
+    def get_seat_map_changes(self, since_version):
+        """Returns (version, {seat_id: SeatState} changed since since_version, full snapshot or None)
+        
+        The full snapshot is only returned when since_version is too old for
+        the retained delta history; the client should then replace its map.
+        """
+        snapshot = self.get_seat_map()
+        version = snapshot.get_version()
+        if since_version >= version:
+            return version, {}, None
+        if version - since_version > self.SEAT_MAP_DELTA_HISTORY or self.seat_map_deltas is None:
+            return version, {}, snapshot
+        
+        changes = {}
+        for delta_version in range(since_version + 1, version + 1):
+            delta = self.seat_map_deltas[delta_version % self.SEAT_MAP_DELTA_HISTORY]
+            if delta is None or delta[0] != delta_version:
+                # Overwritten by newer writes while we were reading
+                return version, {}, snapshot
+            changes.update(delta[1])
+        return version, changes, None
+    
+    def cleanup_expired_reservations(self, now=None):
+        """Release only the holds that are due, popping them off the expiry heap"""
         with self.reservation_lock:
-            # Check if seat is already booked
-            if seat_id in self.booked_seat_ids:
-                return False
+            heap = self.expiry_heap
+            if not heap:
+                return
             
-            # Check if seat is reserved by another user
-            if seat_id in self.seat_reservations:
-                reservation = self.seat_reservations[seat_id]
-                if reservation.is_active and not reservation.is_expired():
-                    return False
+            now = now or datetime.now()
+            # Only passes that have holds to release are timed
+            started = time.perf_counter() if METRICS.enabled and heap[0][0] < now else None
+            expired_seat_ids = []
+            while heap and heap[0][0] < now:
+                reservation = heapq.heappop(heap)[2]
+                # Entries for confirmed or cancelled holds are skipped lazily
+                if reservation.is_active and self.seat_reservations.get(reservation.seat_id) is reservation:
+                    expired_seat_ids.append(reservation.seat_id)
+            if expired_seat_ids:
+                self._apply_seat_event(SeatEvent.EXPIRE, expired_seat_ids)
+                METRICS.increment("expired_holds_total", len(expired_seat_ids))
             
-            return True
+            # Keep stale entries from piling up when most holds end before expiry
+            if len(heap) > 2 * len(self.seat_reservations) + 64:
+                self.expiry_heap = [entry for entry in heap if entry[2].is_active]
+                heapq.heapify(self.expiry_heap)
+            self._publish_seat_map()
+            if started is not None:
+                METRICS.observe("operation_seconds", time.perf_counter() - started, (("operation", "expire"),))
+    
+    def is_seat_available(self, seat_id):
+        """Check if seat is available (not booked and not reserved)"""
+        with self.reservation_lock:
+            self.cleanup_expired_reservations()
+            return self.seat_states.is_available(seat_id)
+    
+    def get_unavailable_seats(self, seat_ids):
+        """Seat ids from seat_ids that are currently booked or held"""
+        with self.reservation_lock:
+            self.cleanup_expired_reservations()
+            return [seat_id for seat_id in seat_ids if not self.seat_states.is_available(seat_id)]
     
     def reserve_seat(self, seat_id, user_id, hold_time_minutes=10):
         """Reserve a seat temporarily"""
-        self.cleanup_expired_reservations()
+        success, _ = self.reserve_seats([seat_id], user_id, hold_time_minutes)
+        return success
+    
+    @METRICS.timed("reserve")
+    def reserve_seats(self, seat_ids, user_id, hold_time_minutes=10):
+        """Reserve all seats or none; returns (success, conflicting seat ids)"""
+        with self.reservation_lock:
+            result = self._reserve_seats(seat_ids, user_id, hold_time_minutes)
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return result
+    
+    def _reserve_seats(self, seat_ids, user_id, hold_time_minutes):
+        """reserve_seats body; the caller holds reservation_lock and waits for durability after releasing it"""
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return False, []
+        now = datetime.now()
+        self.cleanup_expired_reservations(now)
+        conflicts = [seat_id for seat_id in seat_ids if not self.seat_states.is_available(seat_id)]
+        if conflicts:
+            return False, conflicts
         
+        self._apply_seat_event(SeatEvent.RESERVE, seat_ids, user_id, now + timedelta(minutes=hold_time_minutes))
+        self._publish_seat_map()
+        return True, []
+    
+    @METRICS.timed("reserve_best_available")
+    def reserve_best_available(self, seat_category, count, user_id, hold_time_minutes=10):
+        """Hold the most central block of count adjacent seats in a category; returns (success, seat ids)"""
         with self.reservation_lock:
-            if not self.is_seat_available(seat_id):
-                return False
-            
-            expiry_time = datetime.now() + timedelta(minutes=hold_time_minutes)
-            reservation = SeatReservation(seat_id, user_id, expiry_time)
-            self.seat_reservations[seat_id] = reservation
-            return True
+            self.cleanup_expired_reservations()
+            if self.seat_allocator is None:
+                self.seat_allocator = SeatBlockAllocator(self.seat_states.layout, self.seat_states)
+            seat_ids = self.seat_allocator.find_block(seat_category, count)
+            success = bool(seat_ids) and self._reserve_seats(seat_ids, user_id, hold_time_minutes)[0]
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return success, seat_ids if success else []
     
     def confirm_booking(self, seat_id, user_id):
         """Confirm the booking and remove reservation"""
+        success, _ = self.confirm_bookings([seat_id], user_id)
+        return success
+    
+    @METRICS.timed("confirm")
+    def confirm_bookings(self, seat_ids, user_id):
+        """Confirm all of the user's holds or none; returns (success, conflicting seat ids)"""
         with self.reservation_lock:
-            if seat_id not in self.seat_reservations:
-                return False
-            
-            reservation = self.seat_reservations[seat_id]
-            if reservation.user_id != user_id or reservation.is_expired():
-                return False
-            
-            # Move from reservation to booked
-            self.booked_seat_ids.append(seat_id)
-            del self.seat_reservations[seat_id]
-            return True
+            result = self._confirm_bookings(seat_ids, user_id)
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return result
+    
+    def _confirm_bookings(self, seat_ids, user_id):
+        """confirm_bookings body; the caller holds reservation_lock"""
+        seat_ids = sorted(set(seat_ids))
+        now = datetime.now()
+        conflicts = []
+        for seat_id in seat_ids:
+            reservation = self.seat_reservations.get(seat_id)
+            if reservation is None or reservation.user_id != user_id or reservation.expiry_time < now:
+                conflicts.append(seat_id)
+        if conflicts:
+            return False, conflicts
+        
+        # Move from reservation to booked
+        self._apply_seat_event(SeatEvent.CONFIRM, seat_ids, user_id)
+        self._publish_seat_map()
+        return True, []
+    
+    def try_book_seat(self, seat_id):
+        """Atomically move an available seat straight to BOOKED"""
+        success, _ = self.try_book_seats([seat_id])
+        return success
+    
+    @METRICS.timed("book")
+    def try_book_seats(self, seat_ids, expected_versions=None, fencing_token=None):
+        """Move all seats straight to BOOKED if every one is available; returns (success, conflicts)
+        
+        expected_versions maps seat_id -> version read earlier; any seat whose
+        version has moved since then counts as a conflict. fencing_token is
+        the caller's lease token, see check_fencing_token. An empty seat list
+        books nothing and fails.
+        """
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return False, []
+        with self.reservation_lock:
+            self.check_fencing_token(fencing_token)
+            self.cleanup_expired_reservations()
+            seat_states = self.seat_states
+            conflicts = [
+                seat_id for seat_id in seat_ids
+                if not seat_states.is_available(seat_id)
+                or (expected_versions is not None and seat_states.get_version(seat_id) != expected_versions[seat_id])
+            ]
+            if not conflicts:
+                self._apply_seat_event(SeatEvent.BOOK, seat_ids)
+                self._publish_seat_map()
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return not conflicts, conflicts
+    
+    @METRICS.timed("book_batch")
+    def try_book_seat_groups(self, seat_id_groups, fencing_token=None):
+        """try_book_seats for many groups in order under one lock acquisition; returns [(success, conflicts)]
+        
+        A group conflicts with seats taken by an earlier group in the same
+        call, and an empty group fails. All winners are applied, journaled
+        and made durable together.
+        """
+        results = []
+        taken = set()
+        with self.reservation_lock:
+            self.check_fencing_token(fencing_token)
+            self.cleanup_expired_reservations()
+            seat_states = self.seat_states
+            for seat_ids in seat_id_groups:
+                conflicts = [
+                    seat_id for seat_id in sorted(set(seat_ids))
+                    if seat_id in taken or not seat_states.is_available(seat_id)
+                ]
+                success = bool(seat_ids) and not conflicts
+                if success:
+                    taken.update(seat_ids)
+                results.append((success, conflicts))
+            if taken:
+                self._apply_seat_event(SeatEvent.BOOK, sorted(taken))
+                self._publish_seat_map()
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return results
+    
+    def check_fencing_token(self, fencing_token):
+        """Refuse a commit whose lease token is older than one already accepted; caller holds reservation_lock
+        
+        Raises StaleFencingToken: a newer lease holder has written since, so
+        the caller's lease lapsed. None (no lock provider) is always accepted.
+        """
+        if fencing_token is None:
+            return
+        if fencing_token < self.fencing_token:
+            METRICS.increment("stale_fencing_tokens_total")
+            raise StaleFencingToken(
+                f"Show {self.show_id}: fencing token {fencing_token} is older than {self.fencing_token}"
+            )
+        self.fencing_token = fencing_token
     
     def cancel_reservation(self, seat_id, user_id):
         """Cancel the reservation"""
+        return self.cancel_reservations([seat_id], user_id) == 1
+    
+    @METRICS.timed("cancel")
+    def cancel_reservations(self, seat_ids, user_id):
+        """Cancel the user's holds on seat_ids; returns how many were released"""
+        with self.reservation_lock:
+            released = self._cancel_reservations(seat_ids, user_id)
+            journal_lsn = self.journal_lsn
+        self.wait_durable(journal_lsn)
+        return released
+    
+    def _cancel_reservations(self, seat_ids, user_id):
+        """cancel_reservations body; the caller holds reservation_lock"""
+        seat_ids = [
+            seat_id for seat_id in sorted(set(seat_ids))
+            if seat_id in self.seat_reservations and self.seat_reservations[seat_id].user_id == user_id
+        ]
+        if seat_ids:
+            self._apply_seat_event(SeatEvent.CANCEL, seat_ids, user_id)
+            self._publish_seat_map()
+        return len(seat_ids)
+    
+    def _apply_seat_event(self, event, seat_ids, user_id=None, expiry_time=None):
+        """Journal an already validated change, then apply it; the caller holds reservation_lock
+        
+        Journal replay goes through here too (with no journal attached), so a
+        recovered show ends up exactly where the live one was.
+        """
+        if self.journal is not None:
+            self.journal_lsn = self.journal.append(self.show_id, event, seat_ids, user_id, expiry_time)
+        
+        event_stream = self.event_stream
+        if event_stream is not None:
+            # Every other event implies the state its seats were in
+            changed_seat_ids, previous_states = seat_ids, None
+            if event is SeatEvent.SET_BOOKED:
+                changed_seat_ids = sorted(set(self.seat_states.seat_ids_in_state(SeatState.BOOKED)).union(seat_ids))
+                states = self.seat_states.states
+                previous_states = bytes([states[seat_id] for seat_id in changed_seat_ids])
+        
+        if event is SeatEvent.RESERVE:
+            for seat_id in seat_ids:
+                reservation = SeatReservation(seat_id, user_id, expiry_time)
+                self.seat_reservations[seat_id] = reservation
+                heapq.heappush(self.expiry_heap, (expiry_time, next(self.expiry_sequence), reservation))
+                self._set_seat_state(seat_id, SeatState.HELD)
+        elif event is SeatEvent.SET_BOOKED:
+            for seat_id in self.seat_states.seat_ids_in_state(SeatState.BOOKED):
+                self._set_seat_state(seat_id, SeatState.AVAILABLE)
+            for seat_id in seat_ids:
+                self._set_seat_state(seat_id, SeatState.BOOKED)
+        else:
+            state = SeatState.BOOKED if event in (SeatEvent.CONFIRM, SeatEvent.BOOK) else SeatState.AVAILABLE
+            for seat_id in seat_ids:
+                reservation = self.seat_reservations.pop(seat_id, None)
+                if reservation is not None:
+                    reservation.cancel()
+                self._set_seat_state(seat_id, state)
+        
+        if event_stream is not None:
+            event_stream.publish(self, event, changed_seat_ids, user_id, previous_states)
+    
+    def wait_durable(self, journal_lsn):
+        """Block until the journal has fsynced journal_lsn; call it after releasing every show lock"""
+        if self.journal is not None and journal_lsn:
+            self.journal.wait_durable(journal_lsn)
+    
+    def replay_journal_record(self, journal_lsn, event, seat_ids, user_id=None, expiry_time=None):
+        """Re-apply one journaled change during recovery; records the show already has are skipped"""
         with self.reservation_lock:
-            if seat_id in self.seat_reservations:
-                reservation = self.seat_reservations[seat_id]
-                if reservation.user_id == user_id:
-                    del self.seat_reservations[seat_id]
-                    return True
-            return False
+            if journal_lsn <= self.journal_lsn:
+                return
+            journal, self.journal = self.journal, None
+            try:
+                self._apply_seat_event(event, seat_ids, user_id, expiry_time)
+            finally:
+                self.journal = journal
+            self.journal_lsn = journal_lsn
+            self._publish_seat_map()
+    
+    def get_checkpoint(self):
+        """(journal_lsn, seat states, [(seat_id, user_id, expiry_time)] of active holds), taken atomically"""
+        with self.reservation_lock:
+            holds = [
+                (reservation.seat_id, reservation.user_id, reservation.expiry_time)
+                for reservation in self.seat_reservations.values()
+            ]
+            return self.journal_lsn, self.seat_states.snapshot(), holds
+    
+    def restore_checkpoint(self, journal_lsn, states, holds):
+        """Reset seat states and holds to a checkpoint taken by get_checkpoint"""
+        with self.reservation_lock:
+            for seat_id, state in enumerate(states):
+                if self.seat_states.states[seat_id] != state:
+                    self._set_seat_state(seat_id, SeatState(state))
+            self.seat_reservations = {}
+            self.expiry_heap = []
+            for seat_id, user_id, expiry_time in holds:
+                reservation = SeatReservation(seat_id, user_id, expiry_time)
+                self.seat_reservations[seat_id] = reservation
+                heapq.heappush(self.expiry_heap, (expiry_time, next(self.expiry_sequence), reservation))
+            self.journal_lsn = journal_lsn
+            self._publish_seat_map()
+            if self.event_stream is not None:
+                # Projections start over from the restored states
+                self.event_stream.attach(self)
 
 
 # Optimistic locking implementation
 class OptimisticLockingBookingService:
-    def __init__(self):
-        pass
-    
-    def book_seat_optimistic(self, show, seat_id, user_id, max_retries=3):
+    """Compare-and-swap booking on per-seat versions with capped, jittered exponential backoff"""
+    def __init__(self, max_retries=3, base_backoff=0.005, max_backoff=0.1, processing_time_range=(0.01, 0.05)):
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.processing_time_range = processing_time_range
+        self.stats_lock = threading.Lock()
+        self.attempts = 0
+        self.conflicts = 0
+        self.give_ups = 0
+        self.successes = 0
+    
+    def book_seat_optimistic(self, show, seat_id, user_id, max_retries=None):
         """Book seat using optimistic locking"""
+        success, message, _ = self.book_seats_optimistic(show, [seat_id], user_id, max_retries)
+        return success, message
+    
+    def book_seats_optimistic(self, show, seat_ids, user_id, max_retries=None):
+        """Book a group of seats all-or-nothing; returns (success, message, conflicting seat ids)
+        
+        Only a change to one of the requested seats counts as a conflict, so
+        bookings of other seats in the same show never force a retry.
+        """
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return False, "No seats requested", []
+        max_retries = self.max_retries if max_retries is None else max_retries
+        conflicts = []
+        
         for attempt in range(max_retries):
+            self._record(attempts=1)
             try:
-                # Read current version
-                current_version = show.version
-                current_booked_seats = show.booked_seat_ids.copy()
-                
-                # Check if seat is available
-                if seat_id in current_booked_seats:
-                    return False, "Seat already booked"
+                # Read the versions of just the seats we want
+                versions = dict(zip(seat_ids, show.get_seat_versions(seat_ids)))
+                unavailable = show.get_unavailable_seats(seat_ids)
+                if unavailable:
+                    return False, "Seat already booked", unavailable
                 
                 # Simulate some processing time
-                time.sleep(random.uniform(0.01, 0.05))
+                time.sleep(random.uniform(*self.processing_time_range))
                 
-                # Try to update with version check (atomic operation)
-                with show.lock:
-                    if show.version != current_version:
-                        # Version changed, retry
-                        print(f"User {user_id}: Version conflict, retrying... (attempt {attempt + 1})")
-                        continue
-                    
-                    # Double-check seat availability
-                    if seat_id in show.booked_seat_ids:
-                        return False, "Seat already booked"
-                    
-                    # Book the seat and increment version
-                    show.booked_seat_ids.append(seat_id)
-                    show.version += 1
-                    
-                    return True, "Booking successful"
+                # Compare-and-swap: book only if none of the seats moved since we read them
+                success, conflicts = show.try_book_seats(seat_ids, versions)
+                if success:
+                    self._record(successes=1)
+                    return True, "Booking successful", []
                 
+                unavailable = show.get_unavailable_seats(conflicts)
+                if unavailable:
+                    return False, "Seat already booked", unavailable
+            
             except Exception as e:
                 print(f"User {user_id}: Error during booking: {e}")
-                continue
+            
+            # A seat changed underneath us but is free again; back off and retry
+            self._record(conflicts=1)
+            if attempt + 1 < max_retries:
+                time.sleep(self._backoff(attempt))
         
-        return False, "Booking failed after retries"
+        self._record(give_ups=1)
+        return False, "Booking failed after retries", conflicts
+    
+    def _backoff(self, attempt):
+        """Full jitter: uniform in [0, min(max_backoff, base_backoff * 2^attempt)]"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+    
+    def _record(self, attempts=0, conflicts=0, give_ups=0, successes=0):
+        with self.stats_lock:
+            self.attempts += attempts
+            self.conflicts += conflicts
+            self.give_ups += give_ups
+            self.successes += successes
+        if METRICS.enabled:
+            for name, amount in (("attempts", attempts), ("conflicts", conflicts), ("give_ups", give_ups),
+                                 ("successes", successes)):
+                if amount:
+                    METRICS.increment(f"optimistic_{name}_total", amount)
+    
+    def get_stats(self):
+        with self.stats_lock:
+            return {
+                "attempts": self.attempts,
+                "conflicts": self.conflicts,
+                "give_ups": self.give_ups,
+                "successes": self.successes,
+                "conflict_rate": self.conflicts / self.attempts if self.attempts else 0.0,
+            }
+    
+    def reset_stats(self):
+        with self.stats_lock:
+            self.attempts = self.conflicts = self.give_ups = self.successes = 0
+
+
+def show_lock_name(show):
+    """Name of the show's lock in a LockProvider"""
+    return f"show:{show.get_show_id()}"
 
 
 # Pessimistic locking implementation
 class PessimisticLockingBookingService:
-    def __init__(self):
-        pass
+    """Books under show.lock, or under a lease on the show from lock_provider when nodes share shows
+    
+    With a lock provider the lease's fencing token goes along with the
+    commit, so a booking whose lease lapsed while it was processing fails
+    instead of writing after the next holder.
+    """
+    def __init__(self, processing_time_range=(0.01, 0.05), lock_provider=None, lock_timeout=5.0):
+        self.processing_time_range = processing_time_range
+        self.lock_provider = lock_provider
+        self.lock_timeout = lock_timeout
     
     def book_seat_pessimistic(self, show, seat_id, user_id):
         """Book seat using pessimistic locking"""
-        with show.lock:
-            if seat_id in show.booked_seat_ids:
-                return False, "Seat already booked"
+        success, message, _ = self.book_seats_pessimistic(show, [seat_id], user_id)
+        return success, message
+    
+    def book_seats_pessimistic(self, show, seat_ids, user_id):
+        """Book a group of seats all-or-nothing under the show lock"""
+        if self.lock_provider is None:
+            with show.lock:
+                return self._book_seats(show, seat_ids)
+        
+        lease = self.lock_provider.acquire(show_lock_name(show), user_id, timeout=self.lock_timeout)
+        if lease is None:
+            return False, "Show is busy, try again", []
+        try:
+            return self._book_seats(show, seat_ids, lease.token)
+        except StaleFencingToken:
+            return False, "Lock lease lapsed before the booking committed", []
+        finally:
+            self.lock_provider.release(lease)
+    
+    def _book_seats(self, show, seat_ids, fencing_token=None):
+        conflicts = show.get_unavailable_seats(seat_ids)
+        if conflicts:
+            return False, "Seat already booked", conflicts
+        
+        # Simulate processing time
+        time.sleep(random.uniform(*self.processing_time_range))
+        
+        success, conflicts = show.try_book_seats(seat_ids, fencing_token=fencing_token)
+        if not success:
+            return False, "Seat already booked", conflicts
+        return True, "Booking successful", []
+
+
+# Fine-grained (per-seat) locking implementation
+class SeatLockingBookingService:
+    """Pessimistic booking that locks only the seats involved instead of the whole show"""
+    def __init__(self, processing_time_range=(0.01, 0.05)):
+        self.processing_time_range = processing_time_range
+    
+    def book_seat_fine_grained(self, show, seat_id, user_id, expected_version=None):
+        """Book seat holding only that seat's lock"""
+        expected_versions = None if expected_version is None else {seat_id: expected_version}
+        success, message, _ = self.book_seats_fine_grained(show, [seat_id], user_id, expected_versions)
+        return success, message
+    
+    def book_seats_fine_grained(self, show, seat_ids, user_id, expected_versions=None):
+        """Book a group of seats all-or-nothing holding only their lock stripes
+        
+        expected_versions (seat_id -> version, e.g. from the seat map the user
+        looked at) turns any change since then into a conflict.
+        """
+        seat_ids = sorted(set(seat_ids))
+        with show.lock_seats(seat_ids):
+            conflicts = show.get_unavailable_seats(seat_ids)
+            if conflicts:
+                return False, "Seat already booked", conflicts
+            
+            versions = dict(zip(seat_ids, show.get_seat_versions(seat_ids)))
+            if expected_versions is not None:
+                conflicts = [seat_id for seat_id in seat_ids if versions[seat_id] != expected_versions.get(seat_id)]
+                if conflicts:
+                    return False, "Seat changed since it was viewed", conflicts
             
-            # Simulate processing time
-            time.sleep(random.uniform(0.01, 0.05))
+            # Simulate processing time, blocking only bookings for these seats
+            time.sleep(random.uniform(*self.processing_time_range))
             
-            show.booked_seat_ids.append(seat_id)
-            return True, "Booking successful"
+            # Seat versions catch holds taken meanwhile through the reservation path
+            success, conflicts = show.try_book_seats(seat_ids, versions)
+            if not success:
+                return False, "Seat already booked", conflicts
+            return True, "Booking successful", []
 
 
 # Two-phase booking implementation
 class TwoPhaseBookingService:
-    def __init__(self):
-        pass
+    def __init__(self, payment_time_range=(0.5, 2.0), payment_success_rate=0.9, verbose=True):
+        self.payment_time_range = payment_time_range
+        self.payment_success_rate = payment_success_rate
+        self.verbose = verbose
     
     def book_seat_two_phase(self, show, seat_id, user_id):
         """Book seat using two-phase approach (reserve + confirm)"""
-        # Phase 1: Reserve the seat
-        if not show.reserve_seat(seat_id, user_id):
-            return False, "Seat not available"
+        success, message, _ = self.book_seats_two_phase(show, [seat_id], user_id)
+        return success, message
+    
+    def book_seats_two_phase(self, show, seat_ids, user_id):
+        """Reserve a group of seats together, take one payment, then confirm them together"""
+        # Phase 1: Reserve the seats
+        success, conflicts = show.reserve_seats(seat_ids, user_id)
+        if not success:
+            return False, "Seat not available", conflicts
+        
+        return self._pay_and_confirm(show, seat_ids, user_id)
+    
+    def book_best_available(self, show, seat_category, count, user_id):
+        """Hold the best block of count adjacent seats, pay, confirm; returns (success, message, seat ids)"""
+        success, seat_ids = show.reserve_best_available(seat_category, count, user_id)
+        if not success:
+            return False, f"No {count} adjacent {seat_category.value} seats available", []
         
+        success, message, _ = self._pay_and_confirm(show, seat_ids, user_id)
+        return success, message, seat_ids if success else []
+    
+    def _pay_and_confirm(self, show, seat_ids, user_id):
+        """Phase 2 for seats already held by user_id; the hold is released on any failure"""
         try:
             # Simulate payment processing
-            print(f"User {user_id}: Processing payment for seat {seat_id}...")
-            time.sleep(random.uniform(0.5, 2.0))  # Simulate payment time
+            if self.verbose:
+                print(f"User {user_id}: Processing payment for seats {sorted(set(seat_ids))}...")
+            time.sleep(random.uniform(*self.payment_time_range))  # Simulate payment time
             
-            # Simulate payment success/failure (90% success rate)
-            payment_success = random.random() < 0.9
+            # Simulate payment success/failure (90% success rate by default)
+            payment_success = random.random() < self.payment_success_rate
             
             if payment_success:
                 # Phase 2: Confirm the booking
-                if show.confirm_booking(seat_id, user_id):
-                    return True, "Booking confirmed"
+                success, conflicts = show.confirm_bookings(seat_ids, user_id)
+                if success:
+                    return True, "Booking confirmed", []
                 else:
-                    return False, "Booking confirmation failed"
+                    show.cancel_reservations(seat_ids, user_id)
+                    return False, "Booking confirmation failed", conflicts
             else:
                 # Cancel reservation if payment fails
-                show.cancel_reservation(seat_id, user_id)
-                return False, "Payment failed"
-                
+                show.cancel_reservations(seat_ids, user_id)
+                return False, "Payment failed", []
+        
         except Exception as e:
             # Cancel reservation if any error occurs
-            show.cancel_reservation(seat_id, user_id)
-            return False, f"Booking failed: {e}"
+            show.cancel_reservations(seat_ids, user_id)
+            return False, f"Booking failed: {e}", []
+
+
+# Single-writer implementation
+class WriterStopped(RuntimeError):
+    """The show's writer was stopped, retired after idling, or its show was removed"""
+
+
+class ShowWriter:
+    """The one thread that books seats in a show for SingleWriterBookingService
+    
+    Callers queue commands and wait on a Future; the writer drains up to
+    max_batch_size of them at a time and applies them in arrival order with
+    Show.try_book_seat_groups. The show locks are still taken (once per
+    batch) so holds, expiry and readers on other paths stay correct, but
+    with the writer as the only booker they are never handed off. With a
+    lock provider, writers for the same show on other nodes take turns: each
+    batch runs under a fresh lease and commits with its fencing token.
+    
+    After idle_timeout seconds without a command the writer retires itself
+    and calls on_retired(writer); the service then starts a fresh one.
+    """
+    def __init__(self, show, max_batch_size=256, lock_provider=None, lock_timeout=5.0, idle_timeout=None,
+                 on_retired=None):
+        self.show = show
+        self.max_batch_size = max_batch_size
+        self.lock_provider = lock_provider
+        self.lock_timeout = lock_timeout
+        self.idle_timeout = idle_timeout
+        self.on_retired = on_retired
+        self.commands = queue.SimpleQueue()  # (seat_ids, Future), or None to stop
+        self.state_lock = threading.Lock()  # makes "not stopped yet" and queueing a command one step
+        self.stopped = False
+        self.batches = 0
+        self.commands_applied = 0
+        self.largest_batch = 0
+        self.thread = threading.Thread(target=self._run, name=f"show-writer-{show.get_show_id()}", daemon=True)
+        self.thread.start()
+    
+    def submit(self, seat_ids):
+        """Queue a booking; the Future resolves to (success, conflicting seat ids)
+        
+        Raises WriterStopped once the writer is stopping. A Future cancelled
+        before its batch starts is skipped.
+        """
+        future = Future()
+        with self.state_lock:
+            if self.stopped:
+                raise WriterStopped(f"Writer for show {self.show.get_show_id()} is stopped")
+            self.commands.put((seat_ids, future))
+        return future
+    
+    def stop(self, wait=True):
+        """Apply what is already queued, then end the writer thread"""
+        with self.state_lock:
+            if not self.stopped:
+                self.stopped = True
+                self.commands.put(None)
+        if wait and self.thread is not threading.current_thread():
+            self.thread.join()
+    
+    def _run(self):
+        commands = self.commands
+        while True:
+            try:
+                batch = [commands.get(timeout=self.idle_timeout)]
+            except queue.Empty:
+                with self.state_lock:
+                    # A command may have been queued while the wait timed out
+                    retiring = commands.empty()
+                    if retiring:
+                        self.stopped = True
+                if retiring:
+                    if self.on_retired is not None:
+                        self.on_retired(self)
+                    return
+                continue
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(commands.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [command for command in batch if command is not None and command[1].set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    results = self._book_batch([seat_ids for seat_ids, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        future.set_exception(e)
+                else:
+                    for (_, future), result in zip(batch, results):
+                        future.set_result(result)
+                self.batches += 1
+                self.commands_applied += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            if stopping:
+                self._fail_queued()
+                return
+    
+    def _fail_queued(self):
+        """Fail anything left behind the stop sentinel instead of leaving its caller waiting"""
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if command is not None and command[1].set_running_or_notify_cancel():
+                command[1].set_exception(WriterStopped(f"Writer for show {self.show.get_show_id()} stopped"))
+    
+    def _book_batch(self, seat_id_groups):
+        if self.lock_provider is None:
+            return self.show.try_book_seat_groups(seat_id_groups)
+        with self.lock_provider.hold(show_lock_name(self.show), self.thread.name, timeout=self.lock_timeout) as lease:
+            return self.show.try_book_seat_groups(seat_id_groups, lease.token)
+
+
+class SingleWriterBookingService:
+    """Bookings handed to a per-show ShowWriter instead of taking show locks on the caller's thread
+    
+    Only shows booked within the last idle_timeout seconds keep a writer
+    thread; retire_writer stops a removed show's writer straight away.
+    """
+    def __init__(self, processing_time_range=(0.01, 0.05), max_batch_size=256, lock_provider=None,
+                 idle_timeout=60.0, result_timeout=30.0):
+        self.processing_time_range = processing_time_range
+        self.max_batch_size = max_batch_size
+        self.lock_provider = lock_provider
+        self.idle_timeout = idle_timeout
+        self.result_timeout = result_timeout
+        self.show_writers = {}  # Show -> ShowWriter, started on the show's first booking
+        self.writers_lock = threading.Lock()
+    
+    def get_writer(self, show):
+        writer = self.show_writers.get(show)
+        if writer is None or writer.stopped:
+            with self.writers_lock:
+                writer = self.show_writers.get(show)
+                if writer is None or writer.stopped:
+                    writer = self.show_writers[show] = ShowWriter(
+                        show, self.max_batch_size, self.lock_provider, idle_timeout=self.idle_timeout,
+                        on_retired=self._forget_writer,
+                    )
+        return writer
+    
+    def _forget_writer(self, writer):
+        with self.writers_lock:
+            if self.show_writers.get(writer.show) is writer:
+                del self.show_writers[writer.show]
+    
+    def retire_writer(self, show):
+        """Stop the show's writer, if it has one, once its queued commands are applied"""
+        with self.writers_lock:
+            writer = self.show_writers.pop(show, None)
+        if writer is not None:
+            writer.stop(wait=False)
+    
+    def _submit(self, show, seat_ids):
+        while True:
+            try:
+                return self.get_writer(show).submit(seat_ids)
+            except WriterStopped:
+                continue  # it retired between get_writer and submit; the next get_writer starts a fresh one
+    
+    def book_seat_single_writer(self, show, seat_id, user_id):
+        """Book seat through the show's writer"""
+        success, message, _ = self.book_seats_single_writer(show, [seat_id], user_id)
+        return success, message
+    
+    def book_seats_single_writer(self, show, seat_ids, user_id):
+        """Book a group of seats all-or-nothing through the show's writer"""
+        # Simulate processing time on the caller's thread, before the command is queued
+        time.sleep(random.uniform(*self.processing_time_range))
+        try:
+            future = self._submit(show, sorted(set(seat_ids)))
+            try:
+                success, conflicts = future.result(timeout=self.result_timeout)
+            except TimeoutError:
+                if future.cancel():
+                    print(f"User {user_id}: Booking timed out in the show's queue")
+                    return False, "Booking timed out", []
+                # Its batch is already being applied and finishes within the writer's lock timeout
+                success, conflicts = future.result()
+        except Exception as e:
+            print(f"User {user_id}: Error during booking: {e}")
+            return False, f"Booking failed: {e}", []
+        if not success:
+            return False, "Seat already booked", conflicts
+        return True, "Booking successful", []
+    
+    def get_stats(self):
+        with self.writers_lock:
+            writers = list(self.show_writers.values())
+        batches = sum(writer.batches for writer in writers)
+        commands = sum(writer.commands_applied for writer in writers)
+        return {
+            "writers": len(writers),
+            "batches": batches,
+            "commands": commands,
+            "average_batch_size": commands / batches if batches else 0.0,
+            "largest_batch": max((writer.largest_batch for writer in writers), default=0),
+        }
+    
+    def close(self):
+        """Stop every writer after it has applied its queued commands"""
+        with self.writers_lock:
+            writers, self.show_writers = list(self.show_writers.values()), {}
+        for writer in writers:
+            writer.stop()
 
 
 # payment.py
 class Payment:
+    __slots__ = ("payment_id",)
+    
     def __init__(self):
         self.payment_id = None
         # Other payment details
@@ -329,6 +1523,8 @@ class Payment:
 
 # booking.py
 class Booking:
+    __slots__ = ("booking_id", "show", "booked_seats", "payment", "user_id", "booking_time", "status")
+    
     def __init__(self):
         self.booking_id = str(uuid.uuid4())
         self.show = None
@@ -359,6 +1555,8 @@ class Booking:
 
 # theatre.py
 class Theatre:
+    __slots__ = ("theatre_id", "address", "city", "screens", "shows")
+    
     def __init__(self):
         self.theatre_id = None
         self.address = None
@@ -400,25 +1598,154 @@ class Theatre:
 # movie_controller.py
 class MovieController:
     def __init__(self):
-        self.city_vs_movies = {}
-        self.all_movies = []
+        self.city_vs_movies = {}  # city -> {movie_id: Movie}
+        self.all_movies = []  # every movie exactly once
+        self.movie_id_vs_movie = {}
+        self.name_vs_movies = {}  # normalized name -> [Movie] in the order added; titles can repeat
+        self.exact_name_vs_movie = {}  # name as added -> first Movie added with it, skips normalizing
+        self.sorted_names = []  # distinct normalized names, kept sorted for prefix search
+        self.city_vs_sorted_names = {}  # city -> sorted normalized names of the movies running there
+        self.catalog_lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_name(movie_name):
+        return " ".join(movie_name.split()).casefold()
     
     def add_movie(self, movie, city):
-        self.all_movies.append(movie)
+        with self.catalog_lock:
+            self._add_movie(movie, city)
+    
+    def add_movies(self, movie_cities):
+        """add_movie for each (movie, city) under one acquisition of the catalog lock"""
+        with self.catalog_lock:
+            for movie, city in movie_cities:
+                self._add_movie(movie, city)
+    
+    def _add_movie(self, movie, city):
+        movie_id = movie.get_movie_id()
+        name = self.normalize_name(movie.get_movie_name())
+        if movie_id not in self.movie_id_vs_movie:
+            self.movie_id_vs_movie[movie_id] = movie
+            self.all_movies.append(movie)
+            
+            if name not in self.name_vs_movies:
+                bisect.insort(self.sorted_names, name)
+                self.name_vs_movies[name] = []
+            self.name_vs_movies[name].append(movie)
+            self.exact_name_vs_movie.setdefault(movie.get_movie_name(), movie)
         
         if city not in self.city_vs_movies:
-            self.city_vs_movies[city] = []
+            self.city_vs_movies[city] = {}
         
-        self.city_vs_movies[city].append(movie)
+        self.city_vs_movies[city][movie_id] = movie
+        _insort_unique(self.city_vs_sorted_names.setdefault(city, []), name)
     
     def get_movie_by_name(self, movie_name):
-        for movie in self.all_movies:
-            if movie.get_movie_name() == movie_name:
+        """The first movie added under this name; get_movies_by_name lists every one"""
+        movie = self.exact_name_vs_movie.get(movie_name)
+        if movie is None:
+            movies = self.name_vs_movies.get(self.normalize_name(movie_name))
+            movie = movies[0] if movies else None
+        return movie
+    
+    def get_movies_by_name(self, movie_name):
+        return list(self.name_vs_movies.get(self.normalize_name(movie_name), ()))
+    
+    def get_movie_by_id(self, movie_id):
+        return self.movie_id_vs_movie.get(movie_id)
+    
+    def get_movies_by_city(self, city):
+        return list(self.city_vs_movies.get(city, {}).values())
+    
+    def get_movie_in_city(self, movie_name, city):
+        """The movie with this name running in the city (the first added, if several are), else None"""
+        movie = self.exact_name_vs_movie.get(movie_name)
+        city_movies = self.city_vs_movies.get(city, {})
+        if movie is not None and movie.get_movie_id() in city_movies:
+            return movie
+        for movie in self.name_vs_movies.get(self.normalize_name(movie_name), ()):
+            if movie.get_movie_id() in city_movies:
                 return movie
         return None
     
-    def get_movies_by_city(self, city):
-        return self.city_vs_movies.get(city, [])
+    def search_movies_by_prefix(self, prefix, city=None, limit=10):
+        """Type-ahead: movies whose normalized name starts with prefix, in name order
+        
+        With a city, only that city's name index is scanned, so the cost stays
+        O(log n + limit) however many other cities match the prefix.
+        """
+        prefix = self.normalize_name(prefix)
+        if city is None:
+            sorted_names, city_movies = self.sorted_names, None
+        else:
+            sorted_names, city_movies = self.city_vs_sorted_names.get(city, []), self.city_vs_movies.get(city, {})
+        matches = []
+        
+        index = bisect.bisect_left(sorted_names, prefix)
+        while index < len(sorted_names) and len(matches) < limit:
+            name = sorted_names[index]
+            if not name.startswith(prefix):
+                break
+            for movie in self.name_vs_movies[name]:
+                if city_movies is None or movie.get_movie_id() in city_movies:
+                    matches.append(movie)
+            index += 1
+        return matches[:limit]
+
+
+def _insort_unique(sorted_values, value):
+    index = bisect.bisect_left(sorted_values, value)
+    if index == len(sorted_values) or sorted_values[index] != value:
+        sorted_values.insert(index, value)
+
+
+# show_timeline.py
+class ShowTimeline:
+    """Shows ordered by (start time, show id); a range scan is a bisect plus the shows it returns
+    
+    The (start time, show id) key of a returned show doubles as a cursor:
+    pass the last one as after= to fetch the next page.
+    """
+    __slots__ = ("keys", "shows")
+    
+    def __init__(self):
+        self.keys = []
+        self.shows = []
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    @staticmethod
+    def key(show):
+        return show.get_show_start_time(), show.get_show_id()
+    
+    def add(self, show):
+        key = self.key(show)
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.shows.insert(index, show)
+    
+    def remove(self, show):
+        key = self.key(show)
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+            del self.shows[index]
+    
+    def find(self, start=None, end=None, limit=None, after=None):
+        """(shows starting in [start, end) after the cursor, cursor of the next page or None)"""
+        keys = self.keys
+        low = 0 if start is None else bisect.bisect_left(keys, (start,))
+        if after is not None:
+            low = max(low, bisect.bisect_right(keys, after))
+        high = len(keys) if end is None else bisect.bisect_left(keys, (end,))
+        if limit is not None and low + limit < high:
+            return self.shows[low:low + limit], keys[low + limit - 1]
+        return self.shows[low:high], None
+    
+    def started_before(self, now):
+        """Shows that start before now, earliest first"""
+        return self.shows[:bisect.bisect_left(self.keys, (now,))]
 
 
 # theatre_controller.py
@@ -426,105 +1753,431 @@ class TheatreController:
     def __init__(self):
         self.city_vs_theatre = {}
         self.all_theatre = []
+        # (city, movie_id) -> {theatre: shows sorted by start time}, kept up to date on every add/remove
+        self.city_movie_vs_shows = {}
+        self.city_movie_vs_timeline = {}  # (city, movie_id) -> ShowTimeline across theatres
+        self.theatre_vs_timeline = {}  # theatre -> ShowTimeline of all its movies
+        self.theatre_vs_city = {}
+        self.index_lock = threading.Lock()
+        self.event_stream = None  # BookingEventStream every indexed show is attached to
+        self.show_removed_listeners = []  # called with each show dropped by remove_show or expire_shows
     
     def add_theatre(self, theatre, city):
+        with self.index_lock:
+            self._add_theatre(theatre, city)
+    
+    def add_theatres(self, theatre_cities):
+        """add_theatre for each (theatre, city) under one acquisition of the index lock"""
+        with self.index_lock:
+            for theatre, city in theatre_cities:
+                self._add_theatre(theatre, city)
+    
+    def _add_theatre(self, theatre, city):
         self.all_theatre.append(theatre)
         
         if city not in self.city_vs_theatre:
             self.city_vs_theatre[city] = []
         
         self.city_vs_theatre[city].append(theatre)
+        self.theatre_vs_city[theatre] = city
+        for show in theatre.get_shows():
+            self._index_show(city, theatre, show)
+    
+    def add_show(self, theatre, show):
+        """Add a show to an already registered theatre and index it"""
+        self.add_shows([(theatre, show)])
+    
+    def add_shows(self, theatre_shows):
+        """add_show for each (theatre, show) under one acquisition of the index lock"""
+        with self.index_lock:
+            for theatre, show in theatre_shows:
+                theatre.get_shows().append(show)
+                self._index_show(self.theatre_vs_city[theatre], theatre, show)
+    
+    def remove_show(self, theatre, show):
+        with self.index_lock:
+            self._unindex_show(theatre, show)
+    
+    def expire_shows(self, now=None):
+        """Drop every show that has already started from the theatres and all indexes; returns how many"""
+        now = now or datetime.now()
+        with self.index_lock:
+            expired = [
+                (theatre, show)
+                for theatre, timeline in self.theatre_vs_timeline.items()
+                for show in timeline.started_before(now)
+            ]
+            for theatre, show in expired:
+                self._unindex_show(theatre, show)
+            return len(expired)
+    
+    def add_show_removed_listener(self, listener):
+        """listener(show) runs, under the index lock, for every show removed or expired from now on"""
+        self.show_removed_listeners.append(listener)
+    
+    def _unindex_show(self, theatre, show):
+        theatre.get_shows().remove(show)
+        if self.event_stream is not None:
+            self.event_stream.detach(show)
+        for listener in self.show_removed_listeners:
+            listener(show)
+        key = (self.theatre_vs_city[theatre], show.get_movie().get_movie_id())
+        theatre_vs_shows = self.city_movie_vs_shows.get(key, {})
+        shows = theatre_vs_shows.get(theatre, [])
+        if show in shows:
+            shows.remove(show)
+            if not shows:
+                del theatre_vs_shows[theatre]
+            if not theatre_vs_shows:
+                self.city_movie_vs_shows.pop(key, None)
+        for timelines, timeline_key in ((self.city_movie_vs_timeline, key), (self.theatre_vs_timeline, theatre)):
+            timeline = timelines.get(timeline_key)
+            if timeline is not None:
+                timeline.remove(show)
+                if not timeline:
+                    del timelines[timeline_key]
+    
+    def _index_show(self, city, theatre, show):
+        key = (city, show.get_movie().get_movie_id())
+        shows = self.city_movie_vs_shows.setdefault(key, {}).setdefault(theatre, [])
+        bisect.insort(shows, show, key=lambda indexed_show: indexed_show.get_show_start_time())
+        self.city_movie_vs_timeline.setdefault(key, ShowTimeline()).add(show)
+        self.theatre_vs_timeline.setdefault(theatre, ShowTimeline()).add(show)
+        if self.event_stream is not None:
+            self.event_stream.attach(show, theatre, city)
+    
+    def set_event_stream(self, event_stream):
+        """Attach every show, now and as it is added, to event_stream (subscribe its projections first)"""
+        with self.index_lock:
+            self.event_stream = event_stream
+            for theatre in self.all_theatre:
+                for show in theatre.get_shows():
+                    event_stream.attach(show, theatre, self.theatre_vs_city[theatre])
     
     def get_all_show(self, movie, city):
-        theatre_vs_shows = {}
-        theatres = self.city_vs_theatre.get(city, [])
-        
-        for theatre in theatres:
-            given_movie_shows = []
-            shows = theatre.get_shows()
-            
-            for show in shows:
-                if show.movie.get_movie_id() == movie.get_movie_id():
-                    given_movie_shows.append(show)
-            
-            if given_movie_shows:
-                theatre_vs_shows[theatre] = given_movie_shows
+        """theatre -> shows of this movie in the city, earliest first; O(1) plus the result size"""
+        theatre_vs_shows = self.city_movie_vs_shows.get((city, movie.get_movie_id()), {})
+        return {theatre: list(shows) for theatre, shows in list(theatre_vs_shows.items())}
+    
+    def get_all_shows(self):
+        return [show for theatre in list(self.all_theatre) for show in list(theatre.get_shows())]
+    
+    def find_shows(self, movie, city, start=None, end=None, limit=None, after=None):
+        """(shows of movie in city starting in [start, end), earliest first, next-page cursor or None)
         
-        return theatre_vs_shows
+        O(log n + k) for k shows returned; after is the cursor of the previous page.
+        """
+        with self.index_lock:
+            timeline = self.city_movie_vs_timeline.get((city, movie.get_movie_id()))
+            return timeline.find(start, end, limit, after) if timeline else ([], None)
+    
+    def find_theatre_shows(self, theatre, start=None, end=None, limit=None, after=None):
+        """find_shows over every movie playing in one theatre"""
+        with self.index_lock:
+            timeline = self.theatre_vs_timeline.get(theatre)
+            return timeline.find(start, end, limit, after) if timeline else ([], None)
 
 
 # book_my_show.py with concurrency control
 class BookMyShow:
-    def __init__(self):
-        self.movie_controller = MovieController()
-        self.theatre_controller = TheatreController()
+    def __init__(self, movie_controller=None, theatre_controller=None, lock_provider=None):
+        # Pass SQLite-backed controllers (sqlite_store.py) to keep the catalog and seats in a database
+        self.movie_controller = movie_controller or MovieController()
+        self.theatre_controller = theatre_controller or TheatreController()
+        # A LockProvider (distributed_lock.py) replaces show.lock for the lock-holding services, so
+        # several processes can book the same shows; the others rely on conditional writes already
+        self.lock_provider = lock_provider
         self.optimistic_service = OptimisticLockingBookingService()
-        self.pessimistic_service = PessimisticLockingBookingService()
+        self.pessimistic_service = PessimisticLockingBookingService(lock_provider=lock_provider)
+        self.seat_locking_service = SeatLockingBookingService()
         self.two_phase_service = TwoPhaseBookingService()
-    
-    def create_booking_optimistic(self, user_city, movie_name, user_id, seat_number=30):
+        self.single_writer_service = SingleWriterBookingService(lock_provider=lock_provider)
+        self.theatre_controller.add_show_removed_listener(self.single_writer_service.retire_writer)
+        self.theatre_controller.add_show_removed_listener(METRICS.forget_show)
+        # Outcomes of requests that carried an idempotency_key, for retried requests
+        self.idempotency_cache = IdempotencyCache()
+    
+    @idempotent
+    def create_booking_optimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
         """Create booking using optimistic locking"""
         print(f"User {user_id}: Starting optimistic booking...")
         
         interested_show = self._get_show(user_city, movie_name)
         if not interested_show:
-            return
+            return Retryable()
         
         success, message = self.optimistic_service.book_seat_optimistic(
             interested_show, seat_number, user_id
         )
         
         if success:
-            booking = self._create_booking_object(interested_show, seat_number, user_id)
+            booking = self._create_booking_object(interested_show, [seat_number], user_id)
             print(f"User {user_id}: {message}")
+            return booking
         else:
             print(f"User {user_id}: {message}")
+            return self._failed_booking(interested_show, [seat_number], None)
     
-    def create_booking_pessimistic(self, user_city, movie_name, user_id, seat_number=30):
+    @idempotent
+    def create_booking_pessimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
         """Create booking using pessimistic locking"""
         print(f"User {user_id}: Starting pessimistic booking...")
         
         interested_show = self._get_show(user_city, movie_name)
         if not interested_show:
-            return
+            return Retryable()
         
         success, message = self.pessimistic_service.book_seat_pessimistic(
             interested_show, seat_number, user_id
         )
         
         if success:
-            booking = self._create_booking_object(interested_show, seat_number, user_id)
+            booking = self._create_booking_object(interested_show, [seat_number], user_id)
             print(f"User {user_id}: {message}")
+            return booking
         else:
             print(f"User {user_id}: {message}")
+            return self._failed_booking(interested_show, [seat_number], None)
     
-    def create_booking_two_phase(self, user_city, movie_name, user_id, seat_number=30):
+    @idempotent
+    def create_booking_fine_grained(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        """Create booking locking only the requested seat"""
+        print(f"User {user_id}: Starting fine-grained booking...")
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable()
+        
+        success, message = self.seat_locking_service.book_seat_fine_grained(
+            interested_show, seat_number, user_id
+        )
+        
+        if success:
+            booking = self._create_booking_object(interested_show, [seat_number], user_id)
+            print(f"User {user_id}: {message}")
+            return booking
+        else:
+            print(f"User {user_id}: {message}")
+            return self._failed_booking(interested_show, [seat_number], None)
+    
+    @idempotent
+    def create_booking_two_phase(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
         """Create booking using two-phase approach"""
         print(f"User {user_id}: Starting two-phase booking...")
         
         interested_show = self._get_show(user_city, movie_name)
         if not interested_show:
-            return
+            return Retryable()
         
         success, message = self.two_phase_service.book_seat_two_phase(
             interested_show, seat_number, user_id
         )
         
         if success:
-            booking = self._create_booking_object(interested_show, seat_number, user_id)
+            booking = self._create_booking_object(interested_show, [seat_number], user_id)
             print(f"User {user_id}: {message}")
+            return booking
         else:
             print(f"User {user_id}: {message}")
+            return self._failed_booking(interested_show, [seat_number], None)
+    
+    @idempotent
+    def create_booking_single_writer(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        """Create booking through the show's single writer"""
+        print(f"User {user_id}: Starting single-writer booking...")
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable()
+        
+        success, message = self.single_writer_service.book_seat_single_writer(
+            interested_show, seat_number, user_id
+        )
+        
+        if success:
+            booking = self._create_booking_object(interested_show, [seat_number], user_id)
+            print(f"User {user_id}: {message}")
+            return booking
+        else:
+            print(f"User {user_id}: {message}")
+            return self._failed_booking(interested_show, [seat_number], None)
+    
+    @idempotent
+    def create_group_booking_optimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        """Book several seats all-or-nothing using optimistic locking"""
+        print(f"User {user_id}: Starting optimistic group booking for {len(seat_numbers)} seats...")
+        if not seat_numbers:
+            return self._reject_empty_group_booking(user_id)
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable((None, list(seat_numbers)))
+        
+        success, message, conflicts = self.optimistic_service.book_seats_optimistic(
+            interested_show, seat_numbers, user_id
+        )
+        return self._finish_group_booking(interested_show, seat_numbers, user_id, success, message, conflicts)
+    
+    @idempotent
+    def create_group_booking_pessimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        """Book several seats all-or-nothing using pessimistic locking"""
+        print(f"User {user_id}: Starting pessimistic group booking for {len(seat_numbers)} seats...")
+        if not seat_numbers:
+            return self._reject_empty_group_booking(user_id)
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable((None, list(seat_numbers)))
+        
+        success, message, conflicts = self.pessimistic_service.book_seats_pessimistic(
+            interested_show, seat_numbers, user_id
+        )
+        return self._finish_group_booking(interested_show, seat_numbers, user_id, success, message, conflicts)
+    
+    @idempotent
+    def create_group_booking_fine_grained(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        """Book several seats all-or-nothing locking only those seats"""
+        print(f"User {user_id}: Starting fine-grained group booking for {len(seat_numbers)} seats...")
+        if not seat_numbers:
+            return self._reject_empty_group_booking(user_id)
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable((None, list(seat_numbers)))
+        
+        success, message, conflicts = self.seat_locking_service.book_seats_fine_grained(
+            interested_show, seat_numbers, user_id
+        )
+        return self._finish_group_booking(interested_show, seat_numbers, user_id, success, message, conflicts)
+    
+    @idempotent
+    def create_group_booking_two_phase(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        """Hold several seats together, pay once and confirm them all-or-nothing"""
+        print(f"User {user_id}: Starting two-phase group booking for {len(seat_numbers)} seats...")
+        if not seat_numbers:
+            return self._reject_empty_group_booking(user_id)
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable((None, list(seat_numbers)))
+        
+        success, message, conflicts = self.two_phase_service.book_seats_two_phase(
+            interested_show, seat_numbers, user_id
+        )
+        return self._finish_group_booking(interested_show, seat_numbers, user_id, success, message, conflicts)
+    
+    @idempotent
+    def create_group_booking_single_writer(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        """Book several seats all-or-nothing through the show's single writer"""
+        print(f"User {user_id}: Starting single-writer group booking for {len(seat_numbers)} seats...")
+        if not seat_numbers:
+            return self._reject_empty_group_booking(user_id)
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable((None, list(seat_numbers)))
+        
+        success, message, conflicts = self.single_writer_service.book_seats_single_writer(
+            interested_show, seat_numbers, user_id
+        )
+        return self._finish_group_booking(interested_show, seat_numbers, user_id, success, message, conflicts)
+    
+    @idempotent
+    def create_booking_best_available(self, user_city, movie_name, user_id, seat_category, count, idempotency_key=None):
+        """Book the most central block of count adjacent seats in a category"""
+        print(f"User {user_id}: Looking for {count} adjacent {seat_category.value} seats...")
+        
+        interested_show = self._get_show(user_city, movie_name)
+        if not interested_show:
+            return Retryable()
+        
+        success, message, seat_ids = self.two_phase_service.book_best_available(
+            interested_show, seat_category, count, user_id
+        )
+        if not success:
+            # Nothing names a seat that is taken for good, so a retry may still find a block
+            print(f"User {user_id}: {message}")
+            return Retryable()
+        booking, _ = self._finish_group_booking(interested_show, seat_ids, user_id, success, message, [])
+        return booking
+    
+    @staticmethod
+    def _reject_empty_group_booking(user_id):
+        print(f"User {user_id}: No seats requested")
+        return None, []
+    
+    def _finish_group_booking(self, show, seat_numbers, user_id, success, message, conflicts):
+        """Returns (booking, conflicting seat ids); booking is None when nothing was booked"""
+        if success:
+            print(f"User {user_id}: {message}")
+            return self._create_booking_object(show, sorted(set(seat_numbers)), user_id), []
+        
+        print(f"User {user_id}: {message} {conflicts if conflicts else ''}")
+        return self._failed_booking(show, seat_numbers, (None, conflicts))
+    
+    @staticmethod
+    def _failed_booking(show, seat_ids, result):
+        """result of a failed booking, as a final outcome only if one of the seats is taken
+        
+        Anything else (retries exhausted, a busy show, a timeout, a declined
+        payment) is Retryable, so a retry with the same idempotency key runs.
+        """
+        return result if show.get_unavailable_seats(seat_ids) else Retryable(result)
+    
+    def search_shows(self, user_city, movie_name, start=None, end=None, limit=20, after=None):
+        """One page of movie_name's shows in user_city starting in [start, end); (shows, next-page cursor)
+        
+        start defaults to now, so shows that have already begun are never
+        returned, whether or not expire_shows has purged them yet.
+        """
+        movie = self.movie_controller.get_movie_in_city(movie_name, user_city)
+        if movie is None:
+            return [], None
+        return self.theatre_controller.find_shows(movie, user_city, start or datetime.now(), end, limit, after)
+    
+    def get_theatre_availability(self, theatre, start=None, end=None):
+        """Seats left per SeatCategory across the theatre's shows starting in [start, end); start defaults to now"""
+        shows, _ = self.theatre_controller.find_theatre_shows(theatre, start or datetime.now(), end)
+        return self._sum_availability(shows)
+    
+    def get_city_availability(self, user_city, movie_name=None, start=None, end=None):
+        """get_theatre_availability across every theatre in user_city, for one movie or all of them"""
+        if movie_name is None:
+            movies = self.movie_controller.get_movies_by_city(user_city)
+        else:
+            movie = self.movie_controller.get_movie_in_city(movie_name, user_city)
+            movies = [movie] if movie is not None else []
+        start = start or datetime.now()
+        return self._sum_availability([
+            show for movie in movies for show in self.theatre_controller.find_shows(movie, user_city, start, end)[0]
+        ])
+    
+    @staticmethod
+    def _sum_availability(shows):
+        """SeatCategory -> {"available", "held", "booked", "shows", "min_price"} from each show's counters
+        
+        shows counts the shows with a seat left in the category and min_price
+        is the cheapest of them (None if none of them is priced).
+        """
+        summary = {}
+        for show in shows:
+            for category, availability in show.get_category_availability().items():
+                totals = summary.get(category)
+                if totals is None:
+                    totals = summary[category] = {"available": 0, "held": 0, "booked": 0, "shows": 0, "min_price": None}
+                totals["available"] += availability["available"]
+                totals["held"] += availability["held"]
+                totals["booked"] += availability["booked"]
+                if availability["available"]:
+                    totals["shows"] += 1
+                    price = availability["price"]
+                    if price is not None and (totals["min_price"] is None or price < totals["min_price"]):
+                        totals["min_price"] = price
+        return summary
     
     def _get_show(self, user_city, movie_name):
         """Helper method to get show"""
-        movies = self.movie_controller.get_movies_by_city(user_city)
-        
-        interested_movie = None
-        for movie in movies:
-            if movie.get_movie_name() == movie_name:
-                interested_movie = movie
-                break
+        interested_movie = self.movie_controller.get_movie_in_city(movie_name, user_city)
         
         if not interested_movie:
             print(f"Movie {movie_name} not found in {user_city.value}")
@@ -539,15 +2192,12 @@ class BookMyShow:
         theatre, running_shows = next(iter(shows_theatre_wise.items()))
         return running_shows[0]
     
-    def _create_booking_object(self, show, seat_number, user_id):
+    def _create_booking_object(self, show, seat_numbers, user_id):
         """Helper method to create booking object"""
         booking = Booking()
         booking.user_id = user_id
-        my_booked_seats = []
-        
-        for screen_seat in show.get_screen().get_seats():
-            if screen_seat.get_seat_id() == seat_number:
-                my_booked_seats.append(screen_seat)
+        screen = show.get_screen()
+        my_booked_seats = [screen.get_seat(seat_number) for seat_number in seat_numbers]
         
         booking.set_booked_seats(my_booked_seats)
         booking.set_show(show)
@@ -555,16 +2205,37 @@ class BookMyShow:
         
         return booking
     
-    def initialize(self):
+    def get_all_shows(self):
+        return self.theatre_controller.get_all_shows()
+    
+    def attach_journal(self, journal, checkpoint_interval_seconds=None):
+        """Recover every show from a BookingJournal and journal all changes from now on
+        
+        Call after the catalog is loaded; returns how many records were replayed.
+        """
+        replayed = journal.recover(self.get_all_shows())
+        if checkpoint_interval_seconds:
+            journal.start_checkpointing(self.get_all_shows, checkpoint_interval_seconds)
+        return replayed
+    
+    def attach_event_stream(self, event_stream):
+        """Publish every seat change to a BookingEventStream; its projections serve the listing pages"""
+        self.theatre_controller.set_event_stream(event_stream)
+    
+    def initialize(self, cities=None):
+        """Demo catalog; cities limits it to the theatres and movie listings in those cities"""
+        cities = set(City if cities is None else cities)
+        
         # create movies
-        self.create_movies()
+        self.create_movies(cities)
         
         # create theater with screens, seats and shows
-        self.create_theatre()
+        self.create_theatre(cities)
     
-    def create_theatre(self):
+    def create_theatre(self, cities=frozenset(City)):
         avenger_movie = self.movie_controller.get_movie_by_name("AVENGERS")
         baahubali = self.movie_controller.get_movie_by_name("BAAHUBALI")
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Create INOX Theatre
         inox_theatre = Theatre()
@@ -573,8 +2244,8 @@ class BookMyShow:
         inox_theatre.set_city(City.BANGALORE)
         
         inox_shows = []
-        inox_morning_show = self.create_shows(1, inox_theatre.get_screens()[0], avenger_movie, 8)
-        inox_evening_show = self.create_shows(2, inox_theatre.get_screens()[0], baahubali, 16)
+        inox_morning_show = self.create_shows(1, inox_theatre.get_screens()[0], avenger_movie, today + timedelta(hours=8))
+        inox_evening_show = self.create_shows(2, inox_theatre.get_screens()[0], baahubali, today + timedelta(hours=16))
         inox_shows.extend([inox_morning_show, inox_evening_show])
         inox_theatre.set_shows(inox_shows)
         
@@ -585,13 +2256,14 @@ class BookMyShow:
         pvr_theatre.set_city(City.DELHI)
         
         pvr_shows = []
-        pvr_morning_show = self.create_shows(3, pvr_theatre.get_screens()[0], avenger_movie, 13)
-        pvr_evening_show = self.create_shows(4, pvr_theatre.get_screens()[0], baahubali, 20)
+        pvr_morning_show = self.create_shows(3, pvr_theatre.get_screens()[0], avenger_movie, today + timedelta(hours=13))
+        pvr_evening_show = self.create_shows(4, pvr_theatre.get_screens()[0], baahubali, today + timedelta(hours=20))
         pvr_shows.extend([pvr_morning_show, pvr_evening_show])
         pvr_theatre.set_shows(pvr_shows)
         
-        self.theatre_controller.add_theatre(inox_theatre, City.BANGALORE)
-        self.theatre_controller.add_theatre(pvr_theatre, City.DELHI)
+        for theatre in (inox_theatre, pvr_theatre):
+            if theatre.get_city() in cities:
+                self.theatre_controller.add_theatre(theatre, theatre.get_city())
     
     def create_screen(self):
         screens = []
@@ -607,15 +2279,19 @@ class BookMyShow:
         show.set_screen(screen)
         show.set_movie(movie)
         show.set_show_start_time(show_start_time)
+        show.set_category_prices({SeatCategory.SILVER: 150, SeatCategory.GOLD: 250, SeatCategory.PLATINUM: 400})
         return show
     
     def create_seats(self):
         seats = []
+        seats_per_row = 10  # rows A-D SILVER, E-G GOLD, H-J PLATINUM
         
         # 0 to 39: SILVER
         for i in range(40):
             seat = Seat()
             seat.set_seat_id(i)
+            seat.set_row(chr(ord("A") + i // seats_per_row))
+            seat.set_seat_number(i % seats_per_row + 1)
             seat.set_seat_category(SeatCategory.SILVER)
             seats.append(seat)
         
@@ -623,6 +2299,8 @@ class BookMyShow:
         for i in range(40, 70):
             seat = Seat()
             seat.set_seat_id(i)
+            seat.set_row(chr(ord("A") + i // seats_per_row))
+            seat.set_seat_number(i % seats_per_row + 1)
             seat.set_seat_category(SeatCategory.GOLD)
             seats.append(seat)
         
@@ -630,12 +2308,14 @@ class BookMyShow:
         for i in range(70, 100):
             seat = Seat()
             seat.set_seat_id(i)
+            seat.set_row(chr(ord("A") + i // seats_per_row))
+            seat.set_seat_number(i % seats_per_row + 1)
             seat.set_seat_category(SeatCategory.PLATINUM)
             seats.append(seat)
         
         return seats
     
-    def create_movies(self):
+    def create_movies(self, cities=frozenset(City)):
         # create Movie 1
         avengers = Movie()
         avengers.set_movie_id(1)
@@ -649,20 +2329,21 @@ class BookMyShow:
         baahubali.set_movie_duration(180)
         
         # add movies against the cities
-        self.movie_controller.add_movie(avengers, City.BANGALORE)
-        self.movie_controller.add_movie(avengers, City.DELHI)
-        self.movie_controller.add_movie(baahubali, City.BANGALORE)
-        self.movie_controller.add_movie(baahubali, City.DELHI)
+        for movie in (avengers, baahubali):
+            for city in (City.BANGALORE, City.DELHI):
+                if city in cities:
+                    self.movie_controller.add_movie(movie, city)
 
 
 def test_concurrent_booking():
     """Test concurrent booking with different approaches"""
     
-    def test_approach(approach_name, booking_method):
+    def test_approach(approach_name, booking_method_name):
         print(f"\n=== Testing {approach_name} ===")
         
         book_my_show = BookMyShow()
         book_my_show.initialize()
+        booking_method = getattr(book_my_show, booking_method_name)
         
         # Create multiple users trying to book the same seat
         users = [f"User{i}" for i in range(1, 6)]
@@ -679,14 +2360,16 @@ def test_concurrent_booking():
             for future in futures:
                 future.result()
         
-        print(f"Final booked seats: {book_my_show._get_show(City.BANGALORE, 'BAAHUBALI').booked_seat_ids}")
-    
-    # Test different approaches
-    book_my_show = BookMyShow()
-    
-    test_approach("Optimistic Locking", book_my_show.create_booking_optimistic)
-    test_approach("Pessimistic Locking", book_my_show.create_booking_pessimistic)
-    test_approach("Two-Phase Booking", book_my_show.create_booking_two_phase)
+        show = book_my_show._get_show(City.BANGALORE, 'BAAHUBALI')
+        print(f"Final booked seats: {show.booked_seat_ids}")
+        print(f"GOLD availability: {show.get_category_availability()[SeatCategory.GOLD]}")
+    
+    # Test different approaches, each against a freshly initialized system
+    test_approach("Optimistic Locking", "create_booking_optimistic")
+    test_approach("Pessimistic Locking", "create_booking_pessimistic")
+    test_approach("Fine-Grained Seat Locking", "create_booking_fine_grained")
+    test_approach("Two-Phase Booking", "create_booking_two_phase")
+    test_approach("Single-Writer Booking", "create_booking_single_writer")
 
 
 # Main execution
@@ -7,4 +7,9 @@ class City(Enum):
 class SeatCategory(Enum):
     SILVER = "SILVER"
     GOLD = "GOLD"
-    PLATINUM = "PLATINUM"
\ No newline at end of file
+    PLATINUM = "PLATINUM"
+
+class SeatState(Enum):
+    AVAILABLE = 0
+    HELD = 1
+    BOOKED = 2
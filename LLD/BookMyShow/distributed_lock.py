@@ -0,0 +1,290 @@
+# distributed_lock.py
+# Lock providers for booking nodes that do not share a process. Show.lock and
+# the seat stripes only exclude threads of one process; a LockProvider hands
+# out leases on named locks instead. A lease lapses unless renewed, so a node
+# that dies or stalls cannot hold a show forever, and every lease carries a
+# fencing token that only ever grows. The show checks the token when the
+# booking commits and refuses one older than a token it has already accepted,
+# so a holder whose lease lapsed mid-booking cannot overwrite its successor.
+#
+# InProcessLockProvider keeps the locks in this process. UnixSocketLockServer
+# serves one to other processes on the same host and UnixSocketLockProvider is
+# its client, a local stand-in for a real lock service (etcd, ZooKeeper, ...).
+import abc
+import itertools
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LockLost(RuntimeError):
+    """The lease lapsed or was taken over before it was renewed or released"""
+
+
+class StaleFencingToken(RuntimeError):
+    """A commit carried a fencing token older than one the show already accepted"""
+
+
+class Lease:
+    """A held lock: name, owner, fencing token and when it lapses (time.monotonic())"""
+    __slots__ = ("name", "owner", "token", "expires_at")
+    
+    def __init__(self, name, owner, token, expires_at):
+        self.name = name
+        self.owner = owner
+        self.token = token
+        self.expires_at = expires_at
+    
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+    
+    def is_valid(self):
+        return self.remaining() > 0
+
+
+class LockProvider(abc.ABC):
+    """Named, lease-based locks with fencing tokens
+    
+    acquire blocks until the lock is free (or its holder's lease lapsed) and
+    returns a Lease, or None once timeout seconds have passed. Tokens
+    increase with every grant, across all names.
+    """
+    def __init__(self, lease_seconds=10.0):
+        self.lease_seconds = lease_seconds
+    
+    @abc.abstractmethod
+    def acquire(self, name, owner, lease_seconds=None, timeout=None):
+        """A Lease on name for owner, or None if it was not granted within timeout"""
+    
+    @abc.abstractmethod
+    def renew(self, lease, lease_seconds=None):
+        """Extend a lease that is still held; raises LockLost otherwise"""
+    
+    @abc.abstractmethod
+    def release(self, lease):
+        """Give the lock up; returns False if the lease had already lapsed or been taken over"""
+    
+    @contextmanager
+    def hold(self, name, owner, lease_seconds=None, timeout=None):
+        """acquire ... release; raises TimeoutError if the lock was not granted within timeout"""
+        lease = self.acquire(name, owner, lease_seconds, timeout)
+        if lease is None:
+            raise TimeoutError(f"Lock {name!r} not granted within {timeout}s")
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+    
+    def close(self):
+        pass
+
+
+# in_process_lock_provider.py
+class InProcessLockProvider(LockProvider):
+    """Lock table in this process: name -> (owner, token, expires_at) under one condition
+    
+    Waiters sleep until a release or until the holder's lease runs out,
+    whichever comes first. first_token lets a restarted provider carry on
+    above the tokens that shows have already accepted.
+    """
+    def __init__(self, lease_seconds=10.0, first_token=1):
+        super().__init__(lease_seconds)
+        self.condition = threading.Condition(threading.Lock())
+        self.holders = {}  # name -> (owner, token, expires_at)
+        self.tokens = itertools.count(first_token)
+        self.acquisitions = 0
+        self.waits = 0  # acquisitions that found the lock taken
+        self.takeovers = 0  # locks granted over a lapsed lease
+    
+    def acquire(self, name, owner, lease_seconds=None, timeout=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        with self.condition:
+            now = time.monotonic()
+            deadline = None if timeout is None else now + timeout
+            waited = False
+            while True:
+                holder = self.holders.get(name)
+                if holder is None or holder[2] <= now:
+                    break
+                wait = holder[2] - now
+                if deadline is not None:
+                    if deadline <= now:
+                        return None
+                    wait = min(wait, deadline - now)
+                waited = True
+                self.condition.wait(wait)
+                now = time.monotonic()
+            token = next(self.tokens)
+            expires_at = now + lease_seconds
+            self.holders[name] = (owner, token, expires_at)
+            self.acquisitions += 1
+            self.waits += waited
+            self.takeovers += holder is not None
+            return Lease(name, owner, token, expires_at)
+    
+    def renew(self, lease, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        with self.condition:
+            now = time.monotonic()
+            holder = self.holders.get(lease.name)
+            if holder is None or holder[1] != lease.token or holder[2] <= now:
+                raise LockLost(f"Lease on {lease.name!r} with token {lease.token} is no longer held")
+            lease.expires_at = now + lease_seconds
+            self.holders[lease.name] = (holder[0], holder[1], lease.expires_at)
+            return lease
+    
+    def release(self, lease):
+        with self.condition:
+            holder = self.holders.get(lease.name)
+            if holder is None or holder[1] != lease.token:
+                return False
+            del self.holders[lease.name]
+            self.condition.notify_all()
+            return holder[2] > time.monotonic()
+    
+    def get_stats(self):
+        with self.condition:
+            return {
+                "held": sum(1 for holder in self.holders.values() if holder[2] > time.monotonic()),
+                "acquisitions": self.acquisitions,
+                "waits": self.waits,
+                "takeovers": self.takeovers,
+            }
+
+
+# unix_socket_lock_server.py
+# One JSON object per line each way. Requests carry "op" plus its arguments;
+# every connection is served by its own thread, so a blocked acquire only
+# holds up the client that sent it.
+#
+#   {"op": "acquire", "name": "show:1", "owner": "node-a", "lease_seconds": 10, "timeout": 1}
+#       -> {"token": 17}  or  {"token": null} on timeout
+#   {"op": "renew", "name": "show:1", "token": 17, "lease_seconds": 10}  -> {"ok": true} or {"ok": false}
+#   {"op": "release", "name": "show:1", "token": 17}                       -> {"released": true}
+class LockRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        provider = self.server.provider
+        for line in self.rfile:
+            request = json.loads(line)
+            op = request["op"]
+            lease = Lease(request["name"], request.get("owner"), request.get("token"), 0.0)
+            if op == "acquire":
+                lease = provider.acquire(lease.name, lease.owner, request.get("lease_seconds"), request.get("timeout"))
+                response = {"token": lease.token if lease is not None else None}
+            elif op == "renew":
+                try:
+                    provider.renew(lease, request.get("lease_seconds"))
+                    response = {"ok": True}
+                except LockLost:
+                    response = {"ok": False}
+            elif op == "release":
+                response = {"released": provider.release(lease)}
+            else:
+                response = {"error": f"Unknown op {op!r}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class UnixSocketLockServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """An InProcessLockProvider served to other processes on a Unix socket
+    
+    start() serves from a background thread; run it in its own process
+    with serve_lock_server when the booking nodes should not depend on one
+    of them staying up.
+    """
+    daemon_threads = True
+    
+    def __init__(self, path, provider=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, LockRequestHandler)
+        self.path = path
+        self.provider = provider or InProcessLockProvider()
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="lock-server", daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve_lock_server(path, lease_seconds=10.0, first_token=1, ready=None):
+    """Process target: serve locks on path until the process is terminated"""
+    server = UnixSocketLockServer(path, InProcessLockProvider(lease_seconds, first_token))
+    if ready is not None:
+        ready.set()
+    server.serve_forever()
+
+
+class UnixSocketLockProvider(LockProvider):
+    """Client for UnixSocketLockServer; each thread keeps its own connection
+    
+    A lease is taken to lapse lease_seconds after the request was sent,
+    never later than the server's own clock says it does.
+    """
+    def __init__(self, path, lease_seconds=10.0):
+        super().__init__(lease_seconds)
+        self.path = path
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+    
+    def _call(self, **request):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            connection = self.local.connection = (sock, sock.makefile("rb"))
+            with self.connections_lock:
+                self.connections.append(connection)
+        sock, reader = connection
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        line = reader.readline()
+        if not line:
+            raise ConnectionError(f"Lock server at {self.path} closed the connection")
+        return json.loads(line)
+    
+    def acquire(self, name, owner, lease_seconds=None, timeout=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        sent_at = time.monotonic()
+        response = self._call(op="acquire", name=name, owner=owner, lease_seconds=lease_seconds, timeout=timeout)
+        if response["token"] is None:
+            return None
+        return Lease(name, owner, response["token"], sent_at + lease_seconds)
+    
+    def renew(self, lease, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        sent_at = time.monotonic()
+        if not self._call(op="renew", name=lease.name, token=lease.token, lease_seconds=lease_seconds)["ok"]:
+            raise LockLost(f"Lease on {lease.name!r} with token {lease.token} is no longer held")
+        lease.expires_at = sent_at + lease_seconds
+        return lease
+    
+    def release(self, lease):
+        return self._call(op="release", name=lease.name, token=lease.token)["released"]
+    
+    def close(self):
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for sock, reader in connections:
+            reader.close()
+            sock.close()
+
+
+# Main execution
+if __name__ == "__main__":
+    # python distributed_lock.py /tmp/bookmyshow-locks.sock
+    path = sys.argv[1] if len(sys.argv) > 1 else "/tmp/bookmyshow-locks.sock"
+    print(f"Serving locks on {path}")
+    serve_lock_server(path)
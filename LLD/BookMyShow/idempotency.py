@@ -0,0 +1,224 @@
+# idempotency.py
+# Idempotency keys for the booking entry points. A client that retries a
+# request with the same key gets the outcome of the first attempt instead of
+# a second booking. Outcomes live in a bounded LRU cache with a TTL, split into
+# independently locked shards so concurrent requests rarely share a lock; a
+# hit is a dict lookup and never reaches a Show. Only final outcomes are
+# cached: an entry point returns a failure a retry could fix (contention,
+# timeouts, a declined payment) wrapped in Retryable, and like an exception
+# it leaves the key free for the next attempt.
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was already used for a different request"""
+
+
+class Retryable:
+    """A failed outcome that a retry with the same key may improve on; never cached
+    
+    Entry points return it in place of their result and @idempotent hands
+    the caller result itself.
+    """
+    __slots__ = ("result",)
+    
+    def __init__(self, result=None):
+        self.result = result
+
+
+def unwrap(result):
+    return result.result if type(result) is Retryable else result
+
+
+class IdempotencyRecord:
+    """Outcome of the first request with a key; done is set once result is final"""
+    __slots__ = ("fingerprint", "result", "failed", "expires_at", "done")
+    
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.result = None
+        self.failed = False
+        self.expires_at = float("inf")  # set when the first request finishes
+        self.done = threading.Event()
+
+
+class IdempotencyCacheShard:
+    """One lock, one LRU-ordered dict of key -> IdempotencyRecord"""
+    __slots__ = ("capacity", "ttl_seconds", "lock", "records", "hits", "misses", "waits", "evictions", "expirations")
+    
+    def __init__(self, capacity, ttl_seconds):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.records = OrderedDict()  # least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0  # retries that arrived while the first request was still running
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _live_record(self, key, now):
+        """The record for key unless its TTL has run out; caller holds self.lock"""
+        record = self.records.get(key)
+        if record is not None and record.expires_at <= now:
+            del self.records[key]
+            self.expirations += 1
+            return None
+        return record
+    
+    def lookup(self, key, fingerprint):
+        """(True, result) for a finished request with this key, else (False, None)"""
+        with self.lock:
+            record = self._live_record(key, time.monotonic())
+            if record is None or not record.done.is_set():
+                return False, None
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different request")
+            self.records.move_to_end(key)
+            self.hits += 1
+            return True, record.result
+    
+    def get_or_run(self, key, fingerprint, run):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                record = self._live_record(key, now)
+                if record is None:
+                    record = self.records[key] = IdempotencyRecord(fingerprint)
+                    self.misses += 1
+                    self._evict(now)
+                    break
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different request")
+                self.records.move_to_end(key)
+                if record.done.is_set():
+                    self.hits += 1
+                    return record.result
+                self.waits += 1
+            
+            # Same request already in flight: wait for its outcome, or take over if it was not final
+            record.done.wait()
+            if not record.failed:
+                with self.lock:
+                    self.hits += 1
+                return record.result
+        
+        try:
+            result = run()
+        except BaseException:
+            self._forget(key, record)
+            raise
+        if type(result) is Retryable:
+            self._forget(key, record)
+            return result.result
+        record.result = result
+        record.expires_at = time.monotonic() + self.ttl_seconds
+        record.done.set()
+        return result
+    
+    def _forget(self, key, record):
+        """The first request ended without a final outcome: free the key and wake its waiters to retry"""
+        with self.lock:
+            if self.records.get(key) is record:
+                del self.records[key]
+        record.failed = True
+        record.done.set()
+    
+    def _evict(self, now):
+        """Drop expired records from the LRU end, then the least recently used beyond capacity"""
+        records = self.records
+        while records:
+            oldest = next(iter(records.values()))
+            if oldest.expires_at > now:
+                break
+            records.popitem(last=False)
+            self.expirations += 1
+        while len(records) > self.capacity:
+            records.popitem(last=False)
+            self.evictions += 1
+
+
+class IdempotencyCache:
+    """Bounded LRU + TTL map from idempotency key to the outcome of its first request"""
+    def __init__(self, capacity=100_000, ttl_seconds=24 * 3600, shard_count=16):
+        self.shards = [
+            IdempotencyCacheShard(max(1, capacity // shard_count), ttl_seconds) for _ in range(shard_count)
+        ]
+    
+    def _shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+    
+    def get_or_run(self, key, fingerprint, run):
+        """run()'s result, computed at most once per key while cached
+        
+        A concurrent retry waits for the first request; if that raises or
+        returns a Retryable, the outcome is not cached and the next request
+        with the key runs again.
+        Raises IdempotencyKeyReused if fingerprint differs from the first request's.
+        """
+        return self._shard(key).get_or_run(key, fingerprint, run)
+    
+    def lookup(self, key, fingerprint):
+        """(True, result) if a request with key has finished, without running anything"""
+        return self._shard(key).lookup(key, fingerprint)
+    
+    def get_stats(self):
+        totals = {"size": 0, "hits": 0, "misses": 0, "waits": 0, "evictions": 0, "expirations": 0}
+        for shard in self.shards:
+            with shard.lock:
+                totals["size"] += len(shard.records)
+                totals["hits"] += shard.hits
+                totals["misses"] += shard.misses
+                totals["waits"] += shard.waits
+                totals["evictions"] += shard.evictions
+                totals["expirations"] += shard.expirations
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        return totals
+
+
+def idempotent(method):
+    """Decorate a BookMyShow entry point taking (user_city, movie_name, user_id, ..., idempotency_key=None)
+    
+    With an idempotency_key the call goes through self.idempotency_cache,
+    keyed by (user_id, idempotency_key), so keys only need to be unique per
+    user. A retry must repeat the arguments exactly, however they are passed.
+    The method may return a Retryable; callers only ever see its result.
+    """
+    signature = inspect.signature(method)
+    key_index = list(signature.parameters).index("idempotency_key") - 1  # position in args, which excludes self
+    
+    def request(self, *args, **kwargs):
+        """(cache key, fingerprint) of a call, or None when it has no idempotency key"""
+        idempotency_key = kwargs.get("idempotency_key", args[key_index] if len(args) > key_index else None)
+        if idempotency_key is None:
+            return None
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments["self"], arguments["idempotency_key"]
+        return (arguments["user_id"], idempotency_key), (method.__name__, tuple(arguments.values()))
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if kwargs.get("idempotency_key") is None and len(args) <= key_index:
+            return unwrap(method(self, *args, **kwargs))
+        idempotency_request = request(self, *args, **kwargs)
+        if idempotency_request is None:
+            return unwrap(method(self, *args, **kwargs))
+        return self.idempotency_cache.get_or_run(*idempotency_request, lambda: method(self, *args, **kwargs))
+    
+    wrapper.idempotency_request = request
+    return wrapper
+
+
+def cached_outcome(entry_point, *args, **kwargs):
+    """(True, result) if this call to a bound @idempotent entry point already completed under its key"""
+    idempotency_request = entry_point.idempotency_request(entry_point.__self__, *args, **kwargs)
+    if idempotency_request is None:
+        return False, None
+    return entry_point.__self__.idempotency_cache.lookup(*idempotency_request)
@@ -0,0 +1,285 @@
+# load_test.py
+# Load-testing harness for the booking strategies. Every simulated user is a
+# thread that books seats picked uniformly or with Zipf skew (a few hot seats
+# take most of the demand). Reports throughput, latency percentiles, retries
+# and conflicts, checks that no seat was sold twice, and writes the results as
+# JSON so two versions can be compared with --baseline.
+#
+#   python load_test.py --users 200 --skew zipf --output results.json
+#   python load_test.py --baseline results.json
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from concurrency_handle_show import (
+    OptimisticLockingBookingService,
+    PessimisticLockingBookingService,
+    Screen,
+    Seat,
+    SeatCategory,
+    SeatLockingBookingService,
+    Show,
+    SingleWriterBookingService,
+    TwoPhaseBookingService,
+)
+
+
+STRATEGIES = ("optimistic", "pessimistic", "fine_grained", "two_phase", "single_writer")
+
+
+def build_shows(show_count, seats_per_show):
+    """show_count shows on one shared screen, seats split evenly across categories"""
+    categories = list(SeatCategory)
+    seats = []
+    for seat_id in range(seats_per_show):
+        seat = Seat()
+        seat.set_seat_id(seat_id)
+        seat.set_seat_category(categories[seat_id * len(categories) // seats_per_show])
+        seats.append(seat)
+    screen = Screen()
+    screen.set_screen_id(1)
+    screen.set_seats(seats)
+    
+    shows = []
+    for show_id in range(show_count):
+        show = Show()
+        show.set_show_id(show_id)
+        show.set_screen(screen)
+        shows.append(show)
+    return shows
+
+
+class DemandPicker:
+    """Picks items 0..count-1 uniformly or Zipf-distributed over a shuffled popularity order"""
+    def __init__(self, count, skew, zipf_exponent, rng):
+        self.items = list(range(count))
+        self.cumulative_weights = None
+        if skew == "zipf":
+            rng.shuffle(self.items)  # the hottest seats are scattered, not just the lowest ids
+            self.cumulative_weights = list(itertools.accumulate(1 / rank ** zipf_exponent for rank in range(1, count + 1)))
+    
+    def pick(self, rng, count=1):
+        """count distinct items; raises ValueError if there are fewer than count"""
+        if count > len(self.items):
+            raise ValueError(f"Cannot pick {count} distinct items out of {len(self.items)}")
+        if self.cumulative_weights is None:
+            return rng.sample(self.items, count)
+        picked = set()
+        while len(picked) < count:
+            picked.update(rng.choices(self.items, cum_weights=self.cumulative_weights, k=count - len(picked)))
+        return list(picked)
+
+
+def make_booker(strategy, config):
+    """(service, book(show, seat_ids, user_id) -> (success, message, conflicts)) for one strategy
+    
+    payment_latency is the work done while a booking is in flight: the
+    processing time of the locking strategies and the payment call of
+    two-phase. Only two-phase can fail its payment.
+    """
+    latency = (config.payment_latency, config.payment_latency)
+    if strategy == "optimistic":
+        service = OptimisticLockingBookingService(max_retries=config.max_retries, processing_time_range=latency)
+        return service, service.book_seats_optimistic
+    if strategy == "pessimistic":
+        service = PessimisticLockingBookingService(processing_time_range=latency)
+        return service, service.book_seats_pessimistic
+    if strategy == "fine_grained":
+        service = SeatLockingBookingService(processing_time_range=latency)
+        return service, service.book_seats_fine_grained
+    if strategy == "two_phase":
+        service = TwoPhaseBookingService(
+            payment_time_range=latency, payment_success_rate=1 - config.payment_failure_rate, verbose=False
+        )
+        return service, service.book_seats_two_phase
+    if strategy == "single_writer":
+        service = SingleWriterBookingService(processing_time_range=latency)
+        return service, service.book_seats_single_writer
+    raise ValueError(f"Unknown strategy {strategy}")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def check_bookings(shows, successes):
+    """Every sold seat belongs to exactly one successful booking and no holds are left behind"""
+    problems = []
+    owner = {}
+    for show_id, seat_ids, user_id in successes:
+        for seat_id in seat_ids:
+            if (show_id, seat_id) in owner:
+                problems.append(f"show {show_id} seat {seat_id} sold to {owner[show_id, seat_id]} and {user_id}")
+            owner[show_id, seat_id] = user_id
+    for show in shows:
+        booked = set(show.booked_seat_ids)
+        sold = {seat_id for show_id, seat_id in owner if show_id == show.get_show_id()}
+        if booked != sold:
+            problems.append(f"show {show.get_show_id()}: booked {len(booked)} seats but sold {len(sold)}")
+        if show.seat_reservations:
+            problems.append(f"show {show.get_show_id()}: {len(show.seat_reservations)} holds left behind")
+    return problems
+
+
+def run_strategy(strategy, config):
+    shows = build_shows(config.shows, config.seats_per_show)
+    service, book = make_booker(strategy, config)
+    layout_rng = random.Random(config.seed)
+    show_picker = DemandPicker(config.shows, config.skew, config.zipf_exponent, layout_rng)
+    seat_picker = DemandPicker(config.seats_per_show, config.skew, config.zipf_exponent, layout_rng)
+    
+    latencies = []
+    outcomes = {}
+    successes = []
+    record_lock = threading.Lock()
+    barrier = threading.Barrier(config.users + 1)
+    
+    def user(user_index):
+        rng = random.Random(config.seed * 1_000_003 + user_index)
+        user_id = f"User{user_index}"
+        user_latencies = []
+        user_outcomes = {}
+        user_successes = []
+        barrier.wait()
+        for _ in range(config.bookings_per_user):
+            show = shows[show_picker.pick(rng)[0]]
+            seat_ids = seat_picker.pick(rng, config.seats_per_booking)
+            start = time.perf_counter()
+            success, message, _ = book(show, seat_ids, user_id)
+            user_latencies.append(time.perf_counter() - start)
+            user_outcomes[message] = user_outcomes.get(message, 0) + 1
+            if success:
+                user_successes.append((show.get_show_id(), sorted(seat_ids), user_id))
+        with record_lock:
+            latencies.extend(user_latencies)
+            successes.extend(user_successes)
+            for message, count in user_outcomes.items():
+                outcomes[message] = outcomes.get(message, 0) + count
+    
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(config.users)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    requests = len(latencies)
+    result = {
+        "strategy": strategy,
+        "requests": requests,
+        "bookings": len(successes),
+        "seconds": elapsed,
+        "bookings_per_second": len(successes) / elapsed,
+        "requests_per_second": requests / elapsed,
+        "latency_ms": {
+            name: percentile(latencies, fraction) * 1000
+            for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "outcomes": outcomes,
+        "conflicts": requests - len(successes) - outcomes.get("Payment failed", 0),
+        "retries": 0,
+        "double_booking_problems": check_bookings(shows, successes),
+    }
+    if strategy == "optimistic":
+        stats = service.get_stats()
+        result["retries"] = stats["attempts"] - requests
+        result["optimistic"] = stats
+    if strategy == "single_writer":
+        result["single_writer"] = service.get_stats()
+        service.close()
+    return result
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Regressions: throughput down or p99 up by more than tolerance, or any double booking"""
+    regressions = []
+    baseline_vs_result = {result["strategy"]: result for result in baseline["results"]}
+    for result in results:
+        strategy = result["strategy"]
+        if result["double_booking_problems"]:
+            regressions.append(f"{strategy}: {len(result['double_booking_problems'])} double-booking problems")
+        previous = baseline_vs_result.get(strategy)
+        if previous is None:
+            continue
+        if result["bookings_per_second"] < previous["bookings_per_second"] * (1 - tolerance):
+            regressions.append(f"{strategy}: bookings/s {previous['bookings_per_second']:.0f}"
+                               f" -> {result['bookings_per_second']:.0f}")
+        if result["latency_ms"]["p99"] > previous["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(f"{strategy}: p99 {previous['latency_ms']['p99']:.1f}ms"
+                               f" -> {result['latency_ms']['p99']:.1f}ms")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the BookMyShow booking strategies")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--users", type=int, default=100, help="concurrent user threads")
+    parser.add_argument("--bookings-per-user", type=int, default=20)
+    parser.add_argument("--shows", type=int, default=4)
+    parser.add_argument("--seats-per-show", type=int, default=2000)
+    parser.add_argument("--seats-per-booking", type=int, default=2)
+    parser.add_argument("--skew", choices=("uniform", "zipf"), default="uniform")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--payment-latency", type=float, default=0.005, help="seconds per booking")
+    parser.add_argument("--payment-failure-rate", type=float, default=0.1, help="two-phase only")
+    parser.add_argument("--max-retries", type=int, default=3, help="optimistic only")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    config = parser.parse_args(argv)
+    for option in ("users", "bookings_per_user", "shows", "seats_per_show", "seats_per_booking"):
+        if getattr(config, option) < 1:
+            parser.error(f"--{option.replace('_', '-')} must be at least 1")
+    if config.seats_per_booking > config.seats_per_show:
+        parser.error(f"--seats-per-booking ({config.seats_per_booking}) cannot exceed"
+                     f" --seats-per-show ({config.seats_per_show})")
+    return config
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    print(f"{'strategy':>13} {'bookings/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          f" {'conflicts':>10} {'retries':>8} {'double-booked':>14}")
+    results = []
+    for strategy in config.strategies:
+        result = run_strategy(strategy, config)
+        results.append(result)
+        latency = result["latency_ms"]
+        print(f"{strategy:>13} {result['bookings_per_second']:>11.0f} {latency['p50']:>8.1f} {latency['p95']:>8.1f}"
+              f" {latency['p99']:>8.1f} {result['conflicts']:>10} {result['retries']:>8}"
+              f" {len(result['double_booking_problems']):>14}")
+    
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {name: value for name, value in vars(config).items() if name not in ("output", "baseline")},
+        "results": results,
+    }
+    if config.output:
+        with open(config.output, "w") as output:
+            json.dump(report, output, indent=2)
+    
+    failed = any(result["double_booking_problems"] for result in results)
+    if config.baseline:
+        with open(config.baseline) as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), config.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+# Main execution
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# sharded_book_my_show.py
+# City-sharded deployment: every city is owned by exactly one worker process
+# with its own BookMyShow (and its own GIL). A thin router in the caller's
+# process forwards each request to the owning shard over a multiprocessing
+# Pipe. Bookings never cross cities, so shards share nothing.
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from concurrency_handle_show import BookMyShow, City
+
+
+BOOKING_METHODS = {
+    "create_booking_optimistic",
+    "create_booking_pessimistic",
+    "create_booking_fine_grained",
+    "create_booking_two_phase",
+    "create_booking_single_writer",
+    "create_booking_best_available",
+}
+GROUP_BOOKING_METHODS = {
+    "create_group_booking_optimistic",
+    "create_group_booking_pessimistic",
+    "create_group_booking_fine_grained",
+    "create_group_booking_two_phase",
+    "create_group_booking_single_writer",
+}
+SEARCH_METHODS = {"search_movies", "get_shows", "search_shows"}
+
+
+def shard_for_city(city, shard_count):
+    """Stable city -> shard index, identical in every process"""
+    return zlib.crc32(city.value.encode()) % shard_count
+
+
+def build_demo_book_my_show(cities):
+    """Default shard initializer: the part of the demo catalog in the shard's own cities"""
+    book_my_show = BookMyShow()
+    book_my_show.initialize(cities)
+    return book_my_show
+
+
+def booking_summary(booking):
+    """Picklable view of a Booking; the Booking itself references lock-holding Show objects"""
+    if booking is None:
+        return None
+    return {
+        "booking_id": booking.booking_id,
+        "show_id": booking.get_show().get_show_id(),
+        "seat_ids": [seat.get_seat_id() for seat in booking.get_booked_seats()],
+        "user_id": booking.user_id,
+        "status": booking.status.value,
+    }
+
+
+# shard_worker.py
+class ShardWorker:
+    """Runs inside a shard process and executes requests against its BookMyShow"""
+    def __init__(self, book_my_show):
+        self.book_my_show = book_my_show
+    
+    def handle(self, method, args):
+        if method in BOOKING_METHODS:
+            return booking_summary(getattr(self.book_my_show, method)(*args))
+        if method in GROUP_BOOKING_METHODS:
+            booking, conflicts = getattr(self.book_my_show, method)(*args)
+            return booking_summary(booking), conflicts
+        if method in SEARCH_METHODS:
+            return getattr(self, method)(*args)
+        raise ValueError(f"Unknown shard method {method}")
+    
+    def search_movies(self, city, prefix, limit=10):
+        movies = self.book_my_show.movie_controller.search_movies_by_prefix(prefix, city, limit)
+        return [(movie.get_movie_id(), movie.get_movie_name()) for movie in movies]
+    
+    def get_shows(self, city, movie_name):
+        movie = self.book_my_show.movie_controller.get_movie_in_city(movie_name, city)
+        if movie is None:
+            return []
+        theatre_vs_shows = self.book_my_show.theatre_controller.get_all_show(movie, city)
+        return [
+            (theatre.get_theatre_id(), show.get_show_id(), show.get_show_start_time())
+            for theatre, shows in theatre_vs_shows.items() for show in shows
+        ]
+    
+    def search_shows(self, city, movie_name, start=None, end=None, limit=20, after=None):
+        shows, next_cursor = self.book_my_show.search_shows(city, movie_name, start, end, limit, after)
+        return [(show.get_show_id(), show.get_show_start_time()) for show in shows], next_cursor
+
+
+def run_shard(conn, cities, initializer, worker_threads, verbose):
+    """Shard process main loop: receive batches, run them on a thread pool, reply per batch"""
+    if not verbose:
+        # Booking entry points print progress; keep shard output quiet unless asked
+        sys.stdout = open(os.devnull, "w")
+    worker = ShardWorker(initializer(cities))
+    send_lock = threading.Lock()
+    
+    def execute(request_id, calls):
+        results = []
+        for method, args in calls:
+            try:
+                results.append((True, worker.handle(method, args)))
+            except Exception as e:
+                results.append((False, f"{type(e).__name__}: {e}"))
+        with send_lock:
+            conn.send((request_id, results))
+    
+    with ThreadPoolExecutor(max_workers=worker_threads) as executor:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            executor.submit(execute, *message)
+    conn.close()
+
+
+# shard_client.py
+class ShardClient:
+    """Router-side handle on one shard: sends requests and matches replies to futures"""
+    def __init__(self, cities, initializer, worker_threads, verbose, context):
+        self.cities = cities
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=run_shard, args=(child_conn, cities, initializer, worker_threads, verbose), daemon=True
+        )
+        self.send_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending = {}  # request_id -> Future
+        self.dead = False  # set once the shard's connection is gone; submit then fails straight away
+        self.request_ids = itertools.count()
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+    
+    def start(self):
+        self.process.start()
+        self.receiver.start()
+    
+    def submit(self, calls):
+        """Send a batch of (method, args) in one message; the future resolves to per-call results
+        
+        Raises RuntimeError if the shard process has already exited.
+        """
+        future = Future()
+        with self.pending_lock:
+            if self.dead:
+                raise RuntimeError("Shard process exited")
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+        try:
+            with self.send_lock:
+                self.conn.send((request_id, calls))
+        except (OSError, ValueError) as e:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+            raise RuntimeError("Shard process exited") from e
+        return future
+    
+    def _receive(self):
+        while True:
+            try:
+                request_id, results = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.pending_lock:
+                future = self.pending.pop(request_id)
+            future.set_result(results)
+        with self.pending_lock:
+            self.dead = True
+            pending, self.pending = list(self.pending.values()), {}
+        for future in pending:
+            future.set_exception(RuntimeError("Shard process exited"))
+    
+    def close(self):
+        with self.send_lock:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass  # the shard process is already gone
+        self.process.join()
+        self.conn.close()
+
+
+# sharded_book_my_show.py
+class ShardedBookMyShow:
+    """Router with the same booking and search entry points as BookMyShow"""
+    def __init__(self, shard_count, initializer=build_demo_book_my_show, cities=None,
+                 worker_threads=32, verbose=False):
+        cities = list(cities or City)
+        self.shard_count = shard_count
+        context = multiprocessing.get_context()
+        self.shards = [
+            ShardClient([city for city in cities if shard_for_city(city, shard_count) == index],
+                        initializer, worker_threads, verbose, context)
+            for index in range(shard_count)
+        ]
+    
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+        return self
+    
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def get_shard(self, city):
+        return self.shards[shard_for_city(city, self.shard_count)]
+    
+    def call(self, city, method, *args):
+        """Run one BookMyShow entry point on the shard owning city"""
+        [(ok, result)] = self.get_shard(city).submit([(method, args)]).result()
+        if not ok:
+            raise RuntimeError(result)
+        return result
+    
+    def call_batch(self, city, calls):
+        """Pipeline many (method, args) calls for one city in a single round trip"""
+        return self.get_shard(city).submit(calls)
+    
+    def create_booking_optimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self.call(user_city, "create_booking_optimistic", user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_pessimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self.call(user_city, "create_booking_pessimistic", user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_fine_grained(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self.call(user_city, "create_booking_fine_grained", user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_two_phase(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self.call(user_city, "create_booking_two_phase", user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_single_writer(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self.call(user_city, "create_booking_single_writer", user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_group_booking_optimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self.call(user_city, "create_group_booking_optimistic", user_city, movie_name, user_id, seat_numbers, idempotency_key)
+    
+    def create_group_booking_pessimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self.call(user_city, "create_group_booking_pessimistic", user_city, movie_name, user_id, seat_numbers, idempotency_key)
+    
+    def create_group_booking_fine_grained(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self.call(user_city, "create_group_booking_fine_grained", user_city, movie_name, user_id, seat_numbers, idempotency_key)
+    
+    def create_group_booking_two_phase(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self.call(user_city, "create_group_booking_two_phase", user_city, movie_name, user_id, seat_numbers, idempotency_key)
+    
+    def create_group_booking_single_writer(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self.call(user_city, "create_group_booking_single_writer", user_city, movie_name, user_id,
+                         seat_numbers, idempotency_key)
+    
+    def create_booking_best_available(self, user_city, movie_name, user_id, seat_category, count, idempotency_key=None):
+        return self.call(user_city, "create_booking_best_available", user_city, movie_name, user_id,
+                         seat_category, count, idempotency_key)
+    
+    def search_movies(self, user_city, prefix, limit=10):
+        return self.call(user_city, "search_movies", user_city, prefix, limit)
+    
+    def get_shows(self, user_city, movie_name):
+        return self.call(user_city, "get_shows", user_city, movie_name)
+    
+    def search_shows(self, user_city, movie_name, start=None, end=None, limit=20, after=None):
+        """([(show_id, start time)], next-page cursor) from the owning shard"""
+        return self.call(user_city, "search_shows", user_city, movie_name, start, end, limit, after)
+
+
+# Main execution
+if __name__ == "__main__":
+    with ShardedBookMyShow(shard_count=2) as sharded:
+        print(sharded.search_movies(City.BANGALORE, "ba"))
+        print(sharded.get_shows(City.DELHI, "AVENGERS"))
+        print(sharded.create_booking_pessimistic(City.BANGALORE, "BAAHUBALI", "User1", 30))
+        print(sharded.create_booking_pessimistic(City.BANGALORE, "BAAHUBALI", "User2", 30))
+        print(sharded.create_group_booking_fine_grained(City.DELHI, "AVENGERS", "User3", [1, 2, 3]))
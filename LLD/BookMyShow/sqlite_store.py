@@ -0,0 +1,887 @@
+# sqlite_store.py
+# SQLite storage for the catalog and seat inventory. SQLiteMovieController and
+# SQLiteTheatreController have the same interface as the in-memory
+# controllers, and the shows they hand out are SQLiteShows, so BookMyShow and
+# every booking service run unchanged against either store.
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from distributed_lock import StaleFencingToken
+from concurrency_handle_show import (
+    BookMyShow,
+    City,
+    Movie,
+    MovieController,
+    Screen,
+    Seat,
+    SeatBlockAllocator,
+    SeatCategory,
+    SeatEvent,
+    SeatMapSnapshot,
+    SeatState,
+    Show,
+    Theatre,
+    unpack_category_counts,
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    movie_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    normalized_name TEXT NOT NULL,
+    duration_minutes INTEGER
+);
+CREATE INDEX IF NOT EXISTS movies_by_name ON movies (normalized_name);
+CREATE TABLE IF NOT EXISTS movie_cities (
+    city TEXT NOT NULL,
+    movie_id INTEGER NOT NULL,
+    PRIMARY KEY (city, movie_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS theatres (
+    theatre_id INTEGER PRIMARY KEY,
+    city TEXT NOT NULL,
+    address TEXT
+);
+CREATE INDEX IF NOT EXISTS theatres_by_city ON theatres (city);
+CREATE TABLE IF NOT EXISTS screens (
+    theatre_id INTEGER NOT NULL,
+    screen_id INTEGER NOT NULL,
+    PRIMARY KEY (theatre_id, screen_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seats (
+    theatre_id INTEGER NOT NULL,
+    screen_id INTEGER NOT NULL,
+    seat_id INTEGER NOT NULL,
+    row_label TEXT,
+    seat_number INTEGER,
+    category TEXT NOT NULL,
+    PRIMARY KEY (theatre_id, screen_id, seat_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shows (
+    show_id INTEGER PRIMARY KEY,
+    theatre_id INTEGER NOT NULL,
+    screen_id INTEGER NOT NULL,
+    movie_id INTEGER NOT NULL,
+    city TEXT NOT NULL,
+    start_time REAL,
+    category_prices TEXT,
+    fencing_token INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shows_by_city_movie ON shows (city, movie_id, start_time, show_id);
+CREATE INDEX IF NOT EXISTS shows_by_theatre ON shows (theatre_id, start_time, show_id);
+CREATE INDEX IF NOT EXISTS shows_by_start_time ON shows (start_time);
+CREATE TABLE IF NOT EXISTS seat_states (
+    show_id INTEGER NOT NULL,
+    seat_id INTEGER NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    user_id TEXT,
+    hold_expiry REAL,
+    PRIMARY KEY (show_id, seat_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seat_states_by_state ON seat_states (show_id, state);
+"""
+
+# A seat is free if it is AVAILABLE or its hold has lapsed. Statements are
+# constant strings with the seat ids passed as one JSON array, so sqlite3's
+# per-connection statement cache prepares each of them only once.
+FREE_SEAT = "(state = 0 OR (state = 1 AND hold_expiry < :now))"
+SELECT_FREE_SEATS = f"""
+    SELECT seat_id, version FROM seat_states
+    WHERE show_id = :show_id AND seat_id IN (SELECT value FROM json_each(:seat_ids)) AND {FREE_SEAT}
+"""
+SELECT_USER_HOLDS = """
+    SELECT seat_id FROM seat_states
+    WHERE show_id = :show_id AND seat_id IN (SELECT value FROM json_each(:seat_ids))
+      AND state = 1 AND user_id = :user_id AND hold_expiry >= :now
+"""
+SELECT_SEAT_VERSIONS = """
+    SELECT seat_id, version FROM seat_states
+    WHERE show_id = :show_id AND seat_id IN (SELECT value FROM json_each(:seat_ids))
+"""
+SELECT_SEAT_MAP = "SELECT seat_id, state, hold_expiry, version FROM seat_states WHERE show_id = :show_id"
+SELECT_SEATS_IN_STATE = "SELECT seat_id FROM seat_states WHERE show_id = :show_id AND state = :state ORDER BY seat_id"
+RESERVE_SEAT = f"""
+    UPDATE seat_states SET state = 1, version = version + 1, user_id = :user_id, hold_expiry = :expiry
+    WHERE show_id = :show_id AND seat_id = :seat_id AND {FREE_SEAT}
+"""
+CONFIRM_SEAT = """
+    UPDATE seat_states SET state = 2, version = version + 1, hold_expiry = NULL
+    WHERE show_id = :show_id AND seat_id = :seat_id AND state = 1 AND user_id = :user_id AND hold_expiry >= :now
+"""
+BOOK_SEAT = f"""
+    UPDATE seat_states SET state = 2, version = version + 1, user_id = NULL, hold_expiry = NULL
+    WHERE show_id = :show_id AND seat_id = :seat_id AND {FREE_SEAT}
+"""
+BOOK_SEAT_AT_VERSION = f"""
+    UPDATE seat_states SET state = 2, version = version + 1, user_id = NULL, hold_expiry = NULL
+    WHERE show_id = :show_id AND seat_id = :seat_id AND version = :version AND {FREE_SEAT}
+"""
+CANCEL_SEATS = """
+    UPDATE seat_states SET state = 0, version = version + 1, user_id = NULL, hold_expiry = NULL
+    WHERE show_id = :show_id AND seat_id IN (SELECT value FROM json_each(:seat_ids)) AND state = 1 AND user_id = :user_id
+    RETURNING seat_id
+"""
+EXPIRE_HOLDS = """
+    UPDATE seat_states SET state = 0, version = version + 1, user_id = NULL, hold_expiry = NULL
+    WHERE show_id = :show_id AND state = 1 AND hold_expiry < :now
+    RETURNING seat_id
+"""
+SET_SEAT_STATE = """
+    UPDATE seat_states SET state = :state, version = version + 1, user_id = NULL, hold_expiry = NULL
+    WHERE show_id = :show_id AND seat_id = :seat_id AND state != :state
+"""
+# Shared by every process on the file, so a lapsed lease is fenced off on all of them
+ADVANCE_FENCING_TOKEN = "UPDATE shows SET fencing_token = :token WHERE show_id = :show_id AND fencing_token <= :token"
+INSERT_SEAT_STATE = "INSERT INTO seat_states (show_id, seat_id, state) VALUES (:show_id, :seat_id, :state)"
+
+
+def to_timestamp(start_time):
+    """Show start times are stored as POSIX timestamps"""
+    return None if start_time is None else start_time.timestamp()
+
+
+def from_timestamp(timestamp):
+    return None if timestamp is None else datetime.fromtimestamp(timestamp)
+
+
+def dump_prices(category_prices):
+    """Category prices are stored as a JSON object keyed by category name"""
+    return json.dumps({category.value: price for category, price in category_prices.items()})
+
+
+def load_prices(text):
+    return {SeatCategory(category): price for category, price in json.loads(text or "{}").items()}
+
+
+# sqlite_store.py
+class SQLiteStore:
+    """One database file plus a bounded pool of connections shared by booking threads
+    
+    Connections run in autocommit mode (isolation_level=None) so every write
+    transaction is an explicit BEGIN IMMEDIATE: it takes the write lock up
+    front instead of failing halfway on a lock upgrade.
+    """
+    def __init__(self, path, pool_size=8, busy_timeout=30.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.idle_connections = queue.LifoQueue()
+        self.opened = 0
+        self.pool_lock = threading.Lock()
+        self.movie_id_vs_movie = {}  # identity map, so both controllers hand out the same Movie objects
+        with self.connection() as connection:
+            connection.executescript(SCHEMA)
+    
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False,
+            cached_statements=64,
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; blocks when pool_size connections are in use"""
+        try:
+            connection = self.idle_connections.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                can_open = self.opened < self.pool_size
+                if can_open:
+                    self.opened += 1
+            connection = self._connect() if can_open else self.idle_connections.get()
+        try:
+            yield connection
+        finally:
+            self.idle_connections.put(connection)
+    
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT on a pooled connection; rolls back on error
+        
+        The body may issue its own ROLLBACK (e.g. on a booking conflict).
+        """
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            if connection.in_transaction:
+                connection.execute("COMMIT")
+    
+    def get_movie(self, connection, movie_id):
+        movie = self.movie_id_vs_movie.get(movie_id)
+        if movie is None:
+            row = connection.execute(
+                "SELECT movie_id, name, duration_minutes FROM movies WHERE movie_id = ?", (movie_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            movie = self.movie_id_vs_movie.setdefault(movie_id, self._movie_from_row(row))
+        return movie
+    
+    @staticmethod
+    def _movie_from_row(row):
+        movie = Movie()
+        movie.set_movie_id(row[0])
+        movie.set_movie_name(row[1])
+        movie.set_movie_duration(row[2])
+        return movie
+    
+    def close(self):
+        with self.pool_lock:
+            while not self.idle_connections.empty():
+                self.idle_connections.get_nowait().close()
+                self.opened -= 1
+
+
+# sqlite_movie_controller.py
+class SQLiteMovieController:
+    """MovieController interface over the movies and movie_cities tables"""
+    normalize_name = staticmethod(MovieController.normalize_name)
+    
+    def __init__(self, store):
+        self.store = store
+    
+    def add_movie(self, movie, city):
+        self.add_movies([(movie, city)])
+    
+    def add_movies(self, movie_cities):
+        """add_movie for each (movie, city) in one transaction"""
+        movie_cities = list(movie_cities)
+        with self.store.transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO movies (movie_id, name, normalized_name, duration_minutes) VALUES (?, ?, ?, ?)",
+                [
+                    (movie.get_movie_id(), movie.get_movie_name(), self.normalize_name(movie.get_movie_name()),
+                     movie.get_movie_duration())
+                    for movie in {movie.get_movie_id(): movie for movie, _ in movie_cities}.values()
+                ],
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO movie_cities (city, movie_id) VALUES (?, ?)",
+                [(city.value, movie.get_movie_id()) for movie, city in movie_cities],
+            )
+        for movie, _ in movie_cities:
+            self.store.movie_id_vs_movie.setdefault(movie.get_movie_id(), movie)
+    
+    def _movies(self, sql, parameters):
+        with self.store.connection() as connection:
+            return [
+                self.store.movie_id_vs_movie.setdefault(row[0], self.store._movie_from_row(row))
+                for row in connection.execute(sql, parameters)
+            ]
+    
+    def get_movie_by_name(self, movie_name):
+        """The lowest-id movie with this name; get_movies_by_name lists every one"""
+        movies = self._movies(
+            "SELECT movie_id, name, duration_minutes FROM movies WHERE normalized_name = ? ORDER BY movie_id LIMIT 1",
+            (self.normalize_name(movie_name),),
+        )
+        return movies[0] if movies else None
+    
+    def get_movies_by_name(self, movie_name):
+        return self._movies(
+            "SELECT movie_id, name, duration_minutes FROM movies WHERE normalized_name = ? ORDER BY movie_id",
+            (self.normalize_name(movie_name),),
+        )
+    
+    def get_movie_by_id(self, movie_id):
+        with self.store.connection() as connection:
+            return self.store.get_movie(connection, movie_id)
+    
+    def get_movies_by_city(self, city):
+        return self._movies(
+            "SELECT m.movie_id, m.name, m.duration_minutes FROM movie_cities c JOIN movies m USING (movie_id)"
+            " WHERE c.city = ?",
+            (city.value,),
+        )
+    
+    def get_movie_in_city(self, movie_name, city):
+        """The movie with this name if it is running in the city, else None"""
+        movies = self._movies(
+            "SELECT m.movie_id, m.name, m.duration_minutes FROM movies m JOIN movie_cities c USING (movie_id)"
+            " WHERE m.normalized_name = ? AND c.city = ? ORDER BY m.movie_id LIMIT 1",
+            (self.normalize_name(movie_name), city.value),
+        )
+        return movies[0] if movies else None
+    
+    def search_movies_by_prefix(self, prefix, city=None, limit=10):
+        """Type-ahead: movies whose normalized name starts with prefix, in name order (an index range scan)"""
+        prefix = self.normalize_name(prefix)
+        upper = prefix + chr(0x10FFFF)
+        if city is None:
+            return self._movies(
+                "SELECT movie_id, name, duration_minutes FROM movies"
+                " WHERE normalized_name >= ? AND normalized_name < ? ORDER BY normalized_name LIMIT ?",
+                (prefix, upper, limit),
+            )
+        return self._movies(
+            "SELECT m.movie_id, m.name, m.duration_minutes FROM movies m JOIN movie_cities c USING (movie_id)"
+            " WHERE m.normalized_name >= ? AND m.normalized_name < ? AND c.city = ?"
+            " ORDER BY m.normalized_name LIMIT ?",
+            (prefix, upper, city.value, limit),
+        )
+
+
+# sqlite_show.py
+class SQLiteShow(Show):
+    """Show whose seat inventory lives in the seat_states table; same seat API as Show
+    
+    Every change is one BEGIN IMMEDIATE transaction of conditional UPDATEs
+    batched with executemany, so a group booking is all-or-nothing across
+    threads and processes sharing the file. Show.lock and the seat lock
+    stripes still work and only narrow contention inside this process.
+    SQLite is the durable record, so no BookingJournal is attached.
+    
+    With an event stream attached, each write first expires the show's
+    lapsed holds in the same transaction, so every seat it touches moves
+    from a known state, and publishes once the transaction has committed.
+    Only writes made through this process are published.
+    """
+    __slots__ = ("store",)
+    
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+    
+    @classmethod
+    def from_show(cls, store, show):
+        sqlite_show = cls(store)
+        sqlite_show.set_show_id(show.get_show_id())
+        sqlite_show.set_movie(show.get_movie())
+        sqlite_show.set_screen(show.get_screen())
+        sqlite_show.set_show_start_time(show.get_show_start_time())
+        sqlite_show.category_prices = dict(show.get_category_prices())
+        return sqlite_show
+    
+    def _parameters(self, seat_ids, **parameters):
+        return {"show_id": self.show_id, "seat_ids": json.dumps(seat_ids), "now": datetime.now().timestamp(),
+                **parameters}
+    
+    def _update_seats(self, statement, rows, seat_ids, ok_seat_ids, event, user_id=None, fencing_token=None):
+        """Run statement once per row (one per seat), for every seat or none; returns (success, conflicts)
+        
+        ok_seat_ids(connection) names the seats the statement may change and
+        is only consulted to report conflicts once the batch has failed. On
+        success event is published for seat_ids.
+        """
+        with self.reservation_lock:
+            event_stream = self.event_stream
+            with self.store.transaction() as connection:
+                self._check_fencing_token(connection, fencing_token)
+                expired = self._expire_lapsed_holds(connection) if event_stream is not None else []
+                if connection.executemany(statement, rows).rowcount != len(rows):
+                    connection.execute("ROLLBACK")
+                    ok = ok_seat_ids(connection)
+                    return False, [seat_id for seat_id in seat_ids if seat_id not in ok]
+            if event_stream is not None:
+                self._publish(event_stream, expired, event, seat_ids, user_id)
+            return True, []
+    
+    def _expire_lapsed_holds(self, connection, now=None):
+        """Release the show's lapsed holds inside the caller's transaction; returns their seat ids
+        
+        Runs after the write's rows were stamped, so no hold the write still
+        sees as lapsed is left HELD.
+        """
+        parameters = {"show_id": self.show_id, "now": (now or datetime.now()).timestamp()}
+        return sorted(row[0] for row in connection.execute(EXPIRE_HOLDS, parameters))
+    
+    def _publish(self, event_stream, expired_seat_ids, event=None, seat_ids=(), user_id=None):
+        """Publish a committed write: the holds it expired first, then its own change"""
+        if expired_seat_ids:
+            event_stream.publish(self, SeatEvent.EXPIRE, expired_seat_ids, None)
+        if seat_ids:
+            event_stream.publish(self, event, list(seat_ids), user_id)
+    
+    def _check_fencing_token(self, connection, fencing_token):
+        """check_fencing_token against the shows row, inside the commit's transaction"""
+        if fencing_token is None:
+            return
+        if not connection.execute(ADVANCE_FENCING_TOKEN, {"show_id": self.show_id, "token": fencing_token}).rowcount:
+            latest = connection.execute("SELECT fencing_token FROM shows WHERE show_id = ?", (self.show_id,)).fetchone()
+            raise StaleFencingToken(f"Show {self.show_id}: fencing token {fencing_token} is older than {latest[0]}")
+    
+    def _rows(self, seat_ids, **parameters):
+        now = datetime.now().timestamp()
+        return [dict(parameters, show_id=self.show_id, seat_id=seat_id, now=now) for seat_id in seat_ids]
+    
+    def _free_seats(self, connection, seat_ids):
+        """seat_id -> version of the requested seats that are free right now"""
+        return dict(connection.execute(SELECT_FREE_SEATS, self._parameters(seat_ids)).fetchall())
+    
+    @property
+    def booked_seat_ids(self):
+        with self.store.connection() as connection:
+            return [row[0] for row in connection.execute(
+                SELECT_SEATS_IN_STATE, {"show_id": self.show_id, "state": SeatState.BOOKED.value}
+            )]
+    
+    def set_booked_seat_ids(self, booked_seat_ids):
+        booked_seat_ids = set(booked_seat_ids)
+        with self.reservation_lock:
+            with self.store.transaction() as connection:
+                connection.executemany(SET_SEAT_STATE, [
+                    {"show_id": self.show_id, "seat_id": seat_id,
+                     "state": (SeatState.BOOKED if seat_id in booked_seat_ids else SeatState.AVAILABLE).value}
+                    for seat_id in set(self.screen.seat_id_vs_seat) | booked_seat_ids
+                ])
+            if self.event_stream is not None:
+                # Projections start over from the table
+                self.event_stream.attach(self)
+    
+    def get_category_counts(self):
+        """Counted from the table, after expiring lapsed holds in the same transaction"""
+        with self.reservation_lock:
+            event_stream = self.event_stream
+            layout = self.screen.get_layout()
+            category_counts = list(layout.available_counts)
+            with self.store.transaction() as connection:
+                expired = self._expire_lapsed_holds(connection)
+                for seat_id, state, _, _ in connection.execute(SELECT_SEAT_MAP, {"show_id": self.show_id}):
+                    offset = layout.seat_count_offsets[seat_id]
+                    category_counts[offset] -= 1
+                    category_counts[offset + state] += 1
+            if event_stream is not None:
+                self._publish(event_stream, expired)
+            return unpack_category_counts(layout.category_seat_ids, tuple(category_counts))
+    
+    def set_category_prices(self, category_prices):
+        """Also stored on the show's row; takes effect for other processes once they reload the theatre"""
+        super().set_category_prices(category_prices)
+        with self.store.transaction() as connection:
+            connection.execute("UPDATE shows SET category_prices = ? WHERE show_id = ?",
+                               (dump_prices(self.category_prices), self.show_id))
+    
+    def get_seat_versions(self, seat_ids):
+        with self.store.connection() as connection:
+            versions = dict(connection.execute(SELECT_SEAT_VERSIONS, self._parameters(seat_ids)).fetchall())
+        return [versions.get(seat_id, 0) for seat_id in seat_ids]
+    
+    def cleanup_expired_reservations(self, now=None):
+        """Release lapsed holds; bookings already treat them as free, this tidies the table and the projections"""
+        with self.reservation_lock:
+            with self.store.transaction() as connection:
+                expired = self._expire_lapsed_holds(connection, now)
+            if self.event_stream is not None:
+                self._publish(self.event_stream, expired)
+    
+    def is_seat_available(self, seat_id):
+        return not self.get_unavailable_seats([seat_id])
+    
+    def get_unavailable_seats(self, seat_ids):
+        with self.store.connection() as connection:
+            free = self._free_seats(connection, list(seat_ids))
+        return [seat_id for seat_id in seat_ids if seat_id not in free]
+    
+    def reserve_seats(self, seat_ids, user_id, hold_time_minutes=10):
+        """Reserve all seats or none; returns (success, conflicting seat ids)"""
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return False, []
+        expiry = (datetime.now() + timedelta(minutes=hold_time_minutes)).timestamp()
+        return self._update_seats(
+            RESERVE_SEAT, self._rows(seat_ids, user_id=user_id, expiry=expiry), seat_ids,
+            lambda connection: self._free_seats(connection, seat_ids), SeatEvent.RESERVE, user_id,
+        )
+    
+    def reserve_best_available(self, seat_category, count, user_id, hold_time_minutes=10):
+        """Hold the most central block of count adjacent seats in a category; returns (success, seat ids)"""
+        snapshot = self.get_seat_map()
+        seat_ids = SeatBlockAllocator(self.screen.get_layout(), snapshot).find_block(seat_category, count)
+        if not seat_ids:
+            return False, []
+        success, _ = self.reserve_seats(seat_ids, user_id, hold_time_minutes)
+        return success, seat_ids if success else []
+    
+    def confirm_bookings(self, seat_ids, user_id):
+        """Confirm all of the user's holds or none; returns (success, conflicting seat ids)"""
+        seat_ids = sorted(set(seat_ids))
+        
+        def held_by_user(connection):
+            return {row[0] for row in connection.execute(SELECT_USER_HOLDS, self._parameters(seat_ids, user_id=user_id))}
+        
+        return self._update_seats(
+            CONFIRM_SEAT, self._rows(seat_ids, user_id=user_id), seat_ids, held_by_user, SeatEvent.CONFIRM, user_id,
+        )
+    
+    def try_book_seats(self, seat_ids, expected_versions=None, fencing_token=None):
+        """Move all seats straight to BOOKED if every one is free (and still at expected_versions)"""
+        seat_ids = sorted(set(seat_ids))
+        if not seat_ids:
+            return False, []
+        if expected_versions is None:
+            return self._update_seats(
+                BOOK_SEAT, self._rows(seat_ids), seat_ids, lambda connection: self._free_seats(connection, seat_ids),
+                SeatEvent.BOOK, fencing_token=fencing_token,
+            )
+        
+        def unchanged(connection):
+            free = self._free_seats(connection, seat_ids)
+            return {seat_id for seat_id, version in free.items() if version == expected_versions[seat_id]}
+        
+        rows = self._rows(seat_ids)
+        for row in rows:
+            row["version"] = expected_versions[row["seat_id"]]
+        return self._update_seats(BOOK_SEAT_AT_VERSION, rows, seat_ids, unchanged, SeatEvent.BOOK,
+                                  fencing_token=fencing_token)
+    
+    def try_book_seat_groups(self, seat_id_groups, fencing_token=None):
+        """try_book_seats for many groups in one transaction, each group behind its own savepoint"""
+        groups = [(seat_ids, self._rows(seat_ids)) for seat_ids in (sorted(set(seat_ids)) for seat_ids in seat_id_groups)]
+        results = []
+        booked = []
+        with self.reservation_lock:
+            event_stream = self.event_stream
+            with self.store.transaction() as connection:
+                self._check_fencing_token(connection, fencing_token)
+                expired = self._expire_lapsed_holds(connection) if event_stream is not None else []
+                for seat_ids, rows in groups:
+                    if not seat_ids:
+                        results.append((False, []))
+                        continue
+                    connection.execute("SAVEPOINT seat_group")
+                    if connection.executemany(BOOK_SEAT, rows).rowcount == len(rows):
+                        results.append((True, []))
+                        booked.extend(seat_ids)
+                    else:
+                        connection.execute("ROLLBACK TO seat_group")
+                        free = self._free_seats(connection, seat_ids)
+                        results.append((False, [seat_id for seat_id in seat_ids if seat_id not in free]))
+                    connection.execute("RELEASE seat_group")
+            if event_stream is not None:
+                self._publish(event_stream, expired, SeatEvent.BOOK, sorted(booked))
+        return results
+    
+    def cancel_reservations(self, seat_ids, user_id):
+        """Cancel the user's holds on seat_ids; returns how many were released"""
+        with self.reservation_lock:
+            event_stream = self.event_stream
+            with self.store.transaction() as connection:
+                expired = self._expire_lapsed_holds(connection) if event_stream is not None else []
+                cancelled = sorted(row[0] for row in connection.execute(
+                    CANCEL_SEATS, self._parameters(sorted(set(seat_ids)), user_id=user_id)
+                ))
+            if event_stream is not None:
+                self._publish(event_stream, expired, SeatEvent.CANCEL, cancelled, user_id)
+            return len(cancelled)
+    
+    def get_seat_map(self):
+        """Seat map snapshot read from the table; its version is the sum of the seat versions"""
+        now = datetime.now().timestamp()
+        layout = self.screen.get_layout()
+        states = bytearray(layout.size)
+        category_counts = list(layout.available_counts)
+        version = 0
+        next_expiry = None
+        with self.store.connection() as connection:
+            for seat_id, state, hold_expiry, seat_version in connection.execute(SELECT_SEAT_MAP, {"show_id": self.show_id}):
+                version += seat_version
+                if state == SeatState.HELD.value:
+                    if hold_expiry < now:
+                        continue
+                    next_expiry = hold_expiry if next_expiry is None else min(next_expiry, hold_expiry)
+                offset = layout.seat_count_offsets[seat_id]
+                category_counts[offset] -= 1
+                category_counts[offset + state] += 1
+                states[seat_id] = state
+        return SeatMapSnapshot(
+            version, bytes(states), layout.category_seat_ids,
+            datetime.fromtimestamp(next_expiry) if next_expiry is not None else None,
+            tuple(category_counts),
+        )
+    
+    def get_seat_map_changes(self, since_version):
+        """Always the full map: per-version deltas are not kept in the table"""
+        snapshot = self.get_seat_map()
+        if since_version >= snapshot.get_version():
+            return snapshot.get_version(), {}, None
+        return snapshot.get_version(), {}, snapshot
+
+
+# sqlite_theatre_controller.py
+class SQLiteTheatreController:
+    """TheatreController interface over the theatres, screens, seats, shows and seat_states tables
+    
+    Theatres are materialized (screens, seats and SQLiteShows) the first time
+    a lookup touches them and cached, so repeated lookups hand out the same
+    objects and their in-process locks.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.theatre_id_vs_theatre = {}
+        self.cache_lock = threading.Lock()
+        self.show_removed_listeners = []  # called with each cached show dropped by remove_show or expire_shows
+        self.event_stream = None  # BookingEventStream every materialized show is attached to
+    
+    def add_show_removed_listener(self, listener):
+        """listener(show) runs for every cached show removed or expired from now on"""
+        self.show_removed_listeners.append(listener)
+    
+    def set_event_stream(self, event_stream):
+        """Materialize every theatre and attach its shows, now and as this controller adds them, to event_stream
+        
+        Theatres other processes add to the file later are not attached.
+        """
+        self.get_all_shows()
+        with self.cache_lock:
+            self.event_stream = event_stream
+            theatres = list(self.theatre_id_vs_theatre.values())
+        for theatre in theatres:
+            self._attach_shows(theatre, theatre.get_shows())
+    
+    def _attach_shows(self, theatre, shows):
+        if self.event_stream is not None:
+            for show in shows:
+                self.event_stream.attach(show, theatre, theatre.get_city())
+    
+    def _show_removed(self, show):
+        if self.event_stream is not None:
+            self.event_stream.detach(show)
+        for listener in self.show_removed_listeners:
+            listener(show)
+    
+    def add_theatre(self, theatre, city):
+        """Persist the theatre with its screens, seats and shows; its shows become SQLiteShows"""
+        self.add_theatres([(theatre, city)])
+    
+    def add_theatres(self, theatre_cities):
+        """add_theatre for each (theatre, city) in one transaction"""
+        theatre_cities = list(theatre_cities)
+        theatre_shows = []
+        with self.store.transaction() as connection:
+            connection.executemany(
+                "INSERT INTO theatres (theatre_id, city, address) VALUES (?, ?, ?)",
+                [(theatre.get_theatre_id(), city.value, theatre.get_address()) for theatre, city in theatre_cities],
+            )
+            for theatre, city in theatre_cities:
+                for screen in theatre.get_screens():
+                    self._insert_screen(connection, theatre, screen)
+                theatre_shows.append([
+                    self._insert_show(connection, theatre, city, show) for show in theatre.get_shows()
+                ])
+        for (theatre, city), shows in zip(theatre_cities, theatre_shows):
+            theatre.set_city(city)
+            theatre.set_shows(shows)
+        with self.cache_lock:
+            for theatre, _ in theatre_cities:
+                self.theatre_id_vs_theatre[theatre.get_theatre_id()] = theatre
+        for (theatre, _), shows in zip(theatre_cities, theatre_shows):
+            self._attach_shows(theatre, shows)
+    
+    def _insert_screen(self, connection, theatre, screen):
+        connection.execute(
+            "INSERT OR IGNORE INTO screens (theatre_id, screen_id) VALUES (?, ?)",
+            (theatre.get_theatre_id(), screen.get_screen_id()),
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO seats (theatre_id, screen_id, seat_id, row_label, seat_number, category)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (theatre.get_theatre_id(), screen.get_screen_id(), seat.get_seat_id(), seat.get_row(),
+                 seat.get_seat_number(), seat.get_seat_category().value)
+                for seat in screen.get_seats()
+            ],
+        )
+    
+    def _insert_show(self, connection, theatre, city, show):
+        connection.execute(
+            "INSERT INTO shows (show_id, theatre_id, screen_id, movie_id, city, start_time, category_prices)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (show.get_show_id(), theatre.get_theatre_id(), show.get_screen().get_screen_id(),
+             show.get_movie().get_movie_id(), city.value, to_timestamp(show.get_show_start_time()),
+             dump_prices(show.get_category_prices())),
+        )
+        # A deferred show has not been touched, so every seat is still available
+        get_state = show.get_seat_states().get_state if show.is_materialized() else lambda _: SeatState.AVAILABLE
+        connection.executemany(INSERT_SEAT_STATE, [
+            {"show_id": show.get_show_id(), "seat_id": seat.get_seat_id(), "state": get_state(seat.get_seat_id()).value}
+            for seat in show.get_screen().get_seats()
+        ])
+        return show if isinstance(show, SQLiteShow) else SQLiteShow.from_show(self.store, show)
+    
+    def add_show(self, theatre, show):
+        """Persist a show for an already registered theatre; returns the SQLiteShow now serving it"""
+        return self.add_shows([(theatre, show)])[0]
+    
+    def add_shows(self, theatre_shows):
+        """add_show for each (theatre, show) in one transaction; returns the SQLiteShows now serving them
+        
+        A show's screen and seats are stored with it the first time one of
+        its shows is added, so screens attached to a theatre after
+        add_theatre (as CatalogLoader does) need no call of their own.
+        """
+        theatre_shows = list(theatre_shows)
+        with self.store.transaction() as connection:
+            screen_keys = set()
+            sqlite_shows = []
+            for theatre, show in theatre_shows:
+                screen_key = (theatre.get_theatre_id(), show.get_screen().get_screen_id())
+                if screen_key not in screen_keys:
+                    screen_keys.add(screen_key)
+                    self._insert_screen(connection, theatre, show.get_screen())
+                sqlite_shows.append(self._insert_show(connection, theatre, theatre.get_city(), show))
+        for (theatre, _), sqlite_show in zip(theatre_shows, sqlite_shows):
+            theatre.get_shows().append(sqlite_show)
+            self._attach_shows(theatre, [sqlite_show])
+        return sqlite_shows
+    
+    def remove_show(self, theatre, show):
+        with self.store.transaction() as connection:
+            connection.execute("DELETE FROM seat_states WHERE show_id = ?", (show.get_show_id(),))
+            connection.execute("DELETE FROM shows WHERE show_id = ?", (show.get_show_id(),))
+        theatre.get_shows().remove(show)
+        self._show_removed(show)
+    
+    def expire_shows(self, now=None):
+        """Delete every show that has already started, with its seat states; returns how many"""
+        with self.store.transaction() as connection:
+            rows = connection.execute(
+                "SELECT theatre_id, show_id FROM shows WHERE start_time < ?", (to_timestamp(now or datetime.now()),)
+            ).fetchall()
+            show_ids = [(show_id,) for _, show_id in rows]
+            connection.executemany("DELETE FROM seat_states WHERE show_id = ?", show_ids)
+            connection.executemany("DELETE FROM shows WHERE show_id = ?", show_ids)
+        expired = {show_id for _, show_id in rows}
+        removed = []
+        with self.cache_lock:
+            for theatre_id in {theatre_id for theatre_id, _ in rows}:
+                theatre = self.theatre_id_vs_theatre.get(theatre_id)
+                if theatre is not None:
+                    removed.extend(show for show in theatre.get_shows() if show.get_show_id() in expired)
+                    theatre.set_shows([show for show in theatre.get_shows() if show.get_show_id() not in expired])
+        for show in removed:
+            self._show_removed(show)
+        return len(rows)
+    
+    def _get_theatre(self, connection, theatre_id):
+        theatre = self.theatre_id_vs_theatre.get(theatre_id)
+        if theatre is None:
+            with self.cache_lock:
+                theatre = self.theatre_id_vs_theatre.get(theatre_id)
+                if theatre is None:
+                    theatre = self._load_theatre(connection, theatre_id)
+                    self.theatre_id_vs_theatre[theatre_id] = theatre
+        return theatre
+    
+    def _load_theatre(self, connection, theatre_id):
+        city, address = connection.execute(
+            "SELECT city, address FROM theatres WHERE theatre_id = ?", (theatre_id,)
+        ).fetchone()
+        theatre = Theatre()
+        theatre.set_theatre_id(theatre_id)
+        theatre.set_city(City(city))
+        theatre.set_address(address)
+        
+        screen_id_vs_seats = {}
+        for screen_id, seat_id, row_label, seat_number, category in connection.execute(
+            "SELECT screen_id, seat_id, row_label, seat_number, category FROM seats WHERE theatre_id = ?"
+            " ORDER BY screen_id, seat_id",
+            (theatre_id,),
+        ):
+            seat = Seat()
+            seat.set_seat_id(seat_id)
+            seat.set_row(row_label)
+            seat.set_seat_number(seat_number)
+            seat.set_seat_category(SeatCategory(category))
+            screen_id_vs_seats.setdefault(screen_id, []).append(seat)
+        screen_id_vs_screen = {}
+        for (screen_id,) in connection.execute("SELECT screen_id FROM screens WHERE theatre_id = ?", (theatre_id,)):
+            screen = Screen()
+            screen.set_screen_id(screen_id)
+            screen.set_seats(screen_id_vs_seats.get(screen_id, []))
+            screen_id_vs_screen[screen_id] = screen
+        theatre.set_screens(list(screen_id_vs_screen.values()))
+        
+        shows = []
+        for show_id, screen_id, movie_id, start_time, category_prices in connection.execute(
+            "SELECT show_id, screen_id, movie_id, start_time, category_prices FROM shows WHERE theatre_id = ?"
+            " ORDER BY start_time",
+            (theatre_id,),
+        ).fetchall():
+            show = SQLiteShow(self.store)
+            show.set_show_id(show_id)
+            show.set_screen(screen_id_vs_screen[screen_id])
+            show.set_movie(self.store.get_movie(connection, movie_id))
+            show.set_show_start_time(from_timestamp(start_time))
+            show.category_prices = load_prices(category_prices)
+            shows.append(show)
+        theatre.set_shows(shows)
+        return theatre
+    
+    def get_all_show(self, movie, city):
+        """theatre -> shows of this movie in the city, earliest first (an index range scan)"""
+        theatre_vs_shows = {}
+        with self.store.connection() as connection:
+            rows = connection.execute(
+                "SELECT theatre_id, show_id FROM shows WHERE city = ? AND movie_id = ? ORDER BY start_time",
+                (city.value, movie.get_movie_id()),
+            ).fetchall()
+            for theatre_id, show_id in rows:
+                theatre = self._get_theatre(connection, theatre_id)
+                show = next(show for show in theatre.get_shows() if show.get_show_id() == show_id)
+                theatre_vs_shows.setdefault(theatre, []).append(show)
+        return theatre_vs_shows
+    
+    def find_shows(self, movie, city, start=None, end=None, limit=None, after=None):
+        """(shows of movie in city starting in [start, end), earliest first, next-page cursor or None)
+        
+        A range scan of shows_by_city_movie; the cursor is (start time, show id).
+        """
+        return self._find_shows("city = :city AND movie_id = :movie_id",
+                                {"city": city.value, "movie_id": movie.get_movie_id()}, start, end, limit, after)
+    
+    def find_theatre_shows(self, theatre, start=None, end=None, limit=None, after=None):
+        """find_shows over every movie playing in one theatre, a range scan of shows_by_theatre"""
+        return self._find_shows("theatre_id = :theatre_id", {"theatre_id": theatre.get_theatre_id()},
+                                start, end, limit, after)
+    
+    def _find_shows(self, condition, parameters, start, end, limit, after):
+        conditions = [condition]
+        if start is not None:
+            conditions.append("start_time >= :start")
+            parameters["start"] = to_timestamp(start)
+        if end is not None:
+            conditions.append("start_time < :end")
+            parameters["end"] = to_timestamp(end)
+        if after is not None:
+            conditions.append("(start_time, show_id) > (:after_time, :after_show_id)")
+            parameters["after_time"], parameters["after_show_id"] = to_timestamp(after[0]), after[1]
+        statement = f"SELECT theatre_id, show_id FROM shows WHERE {' AND '.join(conditions)} ORDER BY start_time, show_id"
+        if limit is not None:
+            statement += " LIMIT :limit"
+            parameters["limit"] = limit + 1  # one extra row tells whether there is a next page
+        
+        with self.store.connection() as connection:
+            rows = connection.execute(statement, parameters).fetchall()
+            shows = []
+            for theatre_id, show_id in rows[:limit]:
+                theatre = self._get_theatre(connection, theatre_id)
+                shows.append(next(show for show in theatre.get_shows() if show.get_show_id() == show_id))
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            next_cursor = (shows[-1].get_show_start_time(), shows[-1].get_show_id())
+        return shows, next_cursor
+    
+    def get_all_shows(self):
+        with self.store.connection() as connection:
+            theatre_ids = [row[0] for row in connection.execute("SELECT theatre_id FROM theatres")]
+            return [show for theatre_id in theatre_ids for show in self._get_theatre(connection, theatre_id).get_shows()]
+
+
+def create_sqlite_book_my_show(path, pool_size=8, lock_provider=None):
+    """BookMyShow whose controllers read and write the SQLite database at path"""
+    store = SQLiteStore(path, pool_size)
+    return BookMyShow(SQLiteMovieController(store), SQLiteTheatreController(store), lock_provider)
@@ -0,0 +1,128 @@
+# test_async_booking.py
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+
+from async_booking import AsyncShow, AsyncTwoPhaseBookingService
+from benchmarks import build_show
+from booking_journal import BookingJournal
+from booking_metrics import METRICS
+from concurrency_handle_show import SeatState
+
+
+class AsyncShowTest(unittest.TestCase):
+    def test_waiting_for_a_held_lock_does_not_spin_the_loop(self):
+        show = build_show(10)
+        held = threading.Event()
+        
+        def hold_lock():
+            with show.reservation_lock:
+                held.set()
+                time.sleep(0.3)
+        
+        async def run():
+            ticks = 0
+            
+            async def count_ticks():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+            
+            ticker = asyncio.ensure_future(count_ticks())
+            cpu_before = time.process_time()
+            success, _ = await AsyncShow(show).reserve_seats([1], "User1")
+            cpu = time.process_time() - cpu_before
+            ticker.cancel()
+            return success, cpu, ticks
+        
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        held.wait()
+        success, cpu, ticks = asyncio.run(run())
+        thread.join()
+        self.assertTrue(success)
+        self.assertGreater(ticks, 10)  # other coroutines kept running
+        self.assertLess(cpu, 0.25)  # a busy loop would burn the whole 0.3s hold
+    
+    def test_cancelled_checkout_releases_its_hold(self):
+        show = build_show(10)
+        service = AsyncTwoPhaseBookingService(payment_time_range=(1, 1))
+        
+        async def run():
+            booking = asyncio.ensure_future(service.book_seats_two_phase(show, [1, 2], "User1"))
+            await asyncio.sleep(0.05)
+            booking.cancel()
+            await asyncio.sleep(0)
+            booking.cancel()  # a second cancellation must not leak the hold
+            with self.assertRaises(asyncio.CancelledError):
+                await booking
+            await asyncio.gather(*service.releases)
+        
+        asyncio.run(run())
+        self.assertEqual(show.get_unavailable_seats([1, 2]), [])
+    
+    def journaled_show(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        journal = BookingJournal(directory.name, group_commit_delay=0.5)
+        self.addCleanup(journal.close)
+        show = build_show(10)
+        journal.recover([show])
+        return show
+    
+    def test_reserve_cancelled_while_waiting_for_the_journal_releases_its_hold(self):
+        show = self.journaled_show()
+        service = AsyncTwoPhaseBookingService(payment_time_range=(0, 0))
+        
+        async def run():
+            booking = asyncio.ensure_future(service.book_seats_two_phase(show, [5, 6], "User1"))
+            await asyncio.sleep(0.05)
+            self.assertEqual(set(show.seat_reservations), {5, 6})  # applied, waiting for the fsync
+            booking.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await booking
+            await asyncio.gather(*service.releases)
+        
+        asyncio.run(run())
+        self.assertEqual(show.seat_reservations, {})
+        self.assertEqual(show.get_unavailable_seats([5, 6]), [])
+    
+    def test_confirm_cancelled_while_waiting_for_the_journal_reports_the_booking(self):
+        show = self.journaled_show()
+        self.assertTrue(show.reserve_seats([5, 6], "User1")[0])
+        
+        async def run():
+            confirm = asyncio.ensure_future(AsyncShow(show).confirm_bookings([5, 6], "User1"))
+            await asyncio.sleep(0.05)
+            confirm.cancel()
+            return await confirm
+        
+        self.assertEqual(asyncio.run(run()), (True, []))
+        self.assertEqual(show.get_seat_states().get_state(5), SeatState.BOOKED)
+        self.assertEqual(show.journal.durable_lsn, show.journal_lsn)
+    
+    def test_async_operations_are_timed_like_the_show_methods(self):
+        show = build_show(10)
+        METRICS.enable()
+        METRICS.reset()
+        self.addCleanup(METRICS.disable)
+        
+        async def run():
+            async_show = AsyncShow(show)
+            await async_show.reserve_seats([1, 2], "User1")
+            await async_show.confirm_bookings([1], "User1")
+            await async_show.cancel_reservations([2], "User1")
+        
+        asyncio.run(run())
+        counts = {
+            histogram["labels"]["operation"]: histogram["count"] for histogram in METRICS.snapshot()["histograms"]
+            if histogram["name"] == "operation_seconds"
+        }
+        self.assertEqual((counts.get("reserve"), counts.get("confirm"), counts.get("cancel")), (1, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# test_booking_journal.py
+import tempfile
+import unittest
+
+from benchmarks import build_show
+from booking_journal import BookingJournal
+
+
+class BookingJournalRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.journal, self.shows = self.start()
+    
+    def start(self):
+        """A fresh process: new shows, recovered from whatever the journal directory holds"""
+        journal = BookingJournal(self.directory)
+        self.addCleanup(journal.close)
+        shows = [build_show(20, show_id=1), build_show(20, show_id=2)]
+        self.replayed = journal.recover(shows)
+        return journal, shows
+    
+    def restart(self):
+        self.journal.close()
+        self.journal, self.shows = self.start()
+    
+    def seats(self):
+        """Per show: (booked seat ids, {held seat id: (user id, expiry)})"""
+        return [
+            (sorted(show.get_booked_seat_ids()), {
+                seat_id: (reservation.user_id, reservation.expiry_time)
+                for seat_id, reservation in show.seat_reservations.items()
+            })
+            for show in self.shows
+        ]
+    
+    def segment_numbers(self):
+        return self.journal._segment_numbers()
+    
+    def book_some_seats(self, first_seat):
+        show, other_show = self.shows
+        self.assertTrue(show.reserve_seats([first_seat, first_seat + 1, first_seat + 2], "User1")[0])
+        self.assertTrue(show.confirm_bookings([first_seat], "User1")[0])
+        self.assertEqual(show.cancel_reservations([first_seat + 1], "User1"), 1)
+        self.assertTrue(other_show.try_book_seats([first_seat, first_seat + 3])[0])
+        self.assertTrue(other_show.reserve_seats([first_seat + 4], "User2")[0])
+    
+    def test_restart_replays_the_journal(self):
+        self.book_some_seats(0)
+        before = self.seats()
+        self.restart()
+        self.assertEqual(self.replayed, 5)
+        self.assertEqual(self.seats(), before)
+        self.assertEqual(before[0][0], [0])
+        self.assertEqual({seat_id: user_id for seat_id, (user_id, _) in before[0][1].items()}, {2: "User1"})
+        self.assertEqual(sorted(before[1][1]), [4])
+    
+    def test_restart_restores_the_checkpoint_and_replays_newer_segments(self):
+        self.book_some_seats(0)
+        self.journal.checkpoint(self.shows)
+        self.book_some_seats(10)
+        before = self.seats()
+        self.restart()
+        self.assertEqual(self.replayed, 5)  # only the records written after the checkpoint
+        self.assertEqual(self.seats(), before)
+        self.assertEqual(before[1][0], [0, 3, 10, 13])
+    
+    def test_checkpoint_deletes_the_segments_it_covers(self):
+        self.book_some_seats(0)
+        self.restart()  # moves on to a second segment
+        self.assertEqual(self.segment_numbers(), [1, 2])
+        checkpoint_lsn = self.journal.checkpoint(self.shows)
+        self.assertEqual(self.segment_numbers(), [3])
+        self.assertEqual(checkpoint_lsn, self.journal.get_stats()["last_lsn"])
+        
+        before = self.seats()
+        self.restart()
+        self.assertEqual(self.replayed, 0)
+        self.assertEqual(self.seats(), before)
+    
+    def test_torn_last_line_is_ignored_and_never_appended_to(self):
+        self.book_some_seats(0)
+        before = self.seats()
+        self.journal.close()
+        [segment_number] = self.segment_numbers()
+        with open(self.journal._segment_path(segment_number), "ab") as segment:
+            segment.write(b'{"show":1,"event":"book","seats":[19')
+        
+        self.journal, self.shows = self.start()
+        self.assertEqual(self.replayed, 5)
+        self.assertEqual(self.seats(), before)
+        self.assertTrue(self.shows[0].try_book_seats([19])[0])
+        self.assertEqual(self.segment_numbers(), [segment_number, segment_number + 1])
+        
+        before = self.seats()
+        self.restart()
+        self.assertEqual(self.replayed, 6)
+        self.assertEqual(self.seats(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# test_booking_metrics.py
+import threading
+import unittest
+
+from benchmarks import build_show
+from booking_metrics import BookingMetrics, InstrumentedLock
+
+
+class InstrumentedLockTest(unittest.TestCase):
+    def lock_series(self, metrics):
+        return {
+            (histogram["name"], histogram["labels"]["lock"]): histogram["count"]
+            for histogram in metrics.snapshot()["histograms"] if histogram["name"].startswith("lock_")
+        }
+    
+    def test_enabling_at_runtime_times_locks_created_while_off(self):
+        metrics = BookingMetrics()
+        lock = InstrumentedLock(build_show(10), "reservation", metrics)
+        with lock:
+            pass
+        self.assertEqual(self.lock_series(metrics), {})
+        
+        metrics.enable()
+        with lock:
+            with lock:  # re-entry is neither a second wait nor a second hold
+                pass
+        self.assertEqual(self.lock_series(metrics), {
+            ("lock_wait_seconds", "reservation"): 1, ("lock_hold_seconds", "reservation"): 1,
+        })
+    
+    def test_switching_mid_hold_keeps_the_lock_consistent(self):
+        metrics = BookingMetrics()
+        lock = InstrumentedLock(build_show(10), "show", metrics)
+        lock.acquire()
+        metrics.enable()
+        lock.acquire()
+        lock.release()
+        metrics.disable()
+        lock.release()
+        
+        acquired_elsewhere = []
+        thread = threading.Thread(target=lambda: acquired_elsewhere.append(lock.acquire(timeout=1) and lock.release()))
+        thread.start()
+        thread.join()
+        self.assertEqual(acquired_elsewhere, [None])
+    
+    def test_show_locks_are_timed_once_metrics_are_enabled(self):
+        metrics = BookingMetrics()
+        show = build_show(10)
+        show.reservation_lock.metrics = metrics
+        metrics.enable()
+        self.assertTrue(show.reserve_seats([1], "User1")[0])
+        self.assertGreater(self.lock_series(metrics)[("lock_hold_seconds", "reservation")], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
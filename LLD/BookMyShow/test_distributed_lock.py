@@ -0,0 +1,115 @@
+# test_distributed_lock.py
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from benchmarks import build_show
+from concurrency_handle_show import City, Movie, Theatre
+from distributed_lock import (
+    InProcessLockProvider, LockLost, LockProvider, StaleFencingToken, UnixSocketLockProvider, UnixSocketLockServer,
+)
+from sqlite_store import create_sqlite_book_my_show
+
+
+def build_sqlite_show(directory):
+    book_my_show = create_sqlite_book_my_show(os.path.join(directory, "bookmyshow.db"))
+    movie = Movie()
+    movie.set_movie_id(1)
+    movie.set_movie_name("AVENGERS")
+    book_my_show.movie_controller.add_movie(movie, City.BANGALORE)
+    show = build_show(10)
+    show.set_movie(movie)
+    show.set_show_start_time(datetime.now() + timedelta(hours=1))
+    theatre = Theatre()
+    theatre.set_theatre_id(1)
+    theatre.set_screens([show.get_screen()])
+    theatre.set_shows([show])
+    book_my_show.theatre_controller.add_theatre(theatre, City.BANGALORE)
+    return theatre.get_shows()[0]
+
+
+class FencingTokenTest(unittest.TestCase):
+    def assert_lapsed_holder_is_fenced_off(self, show):
+        provider = InProcessLockProvider(lease_seconds=0.05)
+        stalled = provider.acquire("show:1", "node-a")
+        time.sleep(0.1)
+        successor = provider.acquire("show:1", "node-b", timeout=0)
+        self.assertGreater(successor.token, stalled.token)
+        self.assertTrue(show.try_book_seats([1], fencing_token=successor.token)[0])
+        
+        with self.assertRaises(StaleFencingToken):
+            show.try_book_seats([2], fencing_token=stalled.token)
+        self.assertEqual(show.get_unavailable_seats([1, 2]), [1])
+        with self.assertRaises(LockLost):
+            provider.renew(stalled)
+        self.assertFalse(provider.release(stalled))
+        self.assertTrue(provider.release(successor))
+    
+    def test_lapsed_lease_cannot_commit_to_an_in_memory_show(self):
+        self.assert_lapsed_holder_is_fenced_off(build_show(10))
+    
+    def test_lapsed_lease_cannot_commit_to_a_sqlite_show(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.assert_lapsed_holder_is_fenced_off(build_sqlite_show(directory.name))
+    
+    def test_tokens_only_increase(self):
+        provider = InProcessLockProvider(lease_seconds=0.01)
+        tokens = []
+        for name in ("show:1", "show:2", "show:2", "show:1"):  # released, then taken over once lapsed
+            lease = provider.acquire(name, "node-a")
+            tokens.append(lease.token)
+            if name == "show:2":
+                provider.release(lease)
+        self.assertEqual(tokens, sorted(set(tokens)))
+        self.assertEqual(provider.get_stats()["takeovers"], 1)
+        
+        restarted = InProcessLockProvider(first_token=tokens[-1] + 1)
+        self.assertGreater(restarted.acquire("show:1", "node-b").token, tokens[-1])
+    
+    def test_lock_provider_is_abstract(self):
+        with self.assertRaises(TypeError):
+            LockProvider()
+
+
+class UnixSocketLockProviderTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "locks.sock")
+        server = UnixSocketLockServer(path, InProcessLockProvider(lease_seconds=0.2)).start()
+        self.addCleanup(server.stop)
+        self.provider = UnixSocketLockProvider(path, lease_seconds=0.2)
+        self.addCleanup(self.provider.close)
+    
+    def test_acquire_renew_and_release(self):
+        lease = self.provider.acquire("show:1", "node-a")
+        self.assertEqual((lease.name, lease.owner), ("show:1", "node-a"))
+        self.assertIsNone(self.provider.acquire("show:1", "node-b", timeout=0.05))
+        
+        time.sleep(0.1)
+        expires_at = lease.expires_at
+        self.assertIs(self.provider.renew(lease), lease)
+        self.assertGreater(lease.expires_at, expires_at)
+        time.sleep(0.15)  # past the original lease, within the renewed one
+        self.assertIsNone(self.provider.acquire("show:1", "node-b", timeout=0))
+        
+        self.assertTrue(self.provider.release(lease))
+        with self.provider.hold("show:1", "node-b", timeout=0) as successor:
+            self.assertGreater(successor.token, lease.token)
+        self.assertFalse(self.provider.release(lease))
+        with self.assertRaises(LockLost):
+            self.provider.renew(lease)
+    
+    def test_lapsed_lease_is_taken_over(self):
+        stalled = self.provider.acquire("show:1", "node-a")
+        successor = self.provider.acquire("show:1", "node-b", timeout=1)
+        self.assertGreater(successor.token, stalled.token)
+        with self.assertRaises(LockLost):
+            self.provider.renew(stalled)
+
+
+if __name__ == "__main__":
+    unittest.main()
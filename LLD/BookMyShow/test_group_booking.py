@@ -0,0 +1,29 @@
+# test_group_booking.py
+import unittest
+
+from benchmarks import build_show
+from concurrency_handle_show import BookMyShow, City, OptimisticLockingBookingService
+
+
+class EmptyGroupBookingTest(unittest.TestCase):
+    def test_every_entry_point_rejects_an_empty_seat_list(self):
+        book_my_show = BookMyShow()
+        book_my_show.initialize()
+        for create in (book_my_show.create_group_booking_optimistic, book_my_show.create_group_booking_pessimistic,
+                       book_my_show.create_group_booking_fine_grained, book_my_show.create_group_booking_two_phase,
+                       book_my_show.create_group_booking_single_writer):
+            with self.subTest(create.__name__):
+                self.assertEqual(create(City.BANGALORE, "BAAHUBALI", "User1", []), (None, []))
+        book_my_show.single_writer_service.close()
+    
+    def test_show_writes_fail_without_seats(self):
+        show = build_show(10)
+        self.assertEqual(show.reserve_seats([], "User1"), (False, []))
+        self.assertEqual(show.try_book_seats([]), (False, []))
+        self.assertEqual(show.try_book_seat_groups([[], [1]]), [(False, []), (True, [])])
+        self.assertEqual(OptimisticLockingBookingService().book_seats_optimistic(show, [], "User1"),
+                         (False, "No seats requested", []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# test_idempotency.py
+import time
+import unittest
+
+from concurrency_handle_show import BookMyShow, City
+from idempotency import IdempotencyCache, IdempotencyKeyReused, Retryable
+
+
+class IdempotentBookingTest(unittest.TestCase):
+    def setUp(self):
+        self.book_my_show = BookMyShow()
+        self.book_my_show.initialize()
+        self.book_my_show.optimistic_service.processing_time_range = (0, 0)
+        self.addCleanup(self.book_my_show.single_writer_service.close)
+    
+    def book(self, seat_number, user_id="User1", key="key-1"):
+        return self.book_my_show.create_booking_optimistic(
+            City.BANGALORE, "BAAHUBALI", user_id, seat_number, idempotency_key=key
+        )
+    
+    def test_retry_returns_the_same_booking(self):
+        booking = self.book(30)
+        self.assertIsNotNone(booking)
+        self.assertIs(self.book(30), booking)
+        self.assertIsNone(self.book(30, user_id="User2"))  # keys are per user, so this one runs
+        self.assertEqual(self.book_my_show.idempotency_cache.get_stats()["hits"], 1)
+    
+    def test_key_reused_with_different_arguments_is_rejected(self):
+        self.book(30)
+        with self.assertRaises(IdempotencyKeyReused):
+            self.book(31)
+    
+    def test_transient_failure_is_not_cached(self):
+        self.book_my_show.optimistic_service.max_retries = 0  # gives up before trying
+        self.assertIsNone(self.book(30))
+        self.book_my_show.optimistic_service.max_retries = 3
+        self.assertIsNotNone(self.book(30))
+    
+    def test_seat_conflict_is_cached(self):
+        self.assertIsNotNone(self.book(30, user_id="User2"))
+        self.assertIsNone(self.book(30))
+        self.book_my_show.create_group_booking_optimistic(City.BANGALORE, "BAAHUBALI", "User2", [31])
+        self.assertIsNone(self.book(30))
+        self.assertEqual(self.book_my_show.idempotency_cache.get_stats()["hits"], 1)
+    
+    def test_group_booking_conflict_is_cached_and_transient_failure_is_not(self):
+        create = self.book_my_show.create_group_booking_optimistic
+        self.book_my_show.optimistic_service.max_retries = 0
+        self.assertEqual(create(City.BANGALORE, "BAAHUBALI", "User1", [40, 41], idempotency_key="g"), (None, []))
+        self.book_my_show.optimistic_service.max_retries = 3
+        booking, conflicts = create(City.BANGALORE, "BAAHUBALI", "User1", [40, 41], idempotency_key="g")
+        self.assertEqual(([seat.get_seat_id() for seat in booking.get_booked_seats()], conflicts), ([40, 41], []))
+        self.assertEqual(create(City.BANGALORE, "BAAHUBALI", "User2", [41, 42], idempotency_key="g"), (None, [41]))
+        self.assertEqual(create(City.BANGALORE, "BAAHUBALI", "User2", [41, 42], idempotency_key="g"), (None, [41]))
+
+
+class IdempotencyCacheTest(unittest.TestCase):
+    def test_retryable_result_is_returned_but_not_cached(self):
+        cache = IdempotencyCache(shard_count=1)
+        self.assertEqual(cache.get_or_run("key", "request", lambda: Retryable("busy")), "busy")
+        self.assertEqual(cache.lookup("key", "request"), (False, None))
+        self.assertEqual(cache.get_or_run("key", "request", lambda: "booked"), "booked")
+        self.assertEqual(cache.get_or_run("key", "request", lambda: "booked again"), "booked")
+    
+    def test_least_recently_used_key_is_evicted_beyond_capacity(self):
+        cache = IdempotencyCache(capacity=2, shard_count=1)
+        for key in ("a", "b"):
+            cache.get_or_run(key, key, lambda: key)
+        cache.lookup("a", "a")  # "b" is now the least recently used
+        cache.get_or_run("c", "c", lambda: "c")
+        self.assertEqual([cache.lookup(key, key)[0] for key in ("a", "b", "c")], [True, False, True])
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+    
+    def test_expired_key_runs_again(self):
+        cache = IdempotencyCache(ttl_seconds=0.05, shard_count=1)
+        self.assertEqual(cache.get_or_run("key", "request", lambda: 1), 1)
+        self.assertEqual(cache.get_or_run("key", "request", lambda: 2), 1)
+        time.sleep(0.1)
+        self.assertEqual(cache.get_or_run("key", "request", lambda: 3), 3)
+        self.assertEqual(cache.get_stats()["expirations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
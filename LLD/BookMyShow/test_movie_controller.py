@@ -0,0 +1,54 @@
+# test_movie_controller.py
+import unittest
+
+import book_my_show
+from concurrency_handle_show import City, Movie, MovieController
+
+
+def make_movie(movie_id, name):
+    movie = Movie()
+    movie.set_movie_id(movie_id)
+    movie.set_movie_name(name)
+    movie.set_movie_duration(120)
+    return movie
+
+
+class MovieControllerTest(unittest.TestCase):
+    def test_titles_that_normalize_alike_are_all_kept(self):
+        controller = MovieController()
+        original, remake = make_movie(1, "Don"), make_movie(2, "DON ")
+        controller.add_movie(original, City.BANGALORE)
+        controller.add_movie(remake, City.DELHI)
+        
+        self.assertIs(controller.get_movie_by_name("don"), original)
+        self.assertEqual(controller.get_movies_by_name("Don"), [original, remake])
+        self.assertIs(controller.get_movie_in_city("don", City.DELHI), remake)
+        self.assertEqual(controller.search_movies_by_prefix("do"), [original, remake])
+        self.assertEqual(controller.search_movies_by_prefix("do", City.DELHI), [remake])
+    
+    def test_city_prefix_search_skips_other_cities(self):
+        controller = MovieController()
+        for movie_id in range(1_000):
+            controller.add_movie(make_movie(movie_id, f"Star {movie_id:04d}"), City.DELHI)
+        controller.add_movie(make_movie(5_000, "Star Wars"), City.BANGALORE)
+        self.assertEqual(controller.city_vs_sorted_names[City.BANGALORE], ["star wars"])
+        self.assertEqual([movie.get_movie_id() for movie in controller.search_movies_by_prefix("star", City.BANGALORE)],
+                         [5_000])
+        self.assertEqual(len(controller.search_movies_by_prefix("star", City.DELHI, limit=10)), 10)
+    
+    def test_simple_controller_keeps_titles_that_normalize_alike(self):
+        controller = book_my_show.MovieController()
+        original, remake = make_movie(1, "Don"), make_movie(2, "DON ")
+        controller.add_movie(original, book_my_show.City.BANGALORE)
+        controller.add_movie(remake, book_my_show.City.DELHI)
+        controller.add_movie(remake, book_my_show.City.BANGALORE)
+        
+        self.assertEqual(controller.all_movies, [original, remake])
+        self.assertIs(controller.get_movie_by_name("don"), original)
+        self.assertEqual(controller.get_movies_by_name(" DON"), [original, remake])
+        self.assertIs(controller.get_movie_in_city("Don", book_my_show.City.DELHI), remake)
+        self.assertIs(controller.get_movie_in_city("Don", book_my_show.City.BANGALORE), original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+# test_sharded_book_my_show.py
+import unittest
+
+from concurrency_handle_show import City
+from sharded_book_my_show import ShardedBookMyShow, build_demo_book_my_show
+
+
+class ShardedBookMyShowTest(unittest.TestCase):
+    def test_demo_shard_only_holds_its_cities(self):
+        book_my_show = build_demo_book_my_show([City.DELHI])
+        self.assertEqual({theatre.get_city() for theatre in book_my_show.theatre_controller.all_theatre}, {City.DELHI})
+        self.assertEqual(book_my_show.movie_controller.get_movies_by_city(City.BANGALORE), [])
+    
+    def test_submit_fails_fast_once_the_shard_exited(self):
+        with ShardedBookMyShow(shard_count=1) as sharded:
+            shard = sharded.get_shard(City.DELHI)
+            shard.process.kill()
+            shard.process.join()
+            shard.receiver.join(5)
+            with self.assertRaises(RuntimeError):
+                shard.submit([("search_movies", (City.DELHI, "A"))]).result(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
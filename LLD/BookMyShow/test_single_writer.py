@@ -0,0 +1,64 @@
+# test_single_writer.py
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from benchmarks import build_show
+from concurrency_handle_show import Movie, ShowWriter, SingleWriterBookingService, Theatre, TheatreController, WriterStopped
+
+
+class ShowWriterTest(unittest.TestCase):
+    def test_submit_racing_stop_never_leaves_a_future_unresolved(self):
+        for _ in range(20):
+            writer = ShowWriter(build_show(1_000))
+            futures = []
+            
+            def submit_many(offset):
+                for seat_id in range(offset, offset + 50):
+                    try:
+                        futures.append(writer.submit([seat_id]))
+                    except WriterStopped:
+                        return
+            
+            threads = [threading.Thread(target=submit_many, args=(index * 50,)) for index in range(4)]
+            for thread in threads:
+                thread.start()
+            writer.stop()
+            for thread in threads:
+                thread.join()
+            for future in futures:
+                future.exception(timeout=1)  # raises TimeoutError if it never resolved
+    
+    def test_idle_writer_retires_and_is_replaced(self):
+        service = SingleWriterBookingService(processing_time_range=(0, 0), idle_timeout=0.05)
+        show = build_show(10)
+        self.assertTrue(service.book_seat_single_writer(show, 1, "User1")[0])
+        time.sleep(0.2)
+        self.assertEqual(service.get_stats()["writers"], 0)
+        self.assertTrue(service.book_seat_single_writer(show, 2, "User2")[0])
+        service.close()
+    
+    def test_expired_show_writer_is_retired(self):
+        service = SingleWriterBookingService(processing_time_range=(0, 0))
+        controller = TheatreController()
+        controller.add_show_removed_listener(service.retire_writer)
+        theatre = Theatre()
+        theatre.set_shows([])
+        controller.add_theatre(theatre, "Bangalore")
+        movie = Movie()
+        movie.set_movie_id(1)
+        show = build_show(10)
+        show.set_movie(movie)
+        show.set_show_start_time(datetime.now() - timedelta(hours=1))
+        controller.add_show(theatre, show)
+        service.book_seat_single_writer(show, 1, "User1")
+        writer = service.get_writer(show)
+        self.assertEqual(controller.expire_shows(), 1)
+        writer.thread.join(1)
+        self.assertFalse(writer.thread.is_alive())
+        self.assertNotIn(show, service.show_writers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+# test_sqlite_catalog.py
+import os
+import tempfile
+import unittest
+
+from benchmarks import write_synthetic_catalog
+from catalog_loader import load_catalog
+from concurrency_handle_show import City
+from sqlite_store import create_sqlite_book_my_show
+
+
+class SQLiteCatalogLoadTest(unittest.TestCase):
+    def test_catalog_loader_fills_a_sqlite_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_catalog(directory, theatres=12, shows_per_theatre=3, movies=5)
+            book_my_show = create_sqlite_book_my_show(os.path.join(directory, "bookmyshow.db"))
+            loaded = load_catalog(book_my_show, directory, batch_size=4)
+            self.assertEqual((loaded["movies"], loaded["theatres"], loaded["shows"]), (5, 12, 36))
+            
+            # A second process opening the file sees the same catalog
+            reopened = create_sqlite_book_my_show(os.path.join(directory, "bookmyshow.db"))
+            self.assertEqual(len(reopened.theatre_controller.get_all_shows()), 36)
+            movie = reopened.movie_controller.get_movie_in_city("movie 1", City.DELHI)
+            self.assertEqual(reopened.movie_controller.get_movies_by_name("MOVIE 1"), [movie])
+            
+            show = reopened.theatre_controller.get_all_shows()[0]
+            self.assertTrue(show.try_book_seats([0, 1])[0])
+            self.assertEqual(show.get_booked_seat_ids(), [0, 1])
+            self.assertEqual(len(show.get_seat_map().free_seats()), len(show.get_screen().get_seats()) - 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# test_sqlite_events.py
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from benchmarks import build_show
+from booking_events import BookingEventStream, ShowAvailabilityProjection
+from concurrency_handle_show import City, Movie, Theatre
+from sqlite_store import create_sqlite_book_my_show
+
+
+class SQLiteEventStreamTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.book_my_show = create_sqlite_book_my_show(os.path.join(directory.name, "bookmyshow.db"))
+        movie = Movie()
+        movie.set_movie_id(1)
+        movie.set_movie_name("AVENGERS")
+        self.book_my_show.movie_controller.add_movie(movie, City.BANGALORE)
+        show = build_show(30)
+        show.set_movie(movie)
+        show.set_show_start_time(datetime.now() + timedelta(hours=1))
+        theatre = Theatre()
+        theatre.set_theatre_id(1)
+        theatre.set_screens([show.get_screen()])
+        theatre.set_shows([show])
+        self.book_my_show.theatre_controller.add_theatre(theatre, City.BANGALORE)
+        self.show = theatre.get_shows()[0]
+        self.projection = ShowAvailabilityProjection()
+        stream = BookingEventStream()
+        stream.subscribe(self.projection)
+        self.book_my_show.attach_event_stream(stream)
+    
+    def assert_projection_matches_table(self):
+        table = {
+            category: {"available": counts["available"], "held": counts["held"], "booked": counts["booked"]}
+            for category, counts in self.show.get_category_availability().items()
+        }
+        self.assertEqual(self.projection.get_availability(self.show.get_show_id()), table)
+    
+    def test_projection_follows_sqlite_writes(self):
+        self.assertTrue(self.show.reserve_seats([0, 1, 2], "User1")[0])
+        self.assertTrue(self.show.confirm_bookings([0, 1], "User1")[0])
+        self.assertEqual(self.show.cancel_reservations([2, 3], "User1"), 1)
+        self.assertTrue(self.show.try_book_seats([10, 11])[0])
+        self.assertFalse(self.show.try_book_seats([11, 12])[0])
+        results = self.show.try_book_seat_groups([[20, 21], [10, 22]])
+        self.assertEqual([success for success, _ in results], [True, False])
+        self.assertEqual((self.show.reserve_seats([], "User1"), self.show.try_book_seats([])), ((False, []), (False, [])))
+        self.assertEqual(self.show.try_book_seat_groups([[]]), [(False, [])])
+        self.assert_projection_matches_table()
+        self.assertEqual(self.projection.get_available_count(self.show.get_show_id()), 30 - 6)
+    
+    def test_lapsed_holds_are_published_before_the_write_that_frees_them(self):
+        self.assertTrue(self.show.reserve_seats([5, 6], "User1", hold_time_minutes=-1)[0])
+        self.assertTrue(self.show.reserve_seats([5], "User2")[0])  # 6 lapses alongside 5
+        self.assert_projection_matches_table()
+        self.assertTrue(self.show.reserve_seats([7], "User1", hold_time_minutes=-1)[0])
+        self.show.cleanup_expired_reservations()
+        self.assert_projection_matches_table()
+    
+    def test_set_booked_seat_ids_reattaches(self):
+        self.show.set_booked_seat_ids([1, 2, 3])
+        self.assert_projection_matches_table()
+
+
+if __name__ == "__main__":
+    unittest.main()
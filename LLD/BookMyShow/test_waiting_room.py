@@ -0,0 +1,44 @@
+# test_waiting_room.py
+import threading
+import time
+import unittest
+
+from waiting_room import AdmissionTimeout, ShowWaitingRoom
+
+
+class ShowWaitingRoomTest(unittest.TestCase):
+    def test_next_waiter_admitted_when_head_times_out(self):
+        room = ShowWaitingRoom(release_rate=1, burst=1, max_active_checkouts=16)
+        first = room.wait(room.join("t1"), timeout=1)  # takes the only token
+        self.assertTrue(first.is_admitted())
+        head, behind = room.join("t2"), room.join("t3")
+        admitted_after = []
+        
+        def wait_behind():
+            started = time.monotonic()
+            room.wait(behind, timeout=5)
+            admitted_after.append(time.monotonic() - started)
+        
+        waiter = threading.Thread(target=wait_behind)
+        waiter.start()
+        with self.assertRaises(AdmissionTimeout):
+            room.wait(head, timeout=0.2)
+        waiter.join()
+        
+        self.assertTrue(behind.is_admitted())
+        # The next token arrives about a second after the first was taken, not at t3's deadline
+        self.assertLess(admitted_after[0], 2.0)
+        self.assertEqual(room.get_stats()["abandoned"], 1)
+    
+    def test_leave_while_waiting_hands_the_head_on(self):
+        room = ShowWaitingRoom(release_rate=5, burst=1, max_active_checkouts=16)
+        room.wait(room.join("t1"), timeout=1)
+        head, behind = room.join("t2"), room.join("t3")
+        room.leave(head)
+        started = time.monotonic()
+        room.wait(behind, timeout=5)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,306 @@
+# waiting_room.py
+# Admission control in front of the booking services. Each show gets a FIFO
+# waiting room: users are let through at a token-bucket rate and only while
+# fewer than max_active_checkouts admitted users are still booking, so the
+# show's locks only ever see a bounded number of contenders. Waiting users can
+# poll their queue position and an estimated wait.
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from idempotency import cached_outcome
+
+
+class WaitingRoomFull(Exception):
+    pass
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+# token_bucket.py
+class TokenBucket:
+    """rate tokens per second, holding at most burst; callers hold the owning room's lock"""
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def try_take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    
+    def seconds_until_token(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+# admission_ticket.py
+class AdmissionTicket:
+    __slots__ = ("sequence", "user_id", "joined_at", "admitted_at", "state", "wakeup")
+    WAITING, ADMITTED, DONE, ABANDONED = "WAITING", "ADMITTED", "DONE", "ABANDONED"
+    
+    def __init__(self, sequence, user_id, joined_at):
+        self.sequence = sequence
+        self.user_id = user_id
+        self.joined_at = joined_at
+        self.admitted_at = None
+        self.state = self.WAITING
+        self.wakeup = None  # Event the blocked waiter sleeps on, created by ShowWaitingRoom.wait
+    
+    def is_admitted(self):
+        return self.state == self.ADMITTED
+
+
+# show_waiting_room.py
+class ShowWaitingRoom:
+    """FIFO queue for one show with a release rate and a cap on active checkouts"""
+    CHECKOUT_TIME_SMOOTHING = 0.1  # weight of the newest checkout in the moving average
+    
+    def __init__(self, release_rate=50.0, burst=10, max_active_checkouts=16, max_waiting=None):
+        self.bucket = TokenBucket(release_rate, burst)
+        self.max_active_checkouts = max_active_checkouts
+        self.max_waiting = max_waiting
+        self.lock = threading.Lock()
+        self.queue = deque()  # waiting tickets, oldest first; abandoned ones are dropped at the head
+        self.issued = 0  # tickets handed out so far, also the next ticket's sequence
+        self.next_sequence = 0  # sequence of the oldest ticket that may still be waiting
+        self.active_checkouts = 0
+        self.average_checkout_seconds = None
+        self.admitted_total = 0
+        self.abandoned_total = 0
+        self.rejected_total = 0
+    
+    def join(self, user_id):
+        """Take a place at the back of the queue; raises WaitingRoomFull past max_waiting"""
+        with self.lock:
+            if self.max_waiting is not None and len(self.queue) >= self.max_waiting:
+                self.rejected_total += 1
+                raise WaitingRoomFull(f"{len(self.queue)} users already waiting")
+            ticket = AdmissionTicket(self.issued, user_id, time.monotonic())
+            self.issued += 1
+            self.queue.append(ticket)
+            self._admit(ticket.joined_at)
+            return ticket
+    
+    def _admit(self, now):
+        """Let users in from the head while a slot and a token are free; caller holds self.lock"""
+        queue = self.queue
+        while queue and self.active_checkouts < self.max_active_checkouts:
+            if queue[0].state == AdmissionTicket.ABANDONED:
+                queue.popleft()
+                continue
+            if not self.bucket.try_take(now):
+                # Only the head watches the bucket; wake it to wait for the next token
+                _wake(queue[0])
+                break
+            ticket = queue.popleft()
+            ticket.state = AdmissionTicket.ADMITTED
+            ticket.admitted_at = now
+            self.active_checkouts += 1
+            self.admitted_total += 1
+            _wake(ticket)
+        self.next_sequence = queue[0].sequence if queue else self.issued
+    
+    def status(self, ticket):
+        """{"admitted", "position", "eta_seconds"}; position 0 means next in line
+        
+        The position can include users ahead who have since given up; they
+        are only dropped once they reach the head of the queue.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._admit(now)
+            if ticket.state != AdmissionTicket.WAITING:
+                return {"admitted": ticket.is_admitted(), "position": 0, "eta_seconds": 0.0}
+            position = ticket.sequence - self.next_sequence
+            return {"admitted": False, "position": position, "eta_seconds": self._eta(position, now)}
+    
+    def _eta(self, position, now):
+        """Seconds until the ticket at position is admitted, at the slower of the two release limits"""
+        rate = self.bucket.rate
+        if self.average_checkout_seconds:
+            rate = min(rate, self.max_active_checkouts / self.average_checkout_seconds)
+        return self.bucket.seconds_until_token(now) + position / rate
+    
+    def wait(self, ticket, timeout=None):
+        """Block until the ticket is admitted; raises AdmissionTimeout (and gives up the place)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._admit(now)
+                if ticket.state != AdmissionTicket.WAITING:
+                    return ticket
+                if deadline is not None and now >= deadline:
+                    self._abandon(ticket, now)
+                    raise AdmissionTimeout(f"Not admitted within {timeout}s")
+                
+                # Sleep until _admit wakes us: on admission, or (at the head) to wait for a token
+                wait_for = None
+                if self.queue[0] is ticket and self.active_checkouts < self.max_active_checkouts:
+                    wait_for = self.bucket.seconds_until_token(now)
+                if deadline is not None:
+                    wait_for = deadline - now if wait_for is None else min(wait_for, deadline - now)
+                if ticket.wakeup is None:
+                    ticket.wakeup = threading.Event()
+                wakeup = ticket.wakeup
+                wakeup.clear()
+            wakeup.wait(wait_for)
+    
+    def leave(self, ticket):
+        """Finish a checkout (freeing its slot) or give up a place in the queue"""
+        with self.lock:
+            now = time.monotonic()
+            if ticket.state == AdmissionTicket.ADMITTED:
+                self.active_checkouts -= 1
+                checkout_seconds = now - ticket.admitted_at
+                if self.average_checkout_seconds is None:
+                    self.average_checkout_seconds = checkout_seconds
+                else:
+                    self.average_checkout_seconds += self.CHECKOUT_TIME_SMOOTHING * (
+                        checkout_seconds - self.average_checkout_seconds)
+                ticket.state = AdmissionTicket.DONE
+                self._admit(now)
+            elif ticket.state == AdmissionTicket.WAITING:
+                self._abandon(ticket, now)
+    
+    def _abandon(self, ticket, now):
+        """Give up a waiting ticket; if it was the head, the next waiter takes over watching the bucket"""
+        ticket.state = AdmissionTicket.ABANDONED
+        self.abandoned_total += 1
+        self._admit(now)
+    
+    @contextmanager
+    def admission(self, user_id, timeout=None):
+        """Join, wait to be admitted, run the checkout, then free the slot"""
+        ticket = self.join(user_id)
+        try:
+            yield self.wait(ticket, timeout)
+        finally:
+            self.leave(ticket)
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                "waiting": len(self.queue),
+                "active_checkouts": self.active_checkouts,
+                "admitted": self.admitted_total,
+                "abandoned": self.abandoned_total,
+                "rejected": self.rejected_total,
+                "average_checkout_seconds": self.average_checkout_seconds,
+            }
+
+
+def _wake(ticket):
+    if ticket.wakeup is not None:
+        ticket.wakeup.set()
+
+
+# waiting_room.py
+class WaitingRoom:
+    """One ShowWaitingRoom per show, created on first use with the shared settings"""
+    def __init__(self, release_rate=50.0, burst=10, max_active_checkouts=16, max_waiting=None):
+        self.settings = (release_rate, burst, max_active_checkouts, max_waiting)
+        self.show_id_vs_room = {}
+        self.rooms_lock = threading.Lock()
+    
+    def get_room(self, show):
+        room = self.show_id_vs_room.get(show.get_show_id())
+        if room is None:
+            with self.rooms_lock:
+                room = self.show_id_vs_room.setdefault(show.get_show_id(), ShowWaitingRoom(*self.settings))
+        return room
+    
+    def admission(self, show, user_id, timeout=None):
+        return self.get_room(show).admission(user_id, timeout)
+
+
+# admission_controlled_book_my_show.py
+class AdmissionControlledBookMyShow:
+    """BookMyShow entry points behind a per-show waiting room
+    
+    Each call resolves the show, waits for admission (at most
+    admission_timeout seconds) and only then enters the booking service.
+    A user who is not admitted in time gets the same result as a failed
+    booking: None, or (None, []) for group bookings. A retry whose
+    idempotency_key already has an outcome gets it without queueing again.
+    """
+    def __init__(self, book_my_show, waiting_room=None, admission_timeout=30.0):
+        self.book_my_show = book_my_show
+        self.waiting_room = waiting_room or WaitingRoom()
+        self.admission_timeout = admission_timeout
+    
+    def _admitted(self, method, failure, user_city, movie_name, user_id, *args):
+        show = self.book_my_show._get_show(user_city, movie_name)
+        if show is None:
+            return failure
+        entry_point = getattr(self.book_my_show, method)
+        cached, result = cached_outcome(entry_point, user_city, movie_name, user_id, *args)
+        if cached:
+            return result
+        try:
+            with self.waiting_room.admission(show, user_id, self.admission_timeout):
+                return entry_point(user_city, movie_name, user_id, *args)
+        except (WaitingRoomFull, AdmissionTimeout) as e:
+            print(f"User {user_id}: {e}")
+            return failure
+    
+    def join_queue(self, user_city, movie_name, user_id):
+        """Non-blocking entry for clients that poll: (room, ticket) or (None, None) if there is no show"""
+        show = self.book_my_show._get_show(user_city, movie_name)
+        if show is None:
+            return None, None
+        room = self.waiting_room.get_room(show)
+        return room, room.join(user_id)
+    
+    def create_booking_optimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self._admitted("create_booking_optimistic", None, user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_pessimistic(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self._admitted("create_booking_pessimistic", None, user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_fine_grained(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self._admitted("create_booking_fine_grained", None, user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_two_phase(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self._admitted("create_booking_two_phase", None, user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_booking_single_writer(self, user_city, movie_name, user_id, seat_number=30, idempotency_key=None):
+        return self._admitted("create_booking_single_writer", None, user_city, movie_name, user_id, seat_number, idempotency_key)
+    
+    def create_group_booking_optimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self._admitted("create_group_booking_optimistic", (None, []), user_city, movie_name, user_id,
+                              seat_numbers, idempotency_key)
+    
+    def create_group_booking_pessimistic(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self._admitted("create_group_booking_pessimistic", (None, []), user_city, movie_name, user_id,
+                              seat_numbers, idempotency_key)
+    
+    def create_group_booking_fine_grained(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self._admitted("create_group_booking_fine_grained", (None, []), user_city, movie_name, user_id,
+                              seat_numbers, idempotency_key)
+    
+    def create_group_booking_two_phase(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self._admitted("create_group_booking_two_phase", (None, []), user_city, movie_name, user_id,
+                              seat_numbers, idempotency_key)
+    
+    def create_group_booking_single_writer(self, user_city, movie_name, user_id, seat_numbers, idempotency_key=None):
+        return self._admitted("create_group_booking_single_writer", (None, []), user_city, movie_name, user_id,
+                              seat_numbers, idempotency_key)
+    
+    def create_booking_best_available(self, user_city, movie_name, user_id, seat_category, count, idempotency_key=None):
+        return self._admitted("create_booking_best_available", None, user_city, movie_name, user_id,
+                              seat_category, count, idempotency_key)